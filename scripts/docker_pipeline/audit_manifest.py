@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Audit Manifest
+Persists what the last integrity audit verified for each repository (HEAD,
+tree, per-file stat data and blob IDs, pack checksums) so the next audit only
+re-verifies what changed
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+
+# Configuration
+AUDIT_MANIFEST_DIR = Path('/app/output/.cache/audit_manifests')
+MANIFEST_VERSION = 1
+RACY_WINDOW_NS = 2 * 10**9  # Files modified this close to the last audit are re-hashed
+
+def pack_checksums(repo_path):
+    """Return {pack name: trailing checksum} for every pack of a repository
+
+    Only the last bytes of each .pack are read; the trailer is the pack's own
+    checksum and changes whenever the pack is rewritten.
+    """
+    pack_dir = objects_dir(repo_path) / 'pack'
+    checksums = {}
+    if not pack_dir.is_dir():
+        return checksums
+    for entry in sorted(os.scandir(pack_dir), key=lambda e: e.name):
+        if not entry.name.endswith('.pack'):
+            continue
+        # Trailer length equals the hash length embedded in the pack name
+        trailer_size = (len(entry.name) - len('pack-.pack')) // 2
+        with open(entry.path, 'rb') as f:
+            f.seek(-trailer_size, os.SEEK_END)
+            checksums[entry.name] = f.read(trailer_size).hex()
+    return checksums
+
+def loose_objects_fingerprint(repo_path):
+    """Return [count, newest mtime_ns] of the loose objects of a repository"""
+    count, newest = 0, 0
+    base = objects_dir(repo_path)
+    for fanout in os.scandir(base) if base.is_dir() else []:
+        if len(fanout.name) != 2 or not fanout.is_dir():
+            continue
+        for entry in os.scandir(fanout.path):
+            count += 1
+            newest = max(newest, entry.stat(follow_symlinks=False).st_mtime_ns)
+    return [count, newest]
+
+def objects_dir(repo_path):
+    """Return the object directory of a non-bare or bare repository"""
+    repo_path = Path(repo_path)
+    git_dir = repo_path / '.git'
+    if git_dir.is_file():
+        # Worktrees and submodules point at their git dir with "gitdir: <path>"
+        target = git_dir.read_text().strip().partition('gitdir: ')[2]
+        git_dir = (repo_path / target).resolve()
+    elif not git_dir.is_dir():
+        git_dir = repo_path
+    return git_dir / 'objects'
+
+def file_state(stat_result):
+    """Stat data that identifies an unchanged file: [size, mtime_ns, inode]"""
+    return [stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_ino]
+
+class AuditManifest:
+    def __init__(self, repo_name, manifest_dir=AUDIT_MANIFEST_DIR):
+        self.path = Path(manifest_dir) / f"{repo_name}.json"
+
+    def load(self):
+        """Return the previous manifest, or an empty one if absent or unreadable"""
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return data if data.get('version') == MANIFEST_VERSION else {}
+
+    def save(self, data):
+        """Write the manifest atomically"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = dict(data, version=MANIFEST_VERSION, verified_at_ns=time.time_ns())
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+def is_reusable(previous, state, index_oid, verified_at_ns):
+    """Check whether a file verified last time can be trusted without re-hashing"""
+    if not previous or previous[:3] != state or previous[3] != index_oid:
+        return False
+    # Same racy-timestamp rule git uses for its index: a file written in the
+    # same instant as the last audit may have changed without a new mtime
+    return state[1] < verified_at_ns - RACY_WINDOW_NS
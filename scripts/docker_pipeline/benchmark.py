@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Pipeline Benchmark
+Generates a synthetic ecosystem of local git repositories, serves them as
+file:// remotes and times phases 1-3 against them, so performance changes
+can be measured offline and reproducibly. Results are compared with stored
+baselines and regressions past a threshold are flagged.
+"""
+
+import argparse
+import contextlib
+import hashlib
+import json
+import math
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Configuration
+BENCHMARK_DIR = Path('/app/output/benchmark')
+BENCHMARK_BASELINES = 'baselines.json'
+BENCHMARK_RESULTS = 'results.json'
+REGRESSION_THRESHOLD = 0.20     # Flag a metric this much worse than its baseline
+MIN_COMPARABLE_SECONDS = 0.05   # Timings below this are too noisy to compare
+BENCHMARK_REPEAT = 3            # Runs per scenario; the median is reported
+SCENARIOS = ['cold', 'warm']    # Fresh clones and caches, then a rerun over the same state
+
+# Synthetic ecosystem shape
+DEFAULT_SPEC = {
+    'repos': 8,             # Component repositories besides the ecosystem repository
+    'files': 200,           # Files per repository
+    'file_size': 4096,      # Median file size in bytes
+    'size_sigma': 1.0,      # Log-normal spread of file sizes
+    'history': 10,          # Commits per repository
+    'binary_ratio': 0.05,   # Share of files with binary content
+    'seed': 1
+}
+MAX_SIZE_FACTOR = 64        # No file is larger than this many times the median
+CHANGED_PER_COMMIT = 0.1    # Share of files rewritten by each commit after the first
+TEXT_EXTENSIONS = ['.py', '.md', '.txt', '.json', '.js', '.yaml']
+BINARY_EXTENSIONS = ['.png', '.bin', '.txt']  # Binary .txt files reach phase 3's decoder
+WORDS = ('symbiotic', 'ecosystem', 'signal', 'protocol', 'integrity', 'dataset', 'curriculum', 'repository',
+         'commit', 'tree', 'blob', 'hash', 'level', 'phase', 'token', 'shard', 'mirror', 'clone', 'audit',
+         'def', 'return', 'import', 'class', 'self', 'value', 'index', 'offset', 'buffer', 'stream')
+COMMIT_EPOCH = 1700000000   # Fixed commit dates keep generated object IDs reproducible
+
+def spec_key(spec):
+    """Short stable ID of a generator spec"""
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:12]
+
+def repo_names(spec):
+    from phase1_cloning import ECOSYSTEM_REPO
+    return [ECOSYSTEM_REPO] + [f"bench-repo-{i:03d}" for i in range(spec['repos'])]
+
+def file_size(rng, spec):
+    size = rng.lognormvariate(math.log(spec['file_size']), spec['size_sigma'])
+    return max(1, min(int(size), spec['file_size'] * MAX_SIZE_FACTOR))
+
+def text_content(rng, size):
+    """Word soup of about size bytes, in lines of up to 80 characters"""
+    lines, line, line_length, total = [], [], 0, 0
+    while total < size:
+        word = rng.choice(WORDS)
+        line.append(word)
+        line_length += len(word) + 1
+        total += len(word) + 1
+        if line_length > 80:
+            lines.append(' '.join(line))
+            line, line_length = [], 0
+    lines.append(' '.join(line))
+    return ('\n'.join(lines) + '\n').encode()
+
+def fast_import_stream(files, spec, rng, readme=None):
+    """Yield a git fast-import stream: spec['history'] commits rewriting a share of files each"""
+    mark = 0
+    for commit in range(spec['history']):
+        changed = files if commit == 0 else rng.sample(files, max(1, int(len(files) * CHANGED_PER_COMMIT)))
+        modifications = []
+        for path, binary in changed:
+            size = file_size(rng, spec)
+            data = rng.randbytes(size) if binary else text_content(rng, size)
+            mark += 1
+            yield b'blob\nmark :%d\ndata %d\n' % (mark, len(data)) + data + b'\n'
+            modifications.append(b'M 100644 :%d %s\n' % (mark, path.encode()))
+        if commit == 0 and readme:
+            modifications.append(b'M 100644 inline README.md\ndata %d\n%s\n' % (len(readme), readme))
+        message = b'Synthetic commit %d' % commit
+        yield (b'commit refs/heads/main\n'
+               b'committer Benchmark <benchmark@example.com> %d +0000\n' % (COMMIT_EPOCH + commit * 3600) +
+               b'data %d\n%s\n' % (len(message), message) + b''.join(modifications) + b'\n')
+
+def generate_ecosystem(spec, remotes_dir):
+    """Create one bare repository per name under remotes_dir; reused when already complete"""
+    marker = remotes_dir / '.complete'
+    if marker.exists():
+        return remotes_dir
+    shutil.rmtree(remotes_dir, ignore_errors=True)
+    remotes_dir.mkdir(parents=True)
+    rng = random.Random(spec['seed'])
+    names = repo_names(spec)
+    readme = ('# Synthetic ecosystem\n\n' + ''.join(
+        f"- [{name}](https://github.com/ronniross/{name})\n" for name in names[1:])).encode()
+    for index, name in enumerate(names):
+        files = []
+        for i in range(spec['files']):
+            binary = rng.random() < spec['binary_ratio']
+            extension = rng.choice(BINARY_EXTENSIONS if binary else TEXT_EXTENSIONS)
+            files.append((f"src/module{i % 16:02d}/file{i:05d}{extension}", binary))
+        repo_path = remotes_dir / f"{name}.git"
+        subprocess.run(['git', 'init', '--quiet', '--bare', '--initial-branch=main', str(repo_path)], check=True)
+        importer = subprocess.Popen(['git', 'fast-import', '--quiet'], cwd=repo_path, stdin=subprocess.PIPE)
+        for chunk in fast_import_stream(files, spec, rng, readme if index == 0 else None):
+            importer.stdin.write(chunk)
+        importer.stdin.close()
+        if importer.wait():
+            raise RuntimeError(f"git fast-import failed for {name}")
+    marker.write_text(json.dumps(spec, sort_keys=True))
+    return remotes_dir
+
+def configure(run_dir, remotes_dir):
+    """Point every phase at run_dir and the synthetic remotes instead of /app"""
+    import phase1_cloning as phase1
+    import phase2_integrity as phase2
+    import phase3_dataset as phase3
+    import remote_refs
+    phase1.REPOSITORIES_DIR = phase2.REPOSITORIES_DIR = phase3.REPOSITORIES_SRC_DIR = run_dir / 'repositories'
+    phase1.MIRROR_CACHE_DIR = run_dir / 'cache' / 'mirrors'
+    phase1.CLONE_URL_TEMPLATE = remotes_dir.resolve().as_uri() + '/{name}.git'
+    phase2.REPORT_PATH = run_dir / 'integrity_report.jsonl'
+    phase2.SUMMARY_PATH = run_dir / 'integrity_summary.json'
+    phase2.AUDIT_MANIFEST_DIR = run_dir / 'cache' / 'audit_manifests'
+    remote_refs.REMOTE_REFS_CACHE = run_dir / 'cache' / 'remote_refs.json'
+    phase3.OUTPUT_DATASET_FILE = run_dir / 'dataset.txt'
+    phase3.OUTPUT_SHARDS_DIR = run_dir / 'shards'
+    phase3.SEGMENT_CACHE_DIR = run_dir / 'cache' / 'dataset_segments'
+    phase3.DEDUP_REPORT_PATH = run_dir / 'dedup_report.json'
+    phase3.SKIP_REPORT_PATH = run_dir / 'skip_report.json'
+    return phase1, phase2, phase3
+
+def tree_bytes(path, skip_git=False):
+    total = 0
+    for root, dirs, files in os.walk(path):
+        if skip_git and '.git' in dirs:
+            dirs.remove('.git')
+        total += sum(os.lstat(os.path.join(root, name)).st_size for name in files)
+    return total
+
+def run_child_phase(phase, run_dir, remotes_dir):
+    """Run one phase in this process and return its measurements"""
+    import instrumentation
+    phase1, phase2, phase3 = configure(run_dir, remotes_dir)
+    run = {1: phase1.run_phase1, 2: phase2.run_phase2, 3: phase3.run_phase3}[phase]
+    # Level timings come from the instrumentation spans; other phases run uninstrumented
+    recorder = instrumentation.enable(run_dir / f'metrics-phase{phase}') if phase == 2 else None
+    start = time.perf_counter()
+    with open(run_dir / f'phase{phase}.log', 'a', encoding='utf-8') as log, contextlib.redirect_stdout(log):
+        ok = run()
+    seconds = time.perf_counter() - start
+    instrumentation.finish()
+
+    result = {'ok': bool(ok), 'seconds': seconds,
+              'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+              'children_peak_rss_kb': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss}
+    repositories = run_dir / 'repositories'
+    if phase == 1:
+        result['bytes'] = tree_bytes(repositories)
+    elif phase == 2:
+        result['bytes'] = tree_bytes(repositories, skip_git=True)
+        levels = {}
+        for (name, labels), totals in recorder.series.items():
+            if name == 'level':
+                level = dict(labels)['level']
+                levels[level] = levels.get(level, 0) + totals[1]
+        result['levels'] = levels
+    else:
+        result['bytes'] = os.path.getsize(phase3.OUTPUT_DATASET_FILE) if ok else 0
+    result['mb_per_s'] = result['bytes'] / (1024 * 1024) / seconds if seconds else 0
+    return result
+
+def measure_phase(phase, run_dir, remotes_dir):
+    """Run a phase in a fresh interpreter, so peak RSS is the phase's own"""
+    process = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', str(phase),
+                              '--run-dir', str(run_dir), '--remotes', str(remotes_dir)],
+                             capture_output=True, text=True)
+    if process.returncode:
+        raise RuntimeError(f"Phase {phase} crashed:\n{process.stderr.strip()}")
+    result = json.loads(process.stdout.strip().splitlines()[-1])
+    if not result['ok']:
+        raise RuntimeError(f"Phase {phase} failed, see {run_dir / f'phase{phase}.log'}")
+    return result
+
+def summarize(runs):
+    """Median timings, worst memory and median level timings over repeated runs"""
+    summary = {
+        'seconds': statistics.median(run['seconds'] for run in runs),
+        'peak_rss_kb': max(run['peak_rss_kb'] for run in runs),
+        'children_peak_rss_kb': max(run['children_peak_rss_kb'] for run in runs),
+        'mb_per_s': statistics.median(run['mb_per_s'] for run in runs),
+        'bytes': runs[0]['bytes']
+    }
+    if 'levels' in runs[0]:
+        summary['levels'] = {level: statistics.median(run['levels'].get(level, 0) for run in runs)
+                             for level in runs[0]['levels']}
+    return summary
+
+def run_benchmark(spec, work_dir, repeat=BENCHMARK_REPEAT):
+    """Generate the ecosystem once, then time every scenario `repeat` times"""
+    remotes_dir = work_dir / f"remotes-{spec_key(spec)}"
+    start = time.perf_counter()
+    generate_ecosystem(spec, remotes_dir)
+    print(f"Synthetic ecosystem: {len(repo_names(spec))} repositories in {remotes_dir} "
+          f"({time.perf_counter() - start:.1f}s, {tree_bytes(remotes_dir) / (1024 * 1024):.1f} MB packed)")
+
+    runs = {scenario: {phase: [] for phase in (1, 2, 3)} for scenario in SCENARIOS}
+    for attempt in range(1, repeat + 1):
+        run_dir = work_dir / 'run'
+        shutil.rmtree(run_dir, ignore_errors=True)
+        run_dir.mkdir(parents=True)
+        for scenario in SCENARIOS:
+            for phase in (1, 2, 3):
+                result = measure_phase(phase, run_dir, remotes_dir)
+                runs[scenario][phase].append(result)
+                print(f"  [{attempt}/{repeat}] {scenario:<5} phase {phase}: {result['seconds']:.3f}s, "
+                      f"{result['mb_per_s']:.1f} MB/s, peak RSS {result['peak_rss_kb'] / 1024:.0f} MB "
+                      f"(children {result['children_peak_rss_kb'] / 1024:.0f} MB)")
+    return {scenario: {f'phase{phase}': summarize(phase_runs) for phase, phase_runs in scenario_runs.items()}
+            for scenario, scenario_runs in runs.items()}
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """Return a line per metric that is more than threshold worse than its baseline"""
+    regressions = []
+
+    def check(name, current, previous, minimum=0):
+        if previous and previous >= minimum and (current - previous) / previous > threshold:
+            regressions.append(f"{name}: {previous:.3f} -> {current:.3f} (+{(current / previous - 1) * 100:.0f}%)")
+
+    for scenario, phases in results.items():
+        for phase, current in phases.items():
+            previous = baseline.get(scenario, {}).get(phase)
+            if not previous:
+                continue
+            prefix = f"{scenario} {phase}"
+            check(f"{prefix} seconds", current['seconds'], previous['seconds'], MIN_COMPARABLE_SECONDS)
+            check(f"{prefix} peak RSS KB", current['peak_rss_kb'], previous['peak_rss_kb'])
+            for level, seconds in current.get('levels', {}).items():
+                check(f"{prefix} level {level} seconds", seconds,
+                      previous.get('levels', {}).get(level), MIN_COMPARABLE_SECONDS)
+    return regressions
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on a synthetic ecosystem")
+    for key, value in DEFAULT_SPEC.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=type(value), default=value,
+                            help=f"Synthetic ecosystem {key.replace('_', ' ')} (default: {value})")
+    parser.add_argument('--repeat', type=int, default=BENCHMARK_REPEAT,
+                        help=f"Runs per scenario; medians are reported (default: {BENCHMARK_REPEAT})")
+    parser.add_argument('--work-dir', type=Path, default=BENCHMARK_DIR,
+                        help=f"Where remotes, runs, results and baselines live (default: {BENCHMARK_DIR})")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="Store these results as the baseline for this ecosystem shape")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help=f"Relative slowdown flagged as a regression (default: {REGRESSION_THRESHOLD})")
+    # Internal: run one phase in a child process
+    parser.add_argument('--child', type=int, choices=[1, 2, 3], help=argparse.SUPPRESS)
+    parser.add_argument('--run-dir', type=Path, help=argparse.SUPPRESS)
+    parser.add_argument('--remotes', type=Path, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+def main(args):
+    if args.child:
+        print(json.dumps(run_child_phase(args.child, args.run_dir, args.remotes)))
+        return True
+
+    spec = {key: getattr(args, key) for key in DEFAULT_SPEC}
+    key = spec_key(spec)
+    args.work_dir.mkdir(parents=True, exist_ok=True)
+    print("Pipeline Benchmark")
+    print("=" * 60)
+    print(f"Spec {key}: " + ", ".join(f"{name}={value}" for name, value in spec.items()))
+
+    results = run_benchmark(spec, args.work_dir, args.repeat)
+    report = {'spec': spec, 'recorded_at': datetime.now().isoformat(), 'python': platform.python_version(),
+              'machine': platform.machine(), 'cpus': os.cpu_count(), 'results': results}
+    with open(args.work_dir / BENCHMARK_RESULTS, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    print("\n" + "=" * 60)
+    print("Benchmark Summary (medians)")
+    print("=" * 60)
+    for scenario, phases in results.items():
+        for phase, summary in phases.items():
+            levels = ', '.join(f"L{level} {seconds:.3f}s" for level, seconds in sorted(summary.get('levels', {}).items()))
+            print(f"  {scenario:<5} {phase}: {summary['seconds']:.3f}s, {summary['mb_per_s']:.1f} MB/s, "
+                  f"peak RSS {summary['peak_rss_kb'] / 1024:.0f} MB" + (f" [{levels}]" if levels else ''))
+    print(f"Results: {args.work_dir / BENCHMARK_RESULTS}")
+
+    baselines_path = args.work_dir / BENCHMARK_BASELINES
+    try:
+        with open(baselines_path, 'r', encoding='utf-8') as f:
+            baselines = json.load(f)
+    except (OSError, ValueError):
+        baselines = {}
+
+    passed = True
+    if key in baselines:
+        baseline = baselines[key]
+        if (baseline.get('machine'), baseline.get('cpus')) != (report['machine'], report['cpus']):
+            print("[!] Warning: baseline was recorded on a different machine")
+        regressions = compare(results, baseline['results'], args.threshold)
+        if regressions:
+            passed = False
+            print(f"[x] {len(regressions)} regressions past {args.threshold:.0%} "
+                  f"against the baseline of {baseline['recorded_at']}:")
+            for line in regressions:
+                print(f"    - {line}")
+        else:
+            print(f"[✓] No regressions past {args.threshold:.0%} against the baseline of {baseline['recorded_at']}")
+    else:
+        print("No baseline for this spec yet (store one with --save-baseline)")
+
+    if args.save_baseline:
+        baselines[key] = report
+        with open(baselines_path, 'w', encoding='utf-8') as f:
+            json.dump(baselines, f, indent=2)
+        print(f"Baseline saved: {baselines_path}")
+    return passed
+
+if __name__ == "__main__":
+    sys.exit(0 if main(parse_args()) else 1)
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Curriculum Loader
+Streams training samples from the phase 3 dataset (or its shards) stage by
+stage in curriculum order, with per-repository mixing weights, a seeded
+shuffle within each stage, optional sequence packing, rank partitioning and
+a bounded background prefetch, without loading the corpus into memory
+"""
+
+import queue
+import random
+import threading
+from array import array
+from collections import namedtuple
+from fnmatch import fnmatchcase
+
+from dataset_reader import open_dataset
+from phase3_dataset import CURRICULUM_PRIORITY, CURRICULUM_LAST
+from token_export import load_tokenizer, special_token_ids, token_typecode
+
+# Configuration
+# (stage name, {repository name or glob: mixing weight}); '*' takes every repository no other stage names
+CURRICULUM_STAGES = [
+    ('priority', {name: 1.0 for name in CURRICULUM_PRIORITY}),
+    ('general', {'*': 1.0}),
+    ('last', {name: 1.0 for name in CURRICULUM_LAST})
+]
+LOADER_PREFETCH = 64          # Samples buffered ahead by the prefetch thread (0 = no thread)
+LOADER_TOKENIZE_BATCH = 64    # Files encoded per tokenizer call when packing
+LOADER_POLL_SECONDS = 0.1     # How often a blocked prefetch thread checks whether the consumer left
+
+# One dataset file; text is decoded, so it outlives the dataset mapping
+CurriculumSample = namedtuple('CurriculumSample', ['stage', 'repo', 'path', 'text'])
+# One packed sequence of token IDs; stage is the stage its last token came from
+PackedSample = namedtuple('PackedSample', ['stage', 'tokens'])
+
+def resolve_stages(repos, stages=None):
+    """Map each stage's names and globs onto the dataset's repositories
+
+    Returns [(stage name, [(repo, weight), ...]), ...] with repositories in
+    dataset order. A repository belongs to the first stage naming it
+    exactly, else to the first stage with a matching glob; repositories no
+    stage claims are left out, and weight 0 drops one.
+    """
+    stages = CURRICULUM_STAGES if stages is None else stages
+    owner = {}
+    for exact in (True, False):
+        for index, (_, weights) in enumerate(stages):
+            for pattern, weight in weights.items():
+                for repo in repos:
+                    if repo not in owner and (repo == pattern if exact else fnmatchcase(repo, pattern)):
+                        owner[repo] = (index, weight)
+    return [(name, [(repo, owner[repo][1]) for repo in repos
+                    if repo in owner and owner[repo][0] == index and owner[repo][1] > 0])
+            for index, (name, _) in enumerate(stages)]
+
+def stage_order(file_counts, weights, rng):
+    """Shuffled (repo, file index) order of one stage
+
+    A repository contributes round(weight * files) samples: whole passes
+    over its files, each shuffled on its own, then a random subset for the
+    fraction. The passes of all repositories are shuffled together.
+    """
+    order = []
+    for repo, weight in weights:
+        count = file_counts[repo]
+        wanted = round(weight * count)
+        while count and wanted > 0:
+            indices = list(range(count))
+            rng.shuffle(indices)
+            order.extend((repo, i) for i in indices[:wanted])
+            wanted -= count
+    rng.shuffle(order)
+    return order
+
+def prefetch(samples, size=LOADER_PREFETCH):
+    """Run an iterator on a background thread, holding at most size items ahead
+
+    Errors are re-raised in the consumer. When the consumer stops early the
+    thread closes the source iterator, so a generator's cleanup still runs.
+    """
+    buffer = queue.Queue(maxsize=size)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        """Block until there is room; False once the consumer has gone"""
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=LOADER_POLL_SECONDS)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in samples:
+                if not put((item, None)):
+                    return
+            put((done, None))
+        except Exception as e:
+            put((done, e))
+        finally:
+            close = getattr(samples, 'close', None)
+            if close:
+                close()
+
+    thread = threading.Thread(target=produce, name='curriculum-prefetch', daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = buffer.get()
+            if item is done:
+                if error:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+class CurriculumLoader:
+    """Iterable over the phase 3 dataset in curriculum stages
+
+    Each iteration opens the dataset (dataset.txt or a shards directory)
+    through dataset_reader, so file bodies are read from the memory map as
+    they are yielded. Stages come in order; within a stage, repositories are
+    mixed by their weights and shuffled with a seed derived from seed, epoch
+    and the stage name, so every rank computes the same order and keeps
+    every world_size-th sample of it.
+
+    Without seq_len the loader yields CurriculumSample records, one per
+    file. With seq_len, files are tokenized (a token_export tokenizer spec
+    or object) and packed into PackedSample sequences of exactly seq_len
+    tokens, the file_end token separating files; a sequence may span files
+    and stages. drop_last drops the final short sequence and, with several
+    ranks, the tail of each stage that would leave ranks with unequal
+    sample counts.
+    """
+
+    def __init__(self, path=None, stages=None, seed=0, seq_len=None, tokenizer='bytes',
+                 rank=0, world_size=1, prefetch=LOADER_PREFETCH, drop_last=True):
+        if not 0 <= rank < world_size:
+            raise ValueError(f"rank {rank} is outside a world of {world_size}")
+        if seq_len is not None and seq_len < 1:
+            raise ValueError(f"seq_len must be positive, got {seq_len}")
+        self.path = path
+        self.stages = stages
+        self.seed = seed
+        self.seq_len = seq_len
+        self.tokenizer = load_tokenizer(tokenizer) if isinstance(tokenizer, str) and seq_len else tokenizer
+        self.rank = rank
+        self.world_size = world_size
+        self.prefetch = prefetch
+        self.drop_last = drop_last
+        self.epoch = 0
+
+    def set_epoch(self, epoch):
+        """Reshuffle for another pass; every rank must use the same epoch"""
+        self.epoch = epoch
+
+    def _stage_orders(self, dataset):
+        """Yield (stage, {repo: files}, this rank's (repo, file index) order) per stage"""
+        for stage, weights in resolve_stages(dataset.repos(), self.stages):
+            files = {repo: list(dataset.iter_files(repo)) for repo, _ in weights}
+            try:
+                rng = random.Random(f"{self.seed}:{self.epoch}:{stage}")
+                order = stage_order({repo: len(records) for repo, records in files.items()}, weights, rng)
+                if self.drop_last:
+                    order = order[:len(order) - len(order) % self.world_size]
+                yield stage, files, order[self.rank::self.world_size]
+            finally:
+                # Lets the reader unmap the dataset on close
+                for records in files.values():
+                    for record in records:
+                        record.content.release()
+
+    def stage_sizes(self):
+        """[(stage, files this rank reads in it), ...] for the current epoch, e.g. for LR schedules"""
+        with open_dataset(self.path) as dataset:
+            return [(stage, len(order)) for stage, _, order in self._stage_orders(dataset)]
+
+    def iter_samples(self):
+        """Yield this rank's CurriculumSample records, stage by stage"""
+        with open_dataset(self.path) as dataset:
+            for stage, files, order in self._stage_orders(dataset):
+                for repo, index in order:
+                    record = files[repo][index]
+                    yield CurriculumSample(stage, repo, record.path, str(record.content, 'utf-8'))
+
+    def iter_packed(self):
+        """Yield this rank's files tokenized and packed into PackedSample sequences of seq_len tokens"""
+        separator = special_token_ids(self.tokenizer)['file_end']
+        typecode = token_typecode(self.tokenizer)
+        buffer = array(typecode)
+        stage = None
+        batch = []
+        samples = self.iter_samples()
+        try:
+            for sample in samples:
+                batch.append(sample)
+                if len(batch) < LOADER_TOKENIZE_BATCH:
+                    continue
+                yield from self._pack(batch, buffer, separator)
+                stage = batch[-1].stage
+                batch.clear()
+            if batch:
+                yield from self._pack(batch, buffer, separator)
+                stage = batch[-1].stage
+        finally:
+            samples.close()
+        if buffer and not self.drop_last:
+            yield PackedSample(stage, buffer)
+
+    def _pack(self, batch, buffer, separator):
+        """Append a batch of files to buffer and yield every full sequence"""
+        for sample, tokens in zip(batch, self.tokenizer.encode_batch([sample.text for sample in batch])):
+            buffer.extend(tokens)
+            buffer.append(separator)
+            start = 0
+            while len(buffer) - start >= self.seq_len:
+                yield PackedSample(sample.stage, buffer[start:start + self.seq_len])
+                start += self.seq_len
+            del buffer[:start]
+
+    def __iter__(self):
+        samples = self.iter_packed() if self.seq_len else self.iter_samples()
+        return prefetch(samples, self.prefetch) if self.prefetch else samples
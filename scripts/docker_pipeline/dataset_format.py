@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+"""
+Dataset Format
+Special tokens and default location of the phase 3 dataset, shared by the
+writer side (phase 3) and the readers so neither has to import the other
+"""
+
+from pathlib import Path
+
+# Configuration
+OUTPUT_DATASET_FILE = Path('/app/output/dataset.txt')
+
+# Special tokens for structuring the dataset
+REPO_START_TOKEN = "<|repo_start|>"
+REPO_END_TOKEN = "<|repo_end|>"
+FILE_START_TOKEN = "<|file_start|>"
+FILE_END_TOKEN = "<|file_end|>"
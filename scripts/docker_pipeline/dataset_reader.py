@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Dataset Reader
+Memory-maps the phase 3 dataset and looks up repositories and files as
+zero-copy slices, using a boundary index that is built once and cached next
+to the dataset (or the sidecar index of a sharded dataset)
+"""
+
+import json
+import mmap
+import os
+from collections import namedtuple
+from pathlib import Path
+
+from dataset_format import (OUTPUT_DATASET_FILE, REPO_START_TOKEN, REPO_END_TOKEN,
+                            FILE_START_TOKEN, FILE_END_TOKEN)
+from dataset_shards import OUTPUT_SHARDS_DIR, SHARD_INDEX_NAME
+
+INDEX_SUFFIX = '.index.json'
+INDEX_VERSION = 1
+
+_REPO_START = REPO_START_TOKEN.encode()
+_REPO_END = f"{REPO_END_TOKEN}\n\n".encode()
+_FILE_START = FILE_START_TOKEN.encode()
+_FILE_END = f"\n{FILE_END_TOKEN}\n".encode()
+
+# content is a memoryview into the mapped dataset; decode with bytes(content).decode()
+DatasetFile = namedtuple('DatasetFile', ['repo', 'path', 'content'])
+
+def build_index(data):
+    """Scan a token-delimited dataset buffer and return its repo/file boundaries
+
+    Returns [{'repo', 'offset', 'length', 'files': [[path, offset, length,
+    content_offset, content_length], ...]}, ...] with byte offsets. A file ends
+    at the first "\\n<|file_end|>\\n" that is followed by the next file or the
+    repo end, so bodies that merely mention the tokens are not split.
+    """
+    repos = []
+    pos, size = 0, len(data)
+    while pos < size:
+        if data[pos:pos + len(_REPO_START)] != _REPO_START:
+            raise ValueError(f"Expected {REPO_START_TOKEN} at byte {pos}")
+        line_end = data.find(b'\n', pos)
+        repo = {'repo': data[pos + len(_REPO_START):line_end].decode('utf-8'), 'offset': pos, 'files': []}
+        pos = line_end + 1
+        while True:
+            if data[pos:pos + len(_REPO_END)] == _REPO_END:
+                pos += len(_REPO_END)
+                break
+            if data[pos:pos + len(_FILE_START)] != _FILE_START:
+                raise ValueError(f"Expected {FILE_START_TOKEN} or {REPO_END_TOKEN} at byte {pos}")
+            file_offset = pos
+            line_end = data.find(b'\n', pos)
+            path = data[pos + len(_FILE_START):line_end].decode('utf-8')
+            content_offset = search = line_end + 1
+            while True:
+                end = data.find(_FILE_END, search)
+                if end < 0:
+                    raise ValueError(f"Unterminated file '{path}' at byte {file_offset}")
+                after = end + len(_FILE_END)
+                if (data[after:after + len(_FILE_START)] == _FILE_START
+                        or data[after:after + len(_REPO_END)] == _REPO_END):
+                    break
+                search = end + 1
+            repo['files'].append([path, file_offset, after - file_offset, content_offset, end - content_offset])
+            pos = after
+        repo['length'] = pos - repo['offset']
+        repos.append(repo)
+    return repos
+
+class DatasetReader:
+    """Zero-copy access to a monolithic dataset.txt"""
+
+    def __init__(self, dataset_path=OUTPUT_DATASET_FILE, index_path=None):
+        self.dataset_path = Path(dataset_path)
+        self.index_path = Path(index_path) if index_path else self.dataset_path.with_name(
+            self.dataset_path.name + INDEX_SUFFIX)
+        self._file = open(self.dataset_path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        self._view = memoryview(self._mmap)
+        self.index = self._load_or_build_index()
+        self._repos = {repo['repo']: repo for repo in self.index}
+        self._files = {(repo['repo'], record[0]): record for repo in self.index for record in repo['files']}
+
+    def _load_or_build_index(self):
+        """Reuse the cached boundary index if it belongs to this exact dataset file"""
+        stat_result = os.stat(self.dataset_path)
+        key = [stat_result.st_size, stat_result.st_mtime_ns]
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            if cached.get('version') == INDEX_VERSION and cached.get('dataset') == key:
+                return cached['repos']
+        except (OSError, ValueError):
+            pass
+        repos = build_index(self._mmap)
+        try:
+            tmp_path = self.index_path.with_name(self.index_path.name + '.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': INDEX_VERSION, 'dataset': key, 'repos': repos}, f,
+                          ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            pass  # A read-only location just means rebuilding next time
+        return repos
+
+    def repos(self):
+        """Repository names in dataset (curriculum) order"""
+        return [repo['repo'] for repo in self.index]
+
+    def repo_slices(self, name):
+        """Return the repository's token-delimited block(s) as memoryviews"""
+        repo = self._repos[name]
+        return [self._view[repo['offset']:repo['offset'] + repo['length']]]
+
+    def iter_files(self, repo=None):
+        """Yield DatasetFile records for one repository or the whole dataset"""
+        repos = [self._repos[repo]] if repo else self.index
+        for entry in repos:
+            for path, _, _, content_offset, content_length in entry['files']:
+                yield DatasetFile(entry['repo'], path,
+                                  self._view[content_offset:content_offset + content_length])
+
+    def file(self, repo, path):
+        """Return one file's content as a memoryview"""
+        record = self._files.get((repo, path))
+        if record is None:
+            raise KeyError(f"{repo}/{path}")
+        _, _, _, content_offset, content_length = record
+        return self._view[content_offset:content_offset + content_length]
+
+    def close(self):
+        """Unmap the dataset; memoryviews handed out must be released first"""
+        self._view.release()
+        if isinstance(self._mmap, mmap.mmap):
+            self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class ShardedDatasetReader:
+    """Zero-copy access to a sharded dataset through its index.jsonl"""
+
+    def __init__(self, shards_dir=OUTPUT_SHARDS_DIR):
+        self.shards_dir = Path(shards_dir)
+        self._maps = {}
+        self._repos = {}   # name -> {'segments': [...], 'files': [...]}
+        self._files = {}   # (repo, path) -> file record
+        with open(self.shards_dir / SHARD_INDEX_NAME, 'r', encoding='utf-8') as f:
+            for line in f:
+                record = json.loads(line)
+                if record['type'] == 'file':
+                    self._repo_entry(record['repo'])['files'].append(record)
+                    self._files[(record['repo'], record['path'])] = record
+                elif record['type'] == 'repo':
+                    self._repo_entry(record['repo'])['segments'].append(record)
+
+    def _repo_entry(self, name):
+        return self._repos.setdefault(name, {'segments': [], 'files': []})
+
+    def _shard(self, name):
+        """Map a shard on first use"""
+        if name not in self._maps:
+            f = open(self.shards_dir / name, 'rb')
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b''
+            self._maps[name] = (f, mapped, memoryview(mapped))
+        return self._maps[name][2]
+
+    def repos(self):
+        return list(self._repos)
+
+    def repo_slices(self, name):
+        return [self._shard(segment['shard'])[segment['offset']:segment['offset'] + segment['length']]
+                for segment in self._repos[name]['segments']]
+
+    def iter_files(self, repo=None):
+        names = [repo] if repo else self._repos
+        for name in names:
+            for record in self._repos[name]['files']:
+                start = record['content_offset']
+                yield DatasetFile(name, record['path'],
+                                  self._shard(record['shard'])[start:start + record['content_length']])
+
+    def file(self, repo, path):
+        record = self._files.get((repo, path))
+        if record is None:
+            raise KeyError(f"{repo}/{path}")
+        start = record['content_offset']
+        return self._shard(record['shard'])[start:start + record['content_length']]
+
+    def close(self):
+        for f, mapped, view in self._maps.values():
+            view.release()
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+            f.close()
+        self._maps.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def open_dataset(path=None):
+    """Open a dataset.txt or a shards directory with the matching reader"""
+    path = Path(path) if path else OUTPUT_DATASET_FILE
+    if path.is_dir():
+        return ShardedDatasetReader(path)
+    return DatasetReader(path)
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Sharded Dataset Output
+Writes the token-delimited dataset as size-bounded shards plus a JSON-lines
+sidecar index giving the shard, byte offset, length, path and content hash
+of every repository and file, so readers can seek straight to them
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+from dataset_writer import DatasetWriter
+
+# Configuration
+OUTPUT_SHARDS_DIR = Path('/app/output/dataset_shards')
+SHARD_MAX_BYTES = 256 * 1024 * 1024  # A shard is closed at the first file boundary past this size
+SHARD_INDEX_NAME = 'index.jsonl'
+
+def shard_name(number):
+    return f"shard-{number:05d}.txt"
+
+class ShardedDatasetWriter(DatasetWriter):
+    """DatasetWriter that rotates shards at file boundaries and indexes every block
+
+    Every shard is a self-contained token-delimited document: when a repository
+    continues into the next shard, the old shard gets the repo end token and the
+    new one starts with the repo start token again.
+
+    Index records (one JSON object per line):
+      {"type": "file", "repo", "path", "shard", "offset", "length",
+       "content_offset", "content_length", "sha256"}
+      {"type": "repo", "repo", "shard", "offset", "length", "files"}  one per shard a repo touches
+      {"type": "shard", "shard", "bytes", "sha256"}
+    Offsets and lengths are in bytes; "offset"/"length" cover the whole block
+    including its tokens, "content_*" only the file body.
+    """
+
+    def __init__(self, output_dir=OUTPUT_SHARDS_DIR, max_shard_bytes=SHARD_MAX_BYTES):
+        self.output_dir = Path(output_dir)
+        super().__init__(self.output_dir / shard_name(0))
+        self.max_shard_bytes = max_shard_bytes
+        self.index_path = self.output_dir / SHARD_INDEX_NAME
+        self.shards = []
+        self._index = None
+        self._shard_bytes = 0
+        self._shard_sha256 = None
+        self._repo = None           # (name, header, footer) of the open repository
+        self._repo_offset = 0
+        self._repo_files = 0
+        self._file_record = None
+        self._content_sha256 = None
+
+    def __enter__(self):
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        # Shards from an earlier, larger run must not linger next to the new ones
+        for stale in self.output_dir.glob('shard-*.txt'):
+            stale.unlink()
+        self._index = open(self.index_path, 'w', encoding='utf-8')
+        self._open_shard()
+        return self
+
+    def __exit__(self, *exc):
+        self._close_shard()
+        self._index.close()
+
+    def _open_shard(self):
+        self.output_path = self.output_dir / shard_name(len(self.shards))
+        self.shards.append(self.output_path.name)
+        self._file = open(self.output_path, 'wb')
+        self._shard_bytes = 0
+        self._shard_sha256 = hashlib.sha256()
+
+    def _close_shard(self):
+        self._file.close()
+        self._record(type='shard', shard=self.output_path.name, bytes=self._shard_bytes,
+                     sha256=self._shard_sha256.hexdigest())
+
+    def _record(self, **record):
+        self._index.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def write(self, text):
+        """Encode and write text, updating the dataset and shard counters"""
+        data = super().write(text)
+        self._shard_sha256.update(data)
+        self._shard_bytes += len(data)
+        return data
+
+    def write_content(self, text):
+        self._content_sha256.update(self.write(text))
+
+    def _repo_record(self):
+        name = self._repo[0]
+        self._record(type='repo', repo=name, shard=self.output_path.name, offset=self._repo_offset,
+                     length=self._shard_bytes - self._repo_offset, files=self._repo_files)
+
+    def start_repo(self, repo_name, header, footer):
+        self._repo = (repo_name, header, footer)
+        self._repo_offset = self._shard_bytes
+        self._repo_files = 0
+        self.write(header)
+
+    def end_repo(self):
+        self.write(self._repo[2])
+        self._repo_record()
+        self._repo = None
+
+    def start_file(self, relative_path, header):
+        if self._shard_bytes >= self.max_shard_bytes:
+            self._rotate()
+        self._file_record = {
+            'type': 'file',
+            'repo': self._repo[0] if self._repo else None,
+            'path': str(relative_path),
+            'shard': self.output_path.name,
+            'offset': self._shard_bytes
+        }
+        self._content_sha256 = hashlib.sha256()
+        self.write(header)
+        self._file_record['content_offset'] = self._shard_bytes
+
+    def end_file(self, footer):
+        record = self._file_record
+        record['content_length'] = self._shard_bytes - record['content_offset']
+        super().end_file(footer)
+        record['length'] = self._shard_bytes - record['offset']
+        record['sha256'] = self._content_sha256.hexdigest()
+        self._record(**record)
+        self._repo_files += 1
+        self._file_record = None
+
+    def _rotate(self):
+        """Close the current shard and continue the open repository in a new one"""
+        repo = self._repo
+        if repo:
+            self.write(repo[2])
+            self._repo_record()
+        self._close_shard()
+        self._open_shard()
+        if repo:
+            self.start_repo(*repo)
+
+    def output_paths(self):
+        return [self.output_dir / name for name in self.shards]
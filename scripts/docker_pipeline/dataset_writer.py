@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Streaming Dataset Writer
+Writes the token-delimited dataset in bounded chunks while keeping character,
+byte and file counts and a running SHA-256, so the output never has to be
+read back to be verified
+"""
+
+import hashlib
+import os
+
+STREAM_CHUNK_CHARS = 1024 * 1024  # Characters read from a source file at a time
+
+class DatasetWriter:
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.characters = 0
+        self.bytes_written = 0
+        self.files_written = 0
+        self.sha256 = hashlib.sha256()
+        self._file = None
+        self._repo_footer = ''
+
+    def __enter__(self):
+        self._file = open(self.output_path, 'wb')
+        return self
+
+    def __exit__(self, *exc):
+        self._file.close()
+
+    def write(self, text):
+        """Encode and write text, updating the counters; returns the bytes written"""
+        data = text.encode('utf-8')
+        self._file.write(data)
+        self.sha256.update(data)
+        self.characters += len(text)
+        self.bytes_written += len(data)
+        return data
+
+    def write_content(self, text):
+        """Write part of a file body; subclasses hook in here to hash bodies"""
+        self.write(text)
+
+    def start_repo(self, repo_name, header, footer):
+        """Write a repository's start token line; footer is written by end_repo()"""
+        self._repo_footer = footer
+        self.write(header)
+
+    def end_repo(self):
+        """Write the end token line of the open repository"""
+        self.write(self._repo_footer)
+
+    def start_file(self, relative_path, header):
+        """Write a file's start token line"""
+        self.write(header)
+
+    def end_file(self, footer):
+        """Write a file's end token line"""
+        self.write(footer)
+        self.files_written += 1
+
+    def write_file(self, content, header, footer, relative_path=None):
+        """Write one already-decoded source file between its header and footer"""
+        self.start_file(relative_path, header)
+        self.write_content(content)
+        self.end_file(footer)
+
+    def copy_file(self, file_path, header, footer, relative_path=None):
+        """Stream one source file between its header and footer
+
+        The first chunk is read before anything is written, so files that
+        cannot be opened or read leave no trace in the dataset. A read error
+        later on still closes the file block with its footer and is re-raised.
+        """
+        with file_path.open('r', encoding='utf-8', errors='ignore') as infile:
+            chunk = infile.read(STREAM_CHUNK_CHARS)
+            self.start_file(relative_path, header)
+            try:
+                while chunk:
+                    self.write_content(chunk)
+                    chunk = infile.read(STREAM_CHUNK_CHARS)
+            finally:
+                self.end_file(footer)
+
+    def copy_segment(self, segment_path, characters, files):
+        """Append a previously written segment verbatim, updating the counters"""
+        with open(segment_path, 'rb') as segment:
+            for data in iter(lambda: segment.read(STREAM_CHUNK_CHARS), b''):
+                self._file.write(data)
+                self.sha256.update(data)
+                self.bytes_written += len(data)
+        self.characters += characters
+        self.files_written += files
+
+    def output_paths(self):
+        """Return every file this writer produced"""
+        return [self.output_path]
+
+    def bytes_on_disk(self):
+        """Total size of the written output, for verification against the counters"""
+        return sum(os.path.getsize(path) for path in self.output_paths())
+
+    def stats(self):
+        """Return the running counters"""
+        return {
+            'characters': self.characters,
+            'bytes': self.bytes_written,
+            'files': self.files_written,
+            'sha256': self.sha256.hexdigest()
+        }
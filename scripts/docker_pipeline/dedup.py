@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Content Deduplication
+Finds exact (content hash) and near (MinHash/LSH) duplicate source files ahead
+of the phase 3 write, keeping the first occurrence in curriculum order. MinHash
+signatures are spilled to a temporary file and the LSH bands are bucketed a few
+at a time, so memory stays bounded on corpora the size of asi-backups
+"""
+
+import hashlib
+import json
+import mmap
+import tempfile
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+
+# Configuration
+DEDUP_REPORT_PATH = Path('/app/output/dedup_report.json')
+DEDUP_THRESHOLD = 0.85             # Estimated Jaccard similarity at which a file counts as a near-duplicate
+DEDUP_NUM_PERM = 128               # MinHash signature length
+DEDUP_SHINGLE_SIZE = 5             # Whitespace tokens per shingle
+DEDUP_MIN_TOKENS = 32              # Shorter files are only deduplicated exactly
+DEDUP_MAX_SIGN_BYTES = 8 * 1024 * 1024  # Larger files are only deduplicated exactly
+DEDUP_BANDS_PER_PASS = 8           # LSH band tables held in memory at once
+
+_EMPTY = 2**64 - 1
+
+def lsh_shape(num_perm, threshold):
+    """Pick (bands, rows) whose LSH threshold (1/b)^(1/r) is closest to, and not above, threshold"""
+    shapes = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    below = [shape for shape in shapes if (1 / shape[0]) ** (1 / shape[1]) <= threshold] or shapes
+    return min(below, key=lambda shape: threshold - (1 / shape[0]) ** (1 / shape[1]))
+
+def minhash_signature(text, num_perm=DEDUP_NUM_PERM, shingle_size=DEDUP_SHINGLE_SIZE):
+    """MinHash signature of a text's token shingles, or None if it is too short
+
+    Uses one-permutation hashing: every shingle is hashed once and lands in one
+    of num_perm bins, keeping the bin minimum; empty bins are filled from the
+    next non-empty bin. Cost is linear in the text, not in num_perm.
+    """
+    tokens = text.split()
+    if len(tokens) < DEDUP_MIN_TOKENS:
+        return None
+    signature = array('Q', [_EMPTY]) * num_perm
+    for i in range(len(tokens) - shingle_size + 1):
+        shingle = ' '.join(tokens[i:i + shingle_size]).encode('utf-8')
+        value = int.from_bytes(hashlib.blake2b(shingle, digest_size=8).digest(), 'little')
+        slot, value = value % num_perm, value // num_perm
+        if value < signature[slot]:
+            signature[slot] = value
+    if signature.count(_EMPTY) == num_perm:
+        return None
+    # Densify: an empty bin borrows the next filled bin's value, offset by distance
+    # (bin values are below 2**57, so the offset keeps them distinct and in range)
+    for slot in range(num_perm):
+        if signature[slot] == _EMPTY:
+            distance = 1
+            while signature[(slot + distance) % num_perm] == _EMPTY:
+                distance += 1
+            signature[slot] = signature[(slot + distance) % num_perm] + distance * 2**57
+    return signature
+
+class ContentDeduplicator:
+    """Decides which files of a phase 3 run to drop
+
+    Feed every file in curriculum order with add(), call finish(), then ask
+    duplicate_of() per file during the write. mode is 'exact' or 'near'.
+    """
+
+    def __init__(self, mode='near', threshold=DEDUP_THRESHOLD, num_perm=DEDUP_NUM_PERM):
+        self.mode = mode
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands, self.rows = lsh_shape(num_perm, threshold)
+        self.keys = []              # ordinal -> (repo, path)
+        self.sizes = array('Q')     # ordinal -> bytes
+        self.dropped = {}           # ordinal -> (kind, original ordinal, similarity)
+        self._digests = {}          # content SHA-256 -> first ordinal
+        self._signed = array('L')   # ordinals that have a spilled signature, in order
+        self._spill = tempfile.TemporaryFile(prefix='dedup-signatures-') if mode == 'near' else None
+        self._lookup = {}
+
+    def _register(self, repo, path, size, digest):
+        """Record a file; returns False when it is an exact duplicate of an earlier one"""
+        ordinal = len(self.keys)
+        self.keys.append((repo, path))
+        self.sizes.append(size)
+        first = self._digests.setdefault(digest, ordinal)
+        if first != ordinal:
+            self.dropped[ordinal] = ('exact', first, 1.0)
+            return False
+        return True
+
+    def add(self, repo, path, text):
+        """Register one file's decoded content; exact duplicates are resolved here"""
+        data = text.encode('utf-8')
+        ordinal = len(self.keys)
+        if not self._register(repo, path, len(data), hashlib.sha256(data).digest()):
+            return
+        if self._spill and len(data) <= DEDUP_MAX_SIGN_BYTES:
+            signature = minhash_signature(text, self.num_perm)
+            if signature is not None:
+                signature.tofile(self._spill)
+                self._signed.append(ordinal)
+
+    def add_chunks(self, repo, path, chunks):
+        """Register a file too large to hold, from its decoded chunks (exact match only)"""
+        sha256 = hashlib.sha256()
+        size = 0
+        for chunk in chunks:
+            data = chunk.encode('utf-8')
+            sha256.update(data)
+            size += len(data)
+        self._register(repo, path, size, sha256.digest())
+
+    def finish(self):
+        """Run the LSH passes over the spilled signatures"""
+        self._digests = {}
+        if self._spill and self._signed:
+            self._spill.flush()
+            with mmap.mmap(self._spill.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                signatures = memoryview(mapped).cast('Q')
+                try:
+                    for start in range(0, self.bands, DEDUP_BANDS_PER_PASS):
+                        self._band_pass(signatures, range(start, min(start + DEDUP_BANDS_PER_PASS, self.bands)))
+                    self._resolve_roots(signatures)
+                finally:
+                    signatures.release()
+        if self._spill:
+            self._spill.close()
+            self._spill = None
+        self._lookup = {self.keys[ordinal]: drop for ordinal, drop in self.dropped.items()}
+
+    def _band_pass(self, signatures, bands):
+        """Bucket still-kept signatures on a few bands; a candidate pair is verified on the full signature"""
+        tables = [{} for _ in bands]
+        k, rows = self.num_perm, self.rows
+        for index, ordinal in enumerate(self._signed):
+            if ordinal in self.dropped:
+                continue
+            base = index * k
+            keys = [signatures[base + band * rows:base + (band + 1) * rows].tobytes() for band in bands]
+            for table, key in zip(tables, keys):
+                other = table.get(key)
+                if other is None:
+                    continue
+                similarity = self._similarity(signatures, index, other)
+                if similarity >= self.threshold:
+                    self.dropped[ordinal] = ('near', self._signed[other], round(similarity, 4))
+                    break
+            else:
+                for table, key in zip(tables, keys):
+                    table.setdefault(key, index)
+
+    def _similarity(self, signatures, index, other):
+        """Estimated Jaccard similarity of two spilled signatures, by their position in _signed"""
+        k = self.num_perm
+        same = sum(1 for a, b in zip(signatures[index * k:(index + 1) * k], signatures[other * k:(other + 1) * k])
+                   if a == b)
+        return same / k
+
+    def _resolve_roots(self, signatures):
+        """Point every drop at a file that is kept
+
+        A later band pass can drop the file an earlier drop points at (Z near
+        X in one pass, X near Y in the next), and the first copy of an exact
+        duplicate can be a near duplicate itself. Such drops are re-pointed at
+        the end of their chain, with the similarity estimated against it.
+        """
+        for ordinal, (kind, original, _) in list(self.dropped.items()):
+            if original not in self.dropped:
+                continue
+            root = original
+            while root in self.dropped:
+                root = self.dropped[root][1]
+            # An exact copy is never signed; its original has the same signature
+            source = ordinal if kind == 'near' else original
+            index, other = (bisect_left(self._signed, o) for o in (source, root))
+            self.dropped[ordinal] = ('near', root, round(self._similarity(signatures, index, other), 4))
+
+    def duplicate_of(self, repo, path):
+        """Return (kind, (repo, path) kept instead, similarity) for a dropped file, else None"""
+        drop = self._lookup.get((repo, path))
+        if drop is None:
+            return None
+        kind, original, similarity = drop
+        return kind, self.keys[original], similarity
+
+    def report(self):
+        """Summary plus one record per dropped file, in curriculum order"""
+        dropped = []
+        counts = {'exact': 0, 'near': 0}
+        for ordinal in sorted(self.dropped):
+            kind, original, similarity = self.dropped[ordinal]
+            counts[kind] += 1
+            dropped.append({
+                'repo': self.keys[ordinal][0],
+                'path': self.keys[ordinal][1],
+                'kind': kind,
+                'duplicate_of': {'repo': self.keys[original][0], 'path': self.keys[original][1]},
+                'similarity': similarity,
+                'bytes': self.sizes[ordinal]
+            })
+        return {
+            'mode': self.mode,
+            'threshold': self.threshold if self.mode == 'near' else 1.0,
+            'num_perm': self.num_perm,
+            'lsh_bands': self.bands,
+            'lsh_rows': self.rows,
+            'files_scanned': len(self.keys),
+            'exact_duplicates': counts['exact'],
+            'near_duplicates': counts['near'],
+            'bytes_dropped': sum(record['bytes'] for record in dropped),
+            'dropped': dropped
+        }
+
+    def save_report(self, report_path=DEDUP_REPORT_PATH):
+        report_path = Path(report_path)
+        report_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2, ensure_ascii=False)
+        return report_path
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Source File Policy
+Classifies phase 3 candidates before they are read in full: a size cap from
+the cached stat, then a short prefix checked for NUL bytes, undecodable
+UTF-8 and minified or generated content. Large files are streamed, truncated
+or skipped by extension, and every decision other than a plain include is
+written to a skip report
+"""
+
+import codecs
+import fnmatch
+import json
+import os
+from collections import Counter
+from pathlib import Path
+
+# Configuration
+SKIP_REPORT_PATH = Path('/app/output/skip_report.json')
+SNIFF_BYTES = 8 * 1024                # Prefix read to classify a file
+MAX_INVALID_UTF8_RATIO = 0.1          # Share of undecodable prefix bytes that marks a file as not text
+MINIFIED_LINE_CHARS = 4096            # A longer line in the prefix marks a file as minified
+GENERATED_NAMES = ['*.min.*', 'package-lock.json', '*_pb2.py', '*.pb.go']
+GENERATED_MARKERS = ['@generated', 'do not edit', 'auto-generated', 'autogenerated']  # Lowercase
+GENERATED_HEADER_LINES = 5            # Lines searched for GENERATED_MARKERS
+MAX_FILE_BYTES = 64 * 1024 * 1024     # Larger files are always skipped
+LARGE_FILE_BYTES = 2 * 1024 * 1024    # Larger files follow LARGE_FILE_POLICY
+LARGE_FILE_POLICY = {                 # Extension -> 'stream' (keep whole), 'truncate' or 'skip'
+    '.json': 'truncate', '.xml': 'truncate', '.yaml': 'truncate', '.yml': 'truncate'
+}
+LARGE_FILE_DEFAULT_POLICY = 'stream'
+TRUNCATE_CHARS = 256 * 1024           # Characters kept from a truncated file, cut back to a line end
+
+def policy_config():
+    """Every setting that changes which files or bytes reach the dataset"""
+    return {
+        'sniff_bytes': SNIFF_BYTES, 'max_invalid_utf8_ratio': MAX_INVALID_UTF8_RATIO,
+        'minified_line_chars': MINIFIED_LINE_CHARS, 'generated_names': GENERATED_NAMES,
+        'generated_markers': GENERATED_MARKERS, 'generated_header_lines': GENERATED_HEADER_LINES,
+        'max_file_bytes': MAX_FILE_BYTES, 'large_file_bytes': LARGE_FILE_BYTES,
+        'large_file_policy': LARGE_FILE_POLICY, 'large_file_default_policy': LARGE_FILE_DEFAULT_POLICY,
+        'truncate_chars': TRUNCATE_CHARS
+    }
+
+def classify_file(file_path, size):
+    """Return (action, reason) for one candidate file
+
+    file_path is a Path or anything with the same name and open() (a
+    git_source.GitBlob). action is 'include' (reason None), 'stream' or 'truncate' (both
+    included, reason 'large_file') or 'skip' with reason 'too_large',
+    'binary', 'not_utf8', 'generated' or 'minified'.
+    """
+    if size > MAX_FILE_BYTES:
+        return 'skip', 'too_large'
+    name = file_path.name
+    if any(fnmatch.fnmatch(name, pattern) for pattern in GENERATED_NAMES):
+        return 'skip', 'generated'
+    if size:
+        try:
+            with file_path.open('rb') as f:
+                prefix = f.read(SNIFF_BYTES)
+        except OSError:
+            return 'include', None  # The read itself reports the error
+        if b'\0' in prefix:
+            return 'skip', 'binary'
+        # Incremental decoding leaves a character cut at the end of the prefix uncounted
+        text = codecs.getincrementaldecoder('utf-8')('replace').decode(prefix)
+        invalid = text.count('\ufffd') - prefix.count('\ufffd'.encode('utf-8'))
+        if invalid > MAX_INVALID_UTF8_RATIO * len(prefix):
+            return 'skip', 'not_utf8'
+        lines = text.split('\n')
+        header = '\n'.join(lines[:GENERATED_HEADER_LINES]).lower()
+        if any(marker in header for marker in GENERATED_MARKERS):
+            return 'skip', 'generated'
+        if max(len(line) for line in lines) > MINIFIED_LINE_CHARS:
+            return 'skip', 'minified'
+    if size > LARGE_FILE_BYTES:
+        return LARGE_FILE_POLICY.get(os.path.splitext(name)[1].lower(), LARGE_FILE_DEFAULT_POLICY), 'large_file'
+    return 'include', None
+
+def skip_report(decisions):
+    """Summary plus the recorded decisions, given {repo, path, bytes, action, reason} records"""
+    counts = {}
+    for record in decisions:
+        counts.setdefault(record['action'], Counter())[record['reason']] += 1
+    return {
+        'policy': policy_config(),
+        'files_skipped': sum(counts.get('skip', Counter()).values()),
+        'files_truncated': sum(counts.get('truncate', Counter()).values()),
+        'files_streamed': sum(counts.get('stream', Counter()).values()),
+        'bytes_skipped': sum(record['bytes'] for record in decisions if record['action'] == 'skip'),
+        'reasons': {action: dict(reasons) for action, reasons in sorted(counts.items())},
+        'files': decisions
+    }
+
+def save_skip_report(decisions, report_path=SKIP_REPORT_PATH):
+    report_path = Path(report_path)
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    report = skip_report(decisions)
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    return report_path, report
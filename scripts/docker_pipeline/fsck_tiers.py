@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Tiered Git Integrity Checks
+fsck tiers for Level 2, pack checksum verification and a parser that turns
+fsck output into structured issue records
+"""
+
+import hashlib
+import os
+import re
+
+from audit_manifest import objects_dir
+
+# fsck tiers from cheapest to most thorough
+FSCK_TIERS = {
+    # Reachability of every ref only, object contents are not inflated
+    'connectivity': ['git', 'fsck', '--connectivity-only', '--no-dangling'],
+    # Loose objects are fully checked, packs are left to the pack checksum pass.
+    # Reflogs are skipped: without --full, reflog entries that point into packs
+    # are wrongly reported as invalid
+    'loose': ['git', 'fsck', '--no-full', '--no-dangling', '--no-reflogs'],
+    # Every object in every pack is checked
+    'full': ['git', 'fsck', '--full', '--no-dangling'],
+}
+TIER_RANK = {tier: rank for rank, tier in enumerate(FSCK_TIERS)}
+DEFAULT_FSCK_TIER = 'full'
+PACK_HASH_CHUNK_SIZE = 1024 * 1024
+
+# Pack verification depths: 'checksum' = pack/.idx trailers, 'objects' = every object (fsck --full)
+PACK_DEPTH_RANK = {'checksum': 0, 'objects': 1}
+
+_OBJECT_LINE = re.compile(r'^(missing|dangling|unreachable) (\w+) ([0-9a-f]{40,64})')
+_BROKEN_LINK = re.compile(r'^broken link from\s+(\w+) ([0-9a-f]{40,64})')
+_BROKEN_LINK_TARGET = re.compile(r'^\s+to\s+(\w+) ([0-9a-f]{40,64})')
+_OBJECT_MESSAGE = re.compile(r'^(error|warning) in (\w+) ([0-9a-f]{40,64}): (?:(\w+): )?(.*)')
+_PREFIXED = re.compile(r'^(error|warning|fatal|notice): (.*)')
+_OID = re.compile(r'\b([0-9a-f]{40}|[0-9a-f]{64})\b')
+
+def issue_record(severity, kind, message, object_type=None, oid=None, **extra):
+    """Build one structured Level 2 issue"""
+    return dict(severity=severity, kind=kind, object_type=object_type, oid=oid, message=message, **extra)
+
+def parse_fsck_output(output):
+    """Turn fsck stdout/stderr into a list of issue records
+
+    Each record has severity ('error', 'warning' or 'info'), kind, object_type,
+    oid and the original message line.
+    """
+    issues = []
+    for line in output.splitlines():
+        if not line.strip() or line.startswith('Checking '):
+            continue
+        match = _OBJECT_LINE.match(line)
+        if match:
+            kind, object_type, oid = match.groups()
+            severity = 'error' if kind == 'missing' else 'info'
+            issues.append(issue_record(severity, kind, line, object_type, oid))
+            continue
+        match = _BROKEN_LINK.match(line)
+        if match:
+            issues.append(issue_record('error', 'broken_link', line, *match.groups()))
+            continue
+        match = _BROKEN_LINK_TARGET.match(line)
+        if match and issues and issues[-1]['kind'] == 'broken_link':
+            # Second line of a broken link names the missing target
+            issues[-1]['target_type'], issues[-1]['target_oid'] = match.groups()
+            issues[-1]['message'] += '\n' + line
+            continue
+        match = _OBJECT_MESSAGE.match(line)
+        if match:
+            severity, object_type, oid, msg_id, _ = match.groups()
+            issues.append(issue_record(severity, msg_id or 'object', line, object_type, oid))
+            continue
+        match = _PREFIXED.match(line)
+        if match:
+            prefix, text = match.groups()
+            severity = {'fatal': 'error', 'notice': 'info'}.get(prefix, prefix)
+            lowered = text.lower()
+            kind = 'corrupt' if 'corrupt' in lowered or 'mismatch' in lowered or 'bad' in lowered else prefix
+            oid = _OID.search(text)
+            issues.append(issue_record(severity, kind, line, oid=oid.group(1) if oid else None))
+            continue
+        # Anything unrecognised is kept, but cannot fail the check on its own
+        issues.append(issue_record('warning', 'unparsed', line))
+    return issues
+
+def _file_digest(path, algorithm, end):
+    """Hash the first `end` bytes of a file in chunks"""
+    digest = hashlib.new(algorithm)
+    remaining = end
+    with open(path, 'rb') as f:
+        while remaining > 0:
+            chunk = f.read(min(PACK_HASH_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+    return digest.digest()
+
+def verify_pack_checksum(pack_path):
+    """Verify a pack's trailing checksum and its .idx; returns (ok, message)
+
+    The pack trailer is the hash of everything before it. The .idx ends with
+    a copy of the pack trailer followed by its own checksum.
+    """
+    pack_path = str(pack_path)
+    idx_path = pack_path[:-len('.pack')] + '.idx'
+    name = os.path.basename(pack_path)
+    hash_size = (len(name) - len('pack-.pack')) // 2
+    algorithm = 'sha256' if hash_size == 32 else 'sha1'
+    try:
+        pack_size = os.path.getsize(pack_path)
+        idx_size = os.path.getsize(idx_path)
+        with open(pack_path, 'rb') as f:
+            f.seek(-hash_size, os.SEEK_END)
+            pack_trailer = f.read(hash_size)
+        with open(idx_path, 'rb') as f:
+            f.seek(-2 * hash_size, os.SEEK_END)
+            idx_pack_trailer = f.read(hash_size)
+            idx_trailer = f.read(hash_size)
+        if _file_digest(pack_path, algorithm, pack_size - hash_size) != pack_trailer:
+            return False, f"{name}: pack checksum mismatch"
+        if idx_pack_trailer != pack_trailer:
+            return False, f"{name}: .idx belongs to a different pack"
+        if _file_digest(idx_path, algorithm, idx_size - hash_size) != idx_trailer:
+            return False, f"{name}: .idx checksum mismatch"
+    except OSError as e:
+        return False, f"{name}: {e}"
+    return True, f"{name}: OK"
+
+def pack_identity(pack_path):
+    """Stat data that tells whether a pack file was replaced: [size, mtime_ns]"""
+    stat_result = os.stat(pack_path)
+    return [stat_result.st_size, stat_result.st_mtime_ns]
+
+def list_packs(repo_path):
+    """Return the paths of all .pack files of a repository, sorted"""
+    pack_dir = objects_dir(repo_path) / 'pack'
+    if not pack_dir.is_dir():
+        return []
+    return sorted(p for p in pack_dir.iterdir() if p.suffix == '.pack')
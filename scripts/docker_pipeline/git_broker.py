@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Git Command Broker
+Answers object and ref queries for one repository over long-lived
+`git cat-file --batch-check` / `--batch` pipes instead of one fork per query
+"""
+
+import io
+import subprocess
+import threading
+from pathlib import Path
+
+import instrumentation
+
+# Configuration
+OBJECT_READ_BLOCK = 64 * 1024             # Bytes read off the cat-file pipe at a time
+OBJECT_DRAIN_MAX_BYTES = 4 * 1024 * 1024  # Larger unread remainders restart the pipe instead of being drained
+
+class ObjectStream(io.RawIOBase):
+    """Raw reader over one object's content on a broker's `--batch` pipe"""
+
+    def __init__(self, broker, size):
+        self._broker = broker
+        self._remaining = size
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self._remaining, OBJECT_READ_BLOCK)
+        if not size:
+            return 0
+        buffer[:size] = self._broker._read_content(size)
+        self._remaining -= size
+        return size
+
+    def close(self):
+        if not self.closed:
+            try:
+                self._broker._end_object(self._remaining)
+            finally:
+                super().close()
+
+class GitBroker:
+    def __init__(self, repo_path):
+        self.repo_path = Path(repo_path)
+        self._processes = {}   # mode ('--batch-check' / '--batch') -> Popen
+        self._headers = {}     # memoized rev -> (oid, type, size) or None
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.processes_started = 0
+
+    def _process(self, mode):
+        """Return the running cat-file process for a mode, starting it on first use"""
+        process = self._processes.get(mode)
+        if process is None or process.poll() is not None:
+            process = subprocess.Popen(
+                ['git', 'cat-file', mode],
+                cwd=self.repo_path,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL
+            )
+            self._processes[mode] = process
+            self.processes_started += 1
+            instrumentation.subprocess_started('cat-file')
+        return process
+
+    def _request(self, mode, rev):
+        """Send one object name and return the parsed header line, or None if missing"""
+        if '\n' in rev:
+            return None
+        process = self._process(mode)
+        try:
+            process.stdin.write(rev.encode() + b'\n')
+            process.stdin.flush()
+            line = process.stdout.readline().decode().split()
+        except OSError:
+            self._stop(mode)
+            return None
+        self.queries += 1
+        # "<oid> <type> <size>" or "<name> missing" / "<name> ambiguous"
+        if len(line) != 3:
+            return None
+        return line[0], line[1], int(line[2])
+
+    def object_header(self, rev):
+        """Resolve a rev or object ID to (oid, type, size); memoized per broker"""
+        with self._lock:
+            if rev not in self._headers:
+                self._headers[rev] = self._request('--batch-check', rev)
+            return self._headers[rev]
+
+    def rev_parse(self, rev):
+        """Resolve a rev expression such as HEAD^{tree} to an object ID"""
+        header = self.object_header(rev)
+        return header[0] if header else None
+
+    def object_exists(self, oid):
+        """Check whether an object is present in the local object database"""
+        return self.object_header(oid) is not None
+
+    def open_object(self, rev):
+        """Open an object's content for streaming, returning ((oid, type, size), file) or None
+
+        The file reads the content off the `--batch` pipe in blocks of
+        OBJECT_READ_BLOCK bytes, so memory stays flat however large the
+        object is. The broker is locked until the file is closed: closing it
+        drains what is left of the object, or restarts the pipe when more
+        than OBJECT_DRAIN_MAX_BYTES would have to be skipped.
+        """
+        self._lock.acquire()
+        try:
+            header = self._request('--batch', rev)
+        except BaseException:
+            self._lock.release()
+            raise
+        if header is None:
+            self._lock.release()
+            return None
+        return header, io.BufferedReader(ObjectStream(self, header[2]), OBJECT_READ_BLOCK)
+
+    def read_object(self, rev):
+        """Read an object's content, returning (oid, type, bytes) or None"""
+        opened = self.open_object(rev)
+        if opened is None:
+            return None
+        header, stream = opened
+        try:
+            with stream:
+                content = stream.read()
+        except OSError:
+            return None
+        return header[0], header[1], content
+
+    def _read_content(self, size):
+        """Read exactly size bytes of the current object off the `--batch` pipe"""
+        data = self._processes['--batch'].stdout.read(size)
+        if len(data) != size:
+            raise OSError("git cat-file --batch ended inside an object")
+        return data
+
+    def _end_object(self, remaining):
+        """Skip the rest of the current object and its trailing LF, then unlock the broker"""
+        try:
+            if remaining + 1 > OBJECT_DRAIN_MAX_BYTES:
+                self._stop('--batch')
+                return
+            remaining += 1  # Content is followed by a single newline
+            while remaining:
+                remaining -= len(self._read_content(min(remaining, OBJECT_READ_BLOCK)))
+        except OSError:
+            self._stop('--batch')
+        finally:
+            self._lock.release()
+
+    def _stop(self, mode):
+        process = self._processes.pop(mode, None)
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        process.stdout.close()
+
+    def close(self):
+        """Shut down all cat-file pipes"""
+        with self._lock:
+            for mode in list(self._processes):
+                self._stop(mode)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
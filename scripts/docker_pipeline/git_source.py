@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Git Object Source
+Lists a repository's HEAD tree with one `git ls-tree -r -l` call and reads
+blob contents through its `git cat-file --batch` pipe, so phase 3 can build
+the dataset from clones without a checked-out working tree
+"""
+
+import io
+import os
+import posixpath
+import subprocess
+from pathlib import PurePosixPath
+
+import file_policy
+import instrumentation
+from repo_walker import walks_path
+
+SYMLINK_MODE = b'120000'
+SYMLINK_MAX_HOPS = 40  # Longest symlink chain followed, matching the kernel's limit
+
+def head_tree_id(repo_path):
+    """HEAD's tree ID, or None; the git source reads exactly this tree, so no clean check is needed"""
+    try:
+        with instrumentation.git_span('rev-parse'):
+            return subprocess.run(['git', '-C', str(repo_path), 'rev-parse', '--verify', '-q', 'HEAD^{tree}'],
+                                  capture_output=True, text=True, check=True).stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def resolve_symlink(broker, path, links, blobs):
+    """Blob (oid, size) a symlink resolves to inside the tree, or None
+
+    Like is_file() on a checkout: chains are followed, while links to
+    directories or out of the repository resolve to nothing.
+    """
+    for _ in range(SYMLINK_MAX_HOPS):
+        target = broker.read_object(links[path])
+        if target is None:
+            return None
+        target = os.fsdecode(target[2])
+        if target.startswith('/'):
+            return None
+        path = posixpath.normpath(posixpath.join(posixpath.dirname(path), target))
+        if path.startswith('../') or path == '..':
+            return None
+        if path not in links:
+            return blobs.get(path)
+    return None
+
+def walk_tree_files(broker, excluded_names=(), exclude_globs=(), include_globs=()):
+    """Yield (relative_path, oid, size) for every file blob in HEAD's tree
+
+    Filters and order match repo_walker.walk_repo_files on a clean checkout
+    of the same tree: a path is dropped if any of its directories or the
+    file itself matches excluded_names or exclude_globs, and files come
+    sorted by their path parts. Symlinks to files in the tree yield their
+    target's blob under the link's path; submodules are skipped. Sizes come
+    from the tree listing, so only symlink targets are read here.
+    """
+    try:
+        with instrumentation.git_span('ls-tree'):
+            output = subprocess.run(['git', '-C', str(broker.repo_path), 'ls-tree', '-r', '-l', '-z', '--full-tree',
+                                     'HEAD'], capture_output=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return
+    blobs = {}
+    links = {}
+    for record in output.split(b'\0'):
+        if not record:
+            continue
+        info, _, path = record.partition(b'\t')
+        mode, kind, oid, size = info.split()
+        if kind != b'blob':
+            continue
+        if mode == SYMLINK_MODE:
+            links[os.fsdecode(path)] = oid.decode()
+        else:
+            blobs[os.fsdecode(path)] = (oid.decode(), int(size))
+
+    files = []
+    for relative_path in list(blobs) + list(links):
+        if not walks_path(relative_path, excluded_names, exclude_globs, include_globs):
+            continue
+        blob = blobs.get(relative_path) or resolve_symlink(broker, relative_path, links, blobs)
+        if blob:
+            files.append((relative_path.split('/'), relative_path, *blob))
+    files.sort()
+    for _, relative_path, oid, size in files:
+        yield relative_path, oid, size
+
+class GitBlob:
+    """One blob of a repository, opened like a Path through its GitBroker
+
+    Binary opens serve the file policy's prefix sniff and return only the
+    first SNIFF_BYTES; a blob that fits in them is kept, so the text read
+    that follows does not fetch it again. Text opens stream the blob off
+    the cat-file pipe and release the broker when closed.
+    """
+
+    def __init__(self, broker, oid, relative_path):
+        self.broker = broker
+        self.oid = oid
+        self.relative_path = relative_path
+        self.name = PurePosixPath(relative_path).name
+        self._data = None   # Whole content, when the prefix sniff already read all of it
+
+    def __str__(self):
+        return f"{self.relative_path} (blob {self.oid[:12]})"
+
+    def _open_stream(self):
+        opened = self.broker.open_object(self.oid)
+        if opened is None:
+            raise FileNotFoundError(f"Blob {self.oid} is missing from {self.broker.repo_path}")
+        return opened[1]
+
+    def open(self, mode='r', buffering=-1, encoding=None, errors=None, newline=None):
+        """The sniff prefix as bytes for 'rb'; otherwise text decoded the way open() decodes a file"""
+        if 'b' in mode:
+            if self._data is not None:
+                return io.BytesIO(self._data[:file_policy.SNIFF_BYTES])
+            with self._open_stream() as stream:
+                prefix = stream.read(file_policy.SNIFF_BYTES)
+                if not stream.peek(1):
+                    self._data = prefix
+            return io.BytesIO(prefix)
+        if self._data is not None:
+            stream, self._data = io.BytesIO(self._data), None
+        else:
+            stream = self._open_stream()
+        return io.TextIOWrapper(stream, encoding=encoding, errors=errors, newline=newline)
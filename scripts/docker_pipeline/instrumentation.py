@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Pipeline Instrumentation
+Timed spans for phases, repositories, verification levels, git subprocesses
+and dataset files, with bytes, peak RSS and subprocess counts, exported as
+JSON lines and as a Prometheus text-format file. Off by default: span()
+then returns a shared no-op object and nothing is measured.
+"""
+
+import json
+import resource
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+# Configuration
+METRICS_DIR = Path('/app/output')
+METRICS_JSONL = 'metrics.jsonl'
+METRICS_PROM = 'metrics.prom'
+PROM_LABELS = ('phase', 'repo', 'level', 'command')  # Other labels (e.g. path) stay in the JSON lines
+RESOURCE_SPANS = {'phase', 'repo', 'level'}         # Spans that also sample peak RSS
+# Children's peak RSS is an upper bound on Linux: a forked child starts with its parent's high-water mark
+
+def escape(value):
+    """Escape a Prometheus label value"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class _NullSpan:
+    """Stands in for a span while instrumentation is off"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add(self, **counters):
+        pass
+
+NULL_SPAN = _NullSpan()
+
+class Span:
+    """One timed region; nested spans in the same thread inherit its labels"""
+
+    def __init__(self, recorder, name, labels):
+        self.recorder = recorder
+        self.name = name
+        self.labels = labels
+        self.counters = {}
+        self.parent = None
+
+    def add(self, **counters):
+        """Accumulate counters such as bytes_read or bytes_written on this span"""
+        for key, value in counters.items():
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def __enter__(self):
+        stack = self.recorder.stack()
+        if stack:
+            self.parent = stack[-1]
+            self.labels = dict(self.parent.labels, **self.labels)
+        stack.append(self)
+        self.start = time.time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self._start
+        self.recorder.stack().pop()
+        self.recorder.finish(self, seconds, exc_type is not None)
+        return False
+
+class Recorder:
+    """Writes finished spans as JSON lines and keeps per-series totals for Prometheus"""
+
+    def __init__(self, output_dir=METRICS_DIR):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.jsonl_path = self.output_dir / METRICS_JSONL
+        self.prom_path = self.output_dir / METRICS_PROM
+        self._jsonl = open(self.jsonl_path, 'w', encoding='utf-8')
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._next_id = 0
+        # (name, prom labels) -> [count, seconds, errors, {counter: total}]
+        self.series = defaultdict(lambda: [0, 0.0, 0, defaultdict(int)])
+        self.subprocesses = defaultdict(int)
+
+    def stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def span(self, name, labels):
+        span = Span(self, name, labels)
+        with self._lock:
+            self._next_id += 1
+            span.id = self._next_id
+        return span
+
+    def count_subprocess(self, command):
+        with self._lock:
+            self.subprocesses[command] += 1
+
+    def finish(self, span, seconds, error):
+        record = {'span': span.name, 'id': span.id, 'parent': span.parent.id if span.parent else None,
+                  'start': round(span.start, 6), 'seconds': round(seconds, 6), **span.labels, **span.counters}
+        if error:
+            record['error'] = True
+        if span.name in RESOURCE_SPANS:
+            record['peak_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            record['children_peak_rss_kb'] = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+        key = (span.name, tuple((label, str(span.labels[label])) for label in PROM_LABELS if label in span.labels))
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            self._jsonl.write(line)
+            totals = self.series[key]
+            totals[0] += 1
+            totals[1] += seconds
+            totals[2] += bool(error)
+            for counter, value in span.counters.items():
+                totals[3][counter] += value
+
+    def write_prometheus(self):
+        """Write the totals in Prometheus text exposition format"""
+        def series(labels):
+            return '{' + ','.join(f'{key}="{escape(value)}"' for key, value in labels) + '}'
+
+        # (metric, help, counter it needs or None, value from the totals)
+        metrics = [
+            ('pipeline_span_total', 'Finished spans', None, lambda t: t[0]),
+            ('pipeline_span_seconds_total', 'Wall time spent in spans', None, lambda t: round(t[1], 6)),
+            ('pipeline_span_errors_total', 'Spans that ended with an exception', None, lambda t: t[2]),
+        ]
+        for counter in sorted({counter for totals in self.series.values() for counter in totals[3]}):
+            metrics.append((f'pipeline_{counter}_total', f'{counter.replace("_", " ").capitalize()} in spans',
+                            counter, lambda t, counter=counter: t[3][counter]))
+
+        lines = []
+        for metric, help_text, counter, value in metrics:
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for (name, labels), totals in sorted(self.series.items()):
+                if counter is None or counter in totals[3]:
+                    lines.append(f"{metric}{series((('span', name),) + labels)} {value(totals)}")
+        lines.append("# HELP pipeline_subprocesses_total Subprocesses started, by git command")
+        lines.append("# TYPE pipeline_subprocesses_total counter")
+        for command, count in sorted(self.subprocesses.items()):
+            lines.append(f'pipeline_subprocesses_total{{command="{escape(command)}"}} {count}')
+        lines.append("# HELP pipeline_peak_rss_bytes Peak resident set size")
+        lines.append("# TYPE pipeline_peak_rss_bytes gauge")
+        for process, who in (('self', resource.RUSAGE_SELF), ('children', resource.RUSAGE_CHILDREN)):
+            lines.append(f'pipeline_peak_rss_bytes{{process="{process}"}} {resource.getrusage(who).ru_maxrss * 1024}')
+
+        tmp_path = self.prom_path.with_name(self.prom_path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        tmp_path.replace(self.prom_path)
+
+    def close(self):
+        self.write_prometheus()
+        self._jsonl.close()
+
+_recorder = None
+
+def enable(output_dir=METRICS_DIR):
+    """Start recording spans to METRICS_JSONL under output_dir"""
+    global _recorder
+    _recorder = Recorder(output_dir)
+    return _recorder
+
+def finish():
+    """Stop recording and write the Prometheus file; returns the recorder or None"""
+    global _recorder
+    recorder, _recorder = _recorder, None
+    if recorder:
+        recorder.close()
+    return recorder
+
+def span(name, **labels):
+    """Context manager timing a region; a shared no-op while instrumentation is off"""
+    if _recorder is None:
+        return NULL_SPAN
+    return _recorder.span(name, labels)
+
+def subprocess_started(command):
+    """Count a long-lived subprocess that has no span of its own"""
+    if _recorder is not None:
+        _recorder.count_subprocess(command)
+
+def git_span(command):
+    """Span for one git subprocess, also counted under its git command"""
+    if _recorder is None:
+        return NULL_SPAN
+    _recorder.count_subprocess(command)
+    return _recorder.span('git', {'command': command})
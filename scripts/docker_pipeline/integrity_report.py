@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Integrity Report
+Append-only JSON-lines audit history: each run adds a run_start record, one
+record per repository as soon as its audit finishes and a run_end record
+with the summary. A byte-offset index of run starts lets the loader jump to
+a run instead of reading months of history, and a compact summary of the
+latest run is written next to the report.
+"""
+
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+
+REPORT_INDEX_SUFFIX = '.index'  # <report>.index: one {run_id, offset} line per run; run IDs are start times
+
+def index_path(report_path):
+    report_path = Path(report_path)
+    return report_path.with_name(report_path.name + REPORT_INDEX_SUFFIX)
+
+def _append(path, record, sync=True):
+    """Append one JSON line and return the byte offset it starts at"""
+    with open(path, 'ab') as f:
+        offset = f.tell()
+        f.write(json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n')
+        f.flush()
+        if sync:
+            os.fsync(f.fileno())
+    return offset
+
+class IntegrityReport:
+    """Streams one audit run into the report and keeps the tallies for its summary"""
+
+    def __init__(self, report_path, summary_path, levels, **run_info):
+        self.report_path = Path(report_path)
+        self.summary_path = Path(summary_path)
+        self.report_path.parent.mkdir(parents=True, exist_ok=True)
+        self.levels = list(levels)
+        self.started_at = datetime.now()
+        self.run_id = self.started_at.isoformat()
+        self.run_info = dict(run_info, levels_checked=self.levels)
+        self.total = self.passed = 0
+        self.level_counts = {level: [0, 0] for level in self.levels}  # level -> [passed, total]
+        self.failures = []
+        self._lock = threading.Lock()
+        offset = _append(self.report_path, dict(type='run_start', run_id=self.run_id, **self.run_info))
+        _append(index_path(self.report_path), {'run_id': self.run_id, 'offset': offset})
+
+    def add(self, result):
+        """Durably record one repository's result; safe to call from audit threads"""
+        record = dict(result, type='repo', run_id=self.run_id)
+        with self._lock:
+            _append(self.report_path, record)
+            self.total += 1
+            self.passed += result['overall_status'] == 'PASS'
+            for level in self.levels:
+                level_data = result['levels'].get(f'level_{level}')
+                if level_data:
+                    self.level_counts[level][0] += level_data['status'] == 'PASS'
+                    self.level_counts[level][1] += 1
+            if result['overall_status'] != 'PASS':
+                self.failures.append({
+                    'repo': result['repo'],
+                    'levels': {key.replace('level_', ''): {k: v for k, v in data.items() if k in ('status', 'message')}
+                               for key, data in result['levels'].items() if data['status'] != 'PASS'}
+                })
+
+    def summary(self, duration):
+        return dict(
+            self.run_info,
+            run_id=self.run_id,
+            verification_date=self.run_id,
+            duration_seconds=duration,
+            summary={'total': self.total, 'passed': self.passed, 'failed': self.total - self.passed},
+            levels={str(level): {'passed': passed, 'total': total}
+                    for level, (passed, total) in self.level_counts.items()},
+            failed_repositories=sorted(self.failures, key=lambda failure: failure['repo'])
+        )
+
+    def close(self, duration):
+        """Append the run_end record and write the compact summary; returns the summary"""
+        summary = self.summary(duration)
+        _append(self.report_path, dict(summary, type='run_end'))
+        tmp_path = self.summary_path.with_name(self.summary_path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        os.replace(tmp_path, self.summary_path)
+        return summary
+
+def list_runs(report_path):
+    """Return the {run_id, offset} entries of every indexed run, oldest first"""
+    runs = []
+    try:
+        with open(index_path(report_path), 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    runs.append(json.loads(line))
+                except ValueError:
+                    continue
+    except OSError:
+        pass
+    return runs
+
+def _start_offset(report_path, run_id=None, since=None):
+    """Byte offset to start reading at for a run or a start time; 0 if the index can't say"""
+    runs = list_runs(report_path)
+    if run_id == 'latest' and runs:
+        run_id = runs[-1]['run_id']
+    for run in runs:
+        if (run_id and run['run_id'] == run_id) or (since and run['run_id'] >= since):
+            # The index is only trusted if its offset still lands on that run's start
+            try:
+                with open(report_path, 'rb') as f:
+                    f.seek(run['offset'])
+                    if json.loads(f.readline()).get('run_id') == run['run_id']:
+                        return run['offset']
+            except (OSError, ValueError):
+                pass
+            return 0
+    return 0
+
+def load_report(report_path, repo=None, level=None, status=None, run_id=None, since=None, record_type='repo'):
+    """Yield report records matching every given filter, streaming from disk
+
+    repo and status filter repository results (status applies to the given
+    level, or to the overall status); level keeps results that ran it.
+    run_id (or 'latest') and since (an ISO timestamp) seek straight to the
+    first matching run through the index. record_type selects 'repo',
+    'run_start' or 'run_end' records, or all with None.
+    """
+    if run_id == 'latest':
+        runs = list_runs(report_path)
+        run_id = runs[-1]['run_id'] if runs else None
+    # Cheap substring checks skip most lines without parsing them
+    needles = []
+    if record_type:
+        needles.append(f'"type": "{record_type}"')
+    if repo:
+        needles.append(json.dumps({'repo': repo}, ensure_ascii=False)[1:-1])
+    if run_id:
+        needles.append(json.dumps({'run_id': run_id})[1:-1])
+    needles = [needle.encode('utf-8') for needle in needles]
+    level_key = f'level_{level}' if level is not None else None
+
+    try:
+        f = open(report_path, 'rb')
+    except OSError:
+        return
+    with f:
+        f.seek(_start_offset(report_path, run_id, since))
+        in_run = False
+        for line in f:
+            # A run's records end where the next run starts
+            if run_id and line.startswith(b'{"type": "run_start"'):
+                if in_run:
+                    break
+                in_run = json.dumps({'run_id': run_id})[1:-1].encode() in line
+            if not all(needle in line for needle in needles):
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # A torn last line from an interrupted run
+            if record_type and record.get('type') != record_type:
+                continue
+            if run_id and record.get('run_id') != run_id:
+                continue
+            if since and record.get('run_id', '') < since:
+                continue
+            if repo and record.get('repo') != repo:
+                continue
+            if level_key and level_key not in record.get('levels', {}):
+                continue
+            if status:
+                levels = record.get('levels', {})
+                actual = levels[level_key].get('status') if level_key else record.get('overall_status')
+                if actual != status:
+                    continue
+            yield record
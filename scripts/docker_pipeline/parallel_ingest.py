@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Parallel File Ingestion
+Reads and decodes phase 3 source files on a thread pool ahead of the single
+dataset writer, handing them back strictly in input order with a bounded
+read-ahead window
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Configuration
+INGEST_WORKERS = 1                           # 1 = sequential, the writer reads each file itself
+INGEST_MAX_INFLIGHT_BYTES = 64 * 1024 * 1024  # Read-ahead budget held in memory at once
+INGEST_INLINE_MAX_BYTES = 8 * 1024 * 1024     # Larger files are streamed by the writer instead
+INGEST_WINDOW_PER_WORKER = 4                  # Files queued ahead per worker
+
+def read_source_file(file_path, size, limit=None):
+    """Read and decode one source file, or return None to leave it to the writer
+
+    file_path is a Path or anything opened like one (a git_source.GitBlob).
+    With limit, only the first limit characters are kept, cut back to the
+    end of the last complete line.
+    """
+    if limit:
+        with file_path.open('r', encoding='utf-8', errors='ignore') as infile:
+            content = infile.read(limit)
+        cut = content.rfind('\n') if len(content) == limit else -1
+        return content[:cut + 1] if cut >= 0 else content
+    if size > INGEST_INLINE_MAX_BYTES:
+        return None
+    with file_path.open('r', encoding='utf-8', errors='ignore') as infile:
+        return infile.read()
+
+class FileIngestor:
+    def __init__(self, workers=INGEST_WORKERS, max_inflight_bytes=INGEST_MAX_INFLIGHT_BYTES):
+        self.workers = max(1, workers)
+        self.max_inflight_bytes = max_inflight_bytes
+        self._executor = None
+
+    def __enter__(self):
+        if self.workers > 1:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        return self
+
+    def __exit__(self, *exc):
+        if self._executor:
+            self._executor.shutdown(cancel_futures=True)
+
+    def read_ahead(self, files):
+        """Yield (item, future) in input order for (file_path, size, relative_path, limit) items
+
+        The future resolves to the decoded content (its first limit characters
+        if limit is set), or to None when the file is too large to hold and
+        must be streamed. In sequential mode the future is
+        None and the writer reads the file itself. The window is bounded by
+        file count and by bytes in flight, so memory stays flat however far
+        the workers could run ahead.
+        """
+        if self._executor is None:
+            for item in files:
+                yield item, None
+            return
+
+        window = deque()
+        inflight_bytes = 0
+        max_window = self.workers * INGEST_WINDOW_PER_WORKER
+        for item in files:
+            file_path, size, _, limit = item
+            cost = min(size, limit) if limit else size if size <= INGEST_INLINE_MAX_BYTES else 0
+            # Backpressure: hand finished work to the writer before queueing more
+            while window and (len(window) >= max_window or inflight_bytes + cost > self.max_inflight_bytes):
+                done_item, done_cost, future = window.popleft()
+                inflight_bytes -= done_cost
+                yield done_item, future
+            window.append((item, cost, self._executor.submit(read_source_file, file_path, size, limit)))
+            inflight_bytes += cost
+
+        while window:
+            done_item, _, future = window.popleft()
+            yield done_item, future
@@ -5,135 +5,264 @@ Clones the main ASI ecosystem repository and all component repositories
 """
 
 import os
+import re
+import shutil
 import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-def run_phase1():
-    print("Setting up ASI Ecosystem Integration...")
-    
-    # Change to app directory
-os.chdir('/app/asi-ecosystem')
-    print(f"Current working directory: {os.getcwd()}")
-    
+import instrumentation
+from remote_refs import RemoteRefCache
+from run_journal import fingerprint
+
+# Configuration
+REPOSITORIES_DIR = Path('/app/repositories')
+MIRROR_CACHE_DIR = Path('/app/output/.cache/mirrors')  # Bare mirrors kept between container runs
+ECOSYSTEM_REPO = 'asi-ecosystem'
+CLONE_URL_TEMPLATE = 'https://github.com/ronniross/{name}.git'
+README_REPO_PATTERN = re.compile(r'\(https://github\.com/ronniross/([A-Za-z0-9_-]+)\)')
+CLONE_WORKERS = 4        # Repositories cloned at once
+CLONE_RETRIES = 3        # Attempts per repository
+CLONE_BACKOFF = 2.0      # Seconds before the first retry, doubled after each failure
+CLONE_TIMEOUT = 900      # Seconds a single git command may take
+NO_CHECKOUT_PATTERN = '/.pipeline-no-checkout'  # Sparse pattern matching no file: clones without a working tree
+
+def git(*args, cwd=None):
+    """Run a git command, raising CalledProcessError with its stderr on failure"""
+    with instrumentation.git_span(args[0]):
+        return subprocess.run(['git', *args], cwd=cwd, capture_output=True, text=True,
+                              check=True, timeout=CLONE_TIMEOUT).stdout
+
+def ecosystem_repo_names(repo_path):
+    """Repository names linked from the ecosystem README, in first-seen order
+
+    The README is read from HEAD when the clone has no working tree.
+    """
+    readme_path = Path(repo_path) / 'README.md'
+    if readme_path.exists():
+        text = readme_path.read_text(encoding='utf-8', errors='ignore')
+    else:
+        text = git('show', 'HEAD:README.md', cwd=repo_path)
+    names = []
+    for name in README_REPO_PATTERN.findall(text):
+        if name not in names:
+            names.append(name)
+    return names
+
+def local_repositories(repositories_dir):
+    """Repository directories on disk, sorted; hidden ones (e.g. unfinished clones) are left out"""
+    return sorted(d for d in Path(repositories_dir).iterdir() if d.is_dir() and not d.name.startswith('.'))
+
+def sync_mirror(url, mirror_path, refs=None):
+    """Create or update a bare mirror of url's branches and tags; returns 'created' or 'updated'
+
+    refs is the remote's ls-remote snapshot (a RemoteRefCache entry). The
+    mirror's HEAD is pointed at the branch the remote's HEAD names on every
+    sync, since a fetch alone never moves it when the default branch changes.
+    """
+    if (mirror_path / 'HEAD').exists():
+        git('fetch', '--quiet', '--prune', '--tags', 'origin', cwd=mirror_path)
+        set_mirror_head(mirror_path, refs)
+        return 'updated'
+    tmp_path = mirror_path.with_name(mirror_path.name + '.tmp')
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    git('clone', '--quiet', '--bare', url, str(tmp_path))
+    git('config', 'remote.origin.fetch', '+refs/heads/*:refs/heads/*', cwd=tmp_path)
+    # Lets partial and shallow working clones be served from the mirror
+    git('config', 'uploadpack.allowFilter', 'true', cwd=tmp_path)
+    set_mirror_head(tmp_path, refs)
+    os.replace(tmp_path, mirror_path)
+    return 'created'
+
+def set_mirror_head(mirror_path, refs):
+    """Point a mirror's HEAD at the remote's default branch, if the mirror has that branch"""
+    target = refs['symrefs'].get('HEAD') if refs else None
+    if not target:
+        return
     try:
-        # Step 1: Clone the main ASI ecosystem repository
-        print("Step 1: Cloning the main asi-ecosystem repository...")
-        
-        # Remove any existing asi-ecosystem directory
-        if os.path.exists('asi-ecosystem'):
-            print("Removing existing asi-ecosystem directory...")
-            subprocess.run(['rm', '-rf', 'asi-ecosystem'], check=True)
-        
-        # Clone the main repository
-        result = subprocess.run([
-            'git', 'clone',
-            'https://github.com/ronniross/asi-ecosystem.git'
-        ], capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            print("Successfully cloned asi-ecosystem repository")
-        else:
-            print("Error cloning repository:")
-            print(result.stderr)
-            return False
-        
-        # Step 2: Navigate to the directory and check contents
-        print("Step 2: Navigating into the directory...")
-        os.chdir('/app/asi-ecosystem')
-        print(f"Current working directory: {os.getcwd()}")
-        
-        print("Repository contents:")
-        for item in os.listdir('.'):
-            print(f"  {item}" if os.path.isdir(item) else f"  {item}")
-        
-        # Step 3: Check if the script exists and make it executable
-        script_path = './scripts/clone_ecosystem.sh'
-        print(f"Checking for script at: {script_path}")
-        
-        if os.path.exists(script_path):
-            print("Script found!")
-            # Make the script executable
-            subprocess.run(['chmod', '+x', script_path], check=True)
-            print("Made script executable")
-        else:
-            print("Script not found. Listing scripts directory:")
-            if os.path.exists('scripts'):
-                for item in os.listdir('scripts'):
-                    print(f"  scripts/{item}")
-            else:
-                print("  scripts directory does not exist")
-            return False
-        
-        # Step 4: Execute the integration script
-        print("Step 3: Running the ecosystem integration script...")
-        
-        if os.path.exists(script_path):
+        git('show-ref', '--verify', '--quiet', target, cwd=mirror_path)
+    except subprocess.CalledProcessError:
+        return
+    git('symbolic-ref', 'HEAD', target, cwd=mirror_path)
+
+def worktree_head(dest):
+    """HEAD of a working clone with no local changes or untracked files, else None"""
+    try:
+        if git('status', '--porcelain', cwd=dest).strip():
+            return None
+        return git('rev-parse', '--verify', '-q', 'HEAD', cwd=dest).strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def set_checkout(dest, checkout):
+    """Switch a clone between a full working tree and none (an empty sparse checkout)"""
+    if not checkout:
+        git('sparse-checkout', 'set', '--no-cone', NO_CHECKOUT_PATTERN, cwd=dest)
+    elif git('config', '--bool', '--default', 'false', 'core.sparseCheckout', cwd=dest).strip() == 'true':
+        git('sparse-checkout', 'disable', cwd=dest)
+
+def sync_worktree(url, source, dest, filter_spec=None, depth=None, checkout=True):
+    """Clone source into dest, or bring an existing clone up to source's HEAD in place
+
+    source is the mirror path or, without a mirror, url itself. Updating in
+    place leaves unchanged files untouched, so their stat data stays valid
+    for phase 2's incremental audit. origin always points at url.
+    Without checkout the clone keeps its index but writes no files: every
+    entry is marked skip-worktree, so `git status` stays clean and phase 3
+    reads the tree from the object database.
+    """
+    options = []
+    if filter_spec:
+        options.append(f'--filter={filter_spec}')
+    if depth:
+        options.append(f'--depth={depth}')
+    # Plain local clones hardlink the mirror's objects; filters and depth need the file:// transport
+    if isinstance(source, Path):
+        source = source.resolve().as_uri() if options else str(source)
+
+    if (dest / '.git').exists():
+        set_checkout(dest, checkout)
+        git('fetch', '--quiet', '--prune', *options, source, '+refs/heads/*:refs/remotes/origin/*', cwd=dest)
+        git('fetch', '--quiet', *options, source, 'HEAD', cwd=dest)
+        git('reset', '--quiet', '--hard', 'FETCH_HEAD', cwd=dest)
+        git('clean', '--quiet', '-ffd', cwd=dest)
+        git('remote', 'set-url', 'origin', url, cwd=dest)
+        return 'updated'
+
+    tmp_path = dest.with_name(f".{dest.name}.tmp")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    if checkout:
+        git('clone', '--quiet', *options, source, str(tmp_path))
+    else:
+        git('clone', '--quiet', '--no-checkout', *options, source, str(tmp_path))
+        set_checkout(tmp_path, checkout)
+        git('reset', '--quiet', '--hard', 'HEAD', cwd=tmp_path)
+    git('remote', 'set-url', 'origin', url, cwd=tmp_path)
+    shutil.rmtree(dest, ignore_errors=True)
+    os.replace(tmp_path, dest)
+    return 'cloned'
+
+def clone_repository(name, url, mirror_cache=True, filter_spec=None, depth=None, checkout=True, journal=None,
+                     remote_refs=None):
+    """Sync one repository with retries; returns (name, ok, message, seconds)
+
+    With a run journal, a clone whose remote HEAD and options match the last
+    recorded sync and whose working tree is still clean at that commit is
+    left alone without fetching. The remote is asked through remote_refs (a
+    RemoteRefCache shared by the run), once for both the journal and the
+    mirror's HEAD.
+    """
+    with instrumentation.span('repo', phase='clone', repo=name):
+        start = time.monotonic()
+        dest = REPOSITORIES_DIR / name
+        remote_refs = remote_refs or RemoteRefCache(cache_path=None)
+        inputs = None
+        if journal:
+            refs = remote_refs.refs_for_url(url)
+            inputs = fingerprint(url=url, mirror_cache=mirror_cache, filter_spec=filter_spec or '',
+                                 depth=depth or 0, checkout=checkout,
+                                 remote_head=refs['refs'].get('HEAD') if refs else None)
+            recorded = journal.lookup('clone', name, inputs)
+            if recorded and recorded.get('head') and worktree_head(dest) == recorded['head']:
+                return name, True, "unchanged (run journal)", time.monotonic() - start
+        mirror_path = MIRROR_CACHE_DIR / f"{name}.git"
+        error = None
+        for attempt in range(CLONE_RETRIES):
+            if attempt:
+                time.sleep(CLONE_BACKOFF * 2 ** (attempt - 1))
             try:
-                # Run the script and capture output
-                result = subprocess.run([script_path],
-                                      capture_output=True,
-                                      text=True,
-                                      cwd='/app/asi-ecosystem')
-                
-                print("Script output:")
-                print(result.stdout)
-                
-                if result.stderr:
-                    print("Script errors/warnings:")
-                    print(result.stderr)
-                
-                if result.returncode == 0:
-                    print("Script executed successfully!")
-                else:
-                    print(f"Script failed with return code: {result.returncode}")
-                    return False
-                
-            except Exception as e:
-                print(f"Error executing script: {e}")
-                return False
-        else:
-            print("Cannot execute script - file not found")
+                source, mirror_state = url, None
+                if mirror_cache:
+                    if attempt == CLONE_RETRIES - 1 and attempt:
+                        # Last resort: a damaged mirror is rebuilt from scratch
+                        shutil.rmtree(mirror_path, ignore_errors=True)
+                    mirror_state = sync_mirror(url, mirror_path, remote_refs.refs_for_url(url))
+                    source = mirror_path
+                state = sync_worktree(url, source, dest, filter_spec, depth, checkout)
+                message = f"{state} (mirror {mirror_state})" if mirror_state else state
+                if attempt:
+                    message += f" after {attempt + 1} attempts"
+                if journal:
+                    journal.record('clone', name, inputs, {'head': worktree_head(dest)})
+                return name, True, message, time.monotonic() - start
+            except (OSError, subprocess.SubprocessError) as e:
+                lines = (getattr(e, 'stderr', None) or str(e)).strip().splitlines()
+                fatal = [line for line in lines if line.startswith('fatal:')]
+                error = (fatal or lines or [type(e).__name__])[0]
+        return name, False, error, time.monotonic() - start
+
+def run_phase1(workers=None, filter_spec=None, depth=None, mirror_cache=True, checkout=True, journal=None):
+    """Execute Phase 1: Ecosystem Cloning
+
+    The ecosystem repository is synced first, then every repository its
+    README links to, on a pool of `workers` threads. With mirror_cache, bare
+    mirrors under MIRROR_CACHE_DIR persist between runs so only new objects
+    are fetched and working clones are made locally from them. filter_spec
+    (e.g. 'blob:none') and depth make partial or shallow working clones.
+    Without checkout the clones get no working tree; phase 3 then has to
+    read them with the git dataset source.
+    With a run journal, repositories already synced to their remote HEAD
+    are skipped. Every remote is asked once, afresh; the answers are saved
+    to the remote ref cache for later phases.
+    """
+    print("Setting up ASI Ecosystem Integration...")
+    workers = workers or CLONE_WORKERS
+    remote_refs = RemoteRefCache(ttl=0)
+    options = dict(mirror_cache=mirror_cache, filter_spec=filter_spec, depth=depth, checkout=checkout,
+                   journal=journal, remote_refs=remote_refs)
+
+    try:
+        REPOSITORIES_DIR.mkdir(parents=True, exist_ok=True)
+        if mirror_cache:
+            MIRROR_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            print(f"Mirror cache: {MIRROR_CACHE_DIR}")
+        if filter_spec or depth:
+            print(f"Working clones: filter={filter_spec or 'none'}, depth={depth or 'full'}")
+        if not checkout:
+            print("Working clones: no checkout (files stay in the object database)")
+
+        # Step 1: the ecosystem repository, whose README lists the others
+        print(f"Step 1: Syncing the main {ECOSYSTEM_REPO} repository...")
+        name, ok, message, seconds = clone_repository(
+            ECOSYSTEM_REPO, CLONE_URL_TEMPLATE.format(name=ECOSYSTEM_REPO), **options)
+        if not ok:
+            print(f"[x] {name}: {message}")
             return False
-        
-        # Step 5: Verify the final result
-        print("Step 4: Verifying the final result...")
-        
-        print(f"Contents of {os.getcwd()}:")
-        for item in sorted(os.listdir('.')):
-            if os.path.isdir(item):
-                print(f"{item}/")
-                # If it's the repositories folder, show its contents
-                if item == 'repositories':
-                    repo_path = os.path.join('.', item)
-                    if os.path.exists(repo_path):
-                        print(f"  Contents of {item}:")
-                        for repo in sorted(os.listdir(repo_path)):
-                            print(f"    {repo}/")
+        print(f"[✓] {name}: {message} in {seconds:.1f}s")
+
+        # Step 2: every component repository, in parallel
+        names = [n for n in ecosystem_repo_names(REPOSITORIES_DIR / ECOSYSTEM_REPO) if n != ECOSYSTEM_REPO]
+        print(f"Step 2: Syncing {len(names)} component repositories with {workers} workers...")
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = [executor.submit(clone_repository, n, CLONE_URL_TEMPLATE.format(name=n), **options)
+                       for n in names]
+            results = [future.result() for future in futures]
+
+        remote_refs.save()
+        failed = []
+        for name, ok, message, seconds in results:
+            if ok:
+                print(f"[✓] {name}: {message} in {seconds:.1f}s")
             else:
-                print(f" {item}")
-        
-        # Step 6: Summary of cloned repositories
+                print(f"[x] {name}: {message}")
+                failed.append(name)
+
+        # Step 3: Summary of cloned repositories
         print("Summary of cloned repositories:")
-        repositories_path = './repositories'
-        
-        if os.path.exists(repositories_path):
-            repos = [d for d in os.listdir(repositories_path)
-                     if os.path.isdir(os.path.join(repositories_path, d))]
-            
-            print(f"Total repositories cloned: {len(repos)}")
-            for i, repo in enumerate(sorted(repos), 1):
-                repo_path = os.path.join(repositories_path, repo)
-                # Check if it's a git repository
-                git_path = os.path.join(repo_path, '.git')
-                status = "Git repo" if os.path.exists(git_path) else "Not a git repo"
-                print(f"{i:2d}. {repo:<30} {status}")
-        else:
-            print("No repositories folder found")
+        repos = [d.name for d in local_repositories(REPOSITORIES_DIR)]
+        print(f"Total repositories cloned: {len(repos)}")
+        for i, repo in enumerate(repos, 1):
+            status = "Git repo" if (REPOSITORIES_DIR / repo / '.git').exists() else "Not a git repo"
+            print(f"{i:2d}. {repo:<30} {status}")
+
+        if failed:
+            print(f"Phase 1 failed: {len(failed)} repositories could not be cloned: {', '.join(failed)}")
             return False
-        
+
         print("Phase 1 completed successfully!")
         return True
-        
+
     except Exception as e:
         print(f"Phase 1 failed with error: {e}")
         return False
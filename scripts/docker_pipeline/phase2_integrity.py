@@ -7,12 +7,76 @@ Verifies repository integrity at multiple levels and generates report
 import os
 import subprocess
 import hashlib
-import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from datetime import datetime
 from pathlib import Path
 
+import instrumentation
+from audit_manifest import (AuditManifest, AUDIT_MANIFEST_DIR, file_state, is_reusable,
+                            loose_objects_fingerprint, pack_checksums)
+from fsck_tiers import (FSCK_TIERS, TIER_RANK, PACK_DEPTH_RANK, DEFAULT_FSCK_TIER, issue_record,
+                        list_packs, pack_identity, parse_fsck_output, verify_pack_checksum)
+from git_broker import GitBroker
+from integrity_report import IntegrityReport
+from phase1_cloning import local_repositories
+from remote_refs import RemoteRefCache
+from run_journal import fingerprint
+
+# Configuration
+REPOSITORIES_DIR = Path('/app/repositories')
+REPORT_PATH = Path('/app/output/integrity_report.jsonl')  # Append-only audit history, one line per repo
+SUMMARY_PATH = Path('/app/output/integrity_summary.json')  # Compact summary of the latest run
+VERIFICATION_LEVELS = [1, 2, 3, 4]
+AUDIT_WORKERS = 1              # 1 = sequential audit, >1 = concurrent audit
+MAX_NETWORK_JOBS = 4           # Concurrent ls-remote/fetch calls (None = unlimited)
+MAX_CPU_JOBS = os.cpu_count()  # Concurrent fsck/hashing jobs (None = unlimited)
+FSCK_TIER = DEFAULT_FSCK_TIER  # Level 2 depth: 'connectivity', 'loose' or 'full'
+AUDIT_REFS_TTL = 0             # Seconds an earlier run's ls-remote answer may stand in for a new one (0 = always ask)
+
+# Level 3 hashing
+HASH_CHUNK_SIZE = 1024 * 1024  # Files are streamed, memory stays flat on large files
+SYMLINK_MODE = '120000'
+GITLINK_MODE = '160000'
+
+def parse_ls_files_stage(output):
+    """Parse `git ls-files -s -t -z` output into (mode, oid, stage, path, checked_out) tuples
+
+    checked_out is False for skip-worktree entries (tag 'S'), which have no
+    file on disk by design, as in clones made without a checkout.
+    """
+    entries = []
+    for record in output.split('\0'):
+        if not record:
+            continue
+        info, _, path = record.partition('\t')
+        tag, mode, oid, stage = info.split()
+        entries.append((mode, oid, stage, path, tag != 'S'))
+    return entries
+
+def git_blob_id_bytes(data, object_format='sha1'):
+    """Compute the git blob ID for in-memory bytes"""
+    blob = hashlib.new(object_format, b'blob %d\0' % len(data))
+    blob.update(data)
+    return blob.hexdigest()
+
+def git_blob_id(file_path, object_format='sha1', content_sha256=False):
+    """Stream a file once and return (git blob ID, optional SHA-256 of its content)"""
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        blob = hashlib.new(object_format, b'blob %d\0' % size)
+        content = hashlib.sha256() if content_sha256 else None
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            blob.update(chunk)
+            if content:
+                content.update(chunk)
+    return blob.hexdigest(), content.hexdigest() if content else None
+
 class IntegrityVerifier:
-    def __init__(self, repo_path):
+    def __init__(self, repo_path, network_slots=None, cpu_slots=None, buffered=False, remote_refs=None,
+                 manifest=None, full=False, fsck_tier=DEFAULT_FSCK_TIER, journal=None):
         self.repo_path = Path(repo_path)
         self.repo_name = self.repo_path.name
         self.results = {
@@ -20,38 +84,75 @@ class IntegrityVerifier:
             'timestamp': datetime.now().isoformat(),
             'levels': {}
         }
+        # Semaphores shared by all verifiers of one audit run
+        self.network_slots = network_slots or nullcontext()
+        self.cpu_slots = cpu_slots or nullcontext()
+        # Remote refs are asked once per audit and shared by Levels 1 and 4
+        self.remote_refs = remote_refs or RemoteRefCache(cache_path=None, network_slots=network_slots)
+        # One set of cat-file pipes and memoized revs shared by all levels
+        self.git = GitBroker(self.repo_path)
+        # Incremental audit: reuse what the previous run verified unless full=True
+        self.manifest = manifest
+        self.full = full
+        self.fsck_tier = fsck_tier
+        self.previous = {}
+        self.manifest_data = {}
+        # A passing audit is recorded in the run journal and reused while its inputs are unchanged
+        self.journal = journal
+        # In buffered mode output is held back so concurrent repos don't interleave
+        self.buffered = buffered
+        self.output = []
+
+    def log(self, message=""):
+        """Print a line, or hold it until the repo is finished in buffered mode"""
+        if self.buffered:
+            self.output.append(message)
+        else:
+            print(message)
+
+    def flush_output(self):
+        """Print all buffered lines as one block"""
+        if self.output:
+            print("\n".join(self.output))
+            self.output = []
 
     def run_git_command(self, cmd):
         """Execute git command and return output"""
-        result = subprocess.run(
-            cmd,
-            cwd=self.repo_path,
-            capture_output=True,
-            text=True,
-            shell=False
-        )
+        with instrumentation.git_span(cmd[1]):
+            result = subprocess.run(
+                cmd,
+                cwd=self.repo_path,
+                capture_output=True,
+                text=True,
+                shell=False
+            )
         return result.stdout.strip(), result.stderr.strip(), result.returncode
 
+    def remote_snapshot(self):
+        """When the remote refs a level compared against were fetched, and how old they were"""
+        fetched_at = self.remote_refs.fetched_at(self.repo_path)
+        if fetched_at is None:
+            return {}
+        return {'remote_fetched_at': datetime.fromtimestamp(fetched_at).isoformat(),
+                'remote_refs_age': round(max(0.0, time.time() - fetched_at), 1)}
+
     def level_1_commit_and_tree_hash(self):
         """Level 1: Compare local vs remote commit and tree hashes"""
-        print("  [Level 1] Commit & Tree Hash Comparison")
+        self.log("  [Level 1] Commit & Tree Hash Comparison")
 
-        # Get local commit hash
-        local_commit, _, ret1 = self.run_git_command(['git', 'rev-parse', 'HEAD'])
-
-        # Get local tree hash
-        local_tree, _, ret2 = self.run_git_command(['git', 'rev-parse', 'HEAD^{tree}'])
+        # Get local commit and tree hashes
+        local_commit = self.git.rev_parse('HEAD')
+        local_tree = self.git.rev_parse('HEAD^{tree}')
 
         # Get remote commit hash
-        remote_info, _, ret3 = self.run_git_command(['git', 'ls-remote', 'origin', 'HEAD'])
-        remote_commit = remote_info.split()[0] if remote_info else None
+        remote_commit = self.remote_refs.head(self.repo_path)
 
-        if ret1 != 0 or ret2 != 0 or ret3 != 0:
+        if not local_commit or not local_tree or not remote_commit:
             self.results['levels']['level_1'] = {
                 'status': 'ERROR',
                 'message': 'Failed to retrieve git hashes'
             }
-            print("    [x] ERROR: Failed to retrieve git information")
+            self.log("    [x] ERROR: Failed to retrieve git information")
             return False
 
         commit_match = local_commit == remote_commit
@@ -61,124 +162,297 @@ class IntegrityVerifier:
             'local_commit': local_commit,
             'remote_commit': remote_commit,
             'local_tree': local_tree,
-            'commit_match': commit_match
+            'commit_match': commit_match,
+            **self.remote_snapshot()
         }
 
         if commit_match:
-            print("    [✓] PASS - Commits match")
-            print(f"       Commit: {local_commit[:12]}...")
-            print(f"       Tree:   {local_tree[:12]}...")
+            self.log("    [✓] PASS - Commits match")
+            self.log(f"       Commit: {local_commit[:12]}...")
+            self.log(f"       Tree:   {local_tree[:12]}...")
         else:
-            print("    [x] FAIL - Commit mismatch")
-            print(f"       Local:  {local_commit[:12]}...")
-            print(f"       Remote: {remote_commit[:12]}...")
+            self.log("    [x] FAIL - Commit mismatch")
+            self.log(f"       Local:  {local_commit[:12]}...")
+            self.log(f"       Remote: {remote_commit[:12]}...")
 
         return commit_match
 
     def level_2_git_fsck(self):
-        """Level 2: Deep git repository integrity check"""
-        print("  [Level 2] Git Repository Integrity (fsck)")
-
-        output, stderr, returncode = self.run_git_command(['git', 'fsck', '--full'])
-
-        # git fsck returns 0 if no issues
-        passed = returncode == 0 and not any(word in output.lower() for word in ['error', 'missing', 'corrupt'])
+        """Level 2: Git repository integrity check at the configured fsck tier
+
+        Tiers: 'connectivity' (reachability only), 'loose' (loose objects) and
+        'full' (every object). Packs verified by an earlier run and unchanged
+        since are not verified again.
+        """
+        tier = self.fsck_tier
+        self.log(f"  [Level 2] Git Repository Integrity (fsck, {tier})")
+
+        # Nothing fsck looks at has changed since a passing run at this tier or deeper: reuse it
+        fingerprint = {
+            'head': self.git.rev_parse('HEAD'),
+            'packs': pack_checksums(self.repo_path),
+            'loose_objects': loose_objects_fingerprint(self.repo_path)
+        }
+        previous = self.previous.get('level_2')
+        if (previous and previous['fingerprint'] == fingerprint
+                and previous['result']['status'] == 'PASS'
+                and TIER_RANK[previous['result'].get('tier', 'full')] >= TIER_RANK[tier]):
+            self.results['levels']['level_2'] = dict(previous['result'], reused=True)
+            self.manifest_data['level_2'] = previous
+            self.log("    [✓] PASS - Repository integrity verified (unchanged since last audit)")
+            return True
+
+        # Packs are immutable: one whose identity matches an earlier verification is skipped
+        depth = 'objects' if tier == 'full' else 'checksum'
+        known_packs = self.manifest_data.get('verified_packs', {})
+        verified_packs = {}
+        pending_packs = []
+        packs = list_packs(self.repo_path)
+        for pack in packs:
+            entry = known_packs.get(pack.name)
+            if (entry and entry['identity'] == pack_identity(pack)
+                    and PACK_DEPTH_RANK[entry['depth']] >= PACK_DEPTH_RANK[depth]):
+                verified_packs[pack.name] = entry
+            else:
+                pending_packs.append(pack)
+
+        command = FSCK_TIERS[tier]
+        if tier == 'full' and not pending_packs:
+            # Every pack already passed a full check: loose objects and connectivity remain
+            command = FSCK_TIERS['loose']
+
+        pack_issues = []
+        with self.cpu_slots:
+            output, stderr, returncode = self.run_git_command(command)
+            if tier != 'full':
+                for pack in pending_packs:
+                    ok, message = verify_pack_checksum(pack)
+                    if ok:
+                        verified_packs[pack.name] = {'identity': pack_identity(pack), 'depth': 'checksum'}
+                    else:
+                        pack_issues.append(issue_record('error', 'corrupt_pack', message))
+
+        issues = parse_fsck_output(f"{output}\n{stderr}") + pack_issues
+        problems = [issue for issue in issues if issue['severity'] != 'info']
+        passed = returncode == 0 and not any(issue['severity'] == 'error' for issue in issues)
+
+        if passed and tier == 'full':
+            # fsck --full checked every object of the pending packs
+            for pack in pending_packs:
+                verified_packs[pack.name] = {'identity': pack_identity(pack), 'depth': 'objects'}
+        self.manifest_data['verified_packs'] = verified_packs
 
         self.results['levels']['level_2'] = {
             'status': 'PASS' if passed else 'FAIL',
+            'tier': tier,
             'returncode': returncode,
-            'issues_found': [] if passed else output.split('\n')[:5]  # First 5 issues
+            'issue_counts': {severity: sum(1 for issue in issues if issue['severity'] == severity)
+                             for severity in ('error', 'warning', 'info')},
+            'issues_found': problems[:20],  # First 20 errors/warnings
+            'packs_verified': len(pending_packs),
+            'packs_skipped': len(packs) - len(pending_packs),
+            'reused': False
+        }
+        self.manifest_data['level_2'] = {
+            'fingerprint': fingerprint,
+            'result': {k: v for k, v in self.results['levels']['level_2'].items() if k != 'reused'}
         }
 
         if passed:
-            print("    [✓] PASS - Repository integrity verified")
+            self.log("    [✓] PASS - Repository integrity verified")
+            if problems:
+                self.log(f"       Warnings: {len(problems)}")
         else:
-            print("    [x] FAIL - Repository integrity issues detected")
-            if output:
-                print(f"       Issues: {output[:100]}...")
+            self.log("    [x] FAIL - Repository integrity issues detected")
+            for issue in problems[:3]:
+                self.log(f"       - {issue['message'].splitlines()[0][:100]}")
 
         return passed
 
-    def level_3_file_hashing(self):
-        """Level 3: File-by-file and folder structure verification"""
-        print("  [Level 3] File-by-File Hash Verification")
+    def level_3_file_hashing(self, content_sha256=True):
+        """Level 3: File-by-file and folder structure verification
 
-        # Get list of all tracked files
-        files_output, _, ret = self.run_git_command(['git', 'ls-files'])
+        Every tracked file is hashed in process as a git blob and compared with
+        the object ID recorded in the index (one `git ls-files -s` call). Files
+        whose size, mtime, inode and blob ID match the previous audit's manifest
+        are reused without reading them. Entries without a working tree file
+        (skip-worktree) are counted as not checked out; level 2 already
+        verified their objects.
+        """
+        self.log("  [Level 3] File-by-File Hash Verification")
+
+        # Get every tracked file together with its index object ID
+        files_output, _, ret = self.run_git_command(['git', 'ls-files', '-s', '-t', '-z'])
 
         if ret != 0:
             self.results['levels']['level_3'] = {
                 'status': 'ERROR',
                 'message': 'Failed to list git files'
             }
-            print("    [x] ERROR: Failed to list files")
+            self.log("    [x] ERROR: Failed to list files")
             return False
 
-        files = files_output.split('\n') if files_output else []
+        entries = parse_ls_files_stage(files_output)
 
         file_hashes = {}
         corrupted_files = []
-        total_files = len(files)
-
-        # Calculate hash for each file
-        for file in files[:100]:  # Limit to first 100 files for performance
-            if not file:
-                continue
-            file_path = self.repo_path / file
-            if file_path.exists() and file_path.is_file():
+        missing_files = []
+        skipped_submodules = 0
+        not_checked_out = 0
+        checked_files = 0
+        object_format = 'sha1'
+        total_files = len(entries)
+
+        previous_files = self.previous.get('files', {})
+        verified_at_ns = self.previous.get('verified_at_ns', 0)
+        verified_states = {}
+        reverified_files = []
+        files_reused = 0
+
+        with self.cpu_slots:
+            for mode, index_oid, stage, file, checked_out in entries:
+                object_format = 'sha256' if len(index_oid) == 64 else 'sha1'
+                if mode == GITLINK_MODE:
+                    # Submodule commits have no content in this working tree
+                    skipped_submodules += 1
+                    continue
+                if not checked_out:
+                    not_checked_out += 1
+                    continue
+                file_path = self.repo_path / file
                 try:
-                    with open(file_path, 'rb') as f:
-                        file_hash = hashlib.sha256(f.read()).hexdigest()
-                        file_hashes[file] = file_hash
-
-                        # Verify against git's hash
-                        git_hash, _, ret = self.run_git_command(['git', 'hash-object', file])
-                        if ret != 0 or not git_hash:
-                            corrupted_files.append(file)
-                except Exception as e:
+                    state = file_state(os.lstat(file_path))
+                except FileNotFoundError:
+                    missing_files.append(file)
+                    continue
+                except OSError:
+                    corrupted_files.append(file)
+                    continue
+
+                previous = previous_files.get(file)
+                if is_reusable(previous, state, index_oid, verified_at_ns):
+                    files_reused += 1
+                    checked_files += 1
+                    verified_states[file] = previous
+                    if previous[4]:
+                        file_hashes[file] = previous[4]
+                    continue
+
+                reverified_files.append(file)
+                try:
+                    if mode == SYMLINK_MODE:
+                        blob_id = git_blob_id_bytes(os.fsencode(os.readlink(file_path)), object_format)
+                        digest = None
+                    else:
+                        blob_id, digest = git_blob_id(file_path, object_format, content_sha256)
+                except FileNotFoundError:
+                    missing_files.append(file)
+                    continue
+                except OSError:
+                    corrupted_files.append(file)
+                    continue
+
+                checked_files += 1
+                if digest:
+                    file_hashes[file] = digest
+                verified_states[file] = state + [index_oid, digest]
+                if blob_id != index_oid:
                     corrupted_files.append(file)
 
-        passed = len(corrupted_files) == 0
+        # Raw bytes differ from the index for files git stores through clean/eol
+        # filters; let git re-hash just those with filters applied (one fork)
+        if corrupted_files:
+            corrupted_files = self.recheck_with_filters(corrupted_files, entries)
+        for file in corrupted_files:
+            verified_states.pop(file, None)
+        self.manifest_data['files'] = verified_states
+
+        passed = not corrupted_files and not missing_files
 
         self.results['levels']['level_3'] = {
             'status': 'PASS' if passed else 'FAIL',
-            'total_files_checked': len(file_hashes),
+            'total_files_checked': checked_files,
             'total_files_in_repo': total_files,
+            'object_format': object_format,
             'corrupted_files': corrupted_files,
+            'missing_files': missing_files,
+            'skipped_submodules': skipped_submodules,
+            'not_checked_out': not_checked_out,
+            'files_reused': files_reused,
+            'files_reverified': len(reverified_files),
             'sample_hashes': dict(list(file_hashes.items())[:3])  # First 3 as sample
         }
+        if self.previous:
+            # Steady state lists are short; on a first or full run everything is re-verified
+            self.results['levels']['level_3']['reverified_files'] = reverified_files
 
         if passed:
-            print(f"    [✓] PASS - All files verified ({len(file_hashes)} checked)")
+            self.log(f"    [✓] PASS - All files verified ({checked_files} checked, {files_reused} unchanged"
+                     + (f", {not_checked_out} not checked out)" if not_checked_out else ")"))
             if file_hashes:
                 sample_file = list(file_hashes.keys())[0]
-                print(f"       Sample: {sample_file[:40]}... -> {file_hashes[sample_file][:12]}...")
+                self.log(f"       Sample: {sample_file[:40]}... -> {file_hashes[sample_file][:12]}...")
         else:
-            print(f"    [x] FAIL - {len(corrupted_files)} corrupted files detected")
-            for cf in corrupted_files[:3]:
-                print(f"       - {cf}")
+            self.log(f"    [x] FAIL - {len(corrupted_files)} corrupted, {len(missing_files)} missing files detected")
+            for cf in (corrupted_files + missing_files)[:3]:
+                self.log(f"       - {cf}")
 
         return passed
 
+    def recheck_with_filters(self, files, entries):
+        """Return the files whose filtered git hash still differs from the index"""
+        index_oids = {file: oid for _, oid, _, file, _ in entries}
+        with instrumentation.git_span('hash-object'):
+            result = subprocess.run(
+                ['git', 'hash-object', '--stdin-paths'],
+                cwd=self.repo_path,
+                input='\n'.join(files) + '\n',
+                capture_output=True,
+                text=True
+            )
+        if result.returncode != 0:
+            return files
+        hashed = result.stdout.split()
+        return [file for file, oid in zip(files, hashed) if oid != index_oids[file]]
+
     def level_4_tree_comparison(self):
         """Level 4: Complete tree hash comparison"""
-        print("  [Level 4] Complete Tree Hash Verification")
-
-        # Get local tree
-        local_tree, _, ret1 = self.run_git_command(['git', 'rev-parse', 'HEAD^{tree}'])
-
-        # Fetch latest from remote
-        _, _, ret2 = self.run_git_command(['git', 'fetch', 'origin', '--quiet'])
-
-        # Get remote tree
-        remote_tree, _, ret3 = self.run_git_command(['git', 'rev-parse', 'origin/HEAD^{tree}'])
-
-        if ret1 != 0 or ret3 != 0:
+        self.log("  [Level 4] Complete Tree Hash Verification")
+
+        # Get local tree (memoized if Level 1 already resolved it)
+        local_tree = self.git.rev_parse('HEAD^{tree}')
+        local_commit = self.git.rev_parse('HEAD')
+
+        # Resolve the remote tree from the remote commit ID alone: a commit ID
+        # pins its tree, and any commit already in the local object database can
+        # be peeled without downloading anything
+        remote_commit = self.remote_refs.head(self.repo_path)
+        remote_tree = None
+        if remote_commit and remote_commit == local_commit:
+            remote_tree = local_tree
+        elif remote_commit and self.git.object_exists(remote_commit):
+            remote_tree = self.git.rev_parse(f'{remote_commit}^{{tree}}')
+
+        if not local_tree or not remote_commit:
             self.results['levels']['level_4'] = {
                 'status': 'ERROR',
                 'message': 'Failed to retrieve tree hashes'
             }
-            print("    [x] ERROR: Failed to retrieve tree information")
+            self.log("    [x] ERROR: Failed to retrieve tree information")
+            return False
+
+        if not remote_tree:
+            self.results['levels']['level_4'] = {
+                'status': 'FAIL',
+                'local_tree': local_tree,
+                'remote_commit': remote_commit,
+                'remote_tree': None,
+                'tree_match': False,
+                'message': 'Remote commit not present locally (local clone is behind)',
+                **self.remote_snapshot()
+            }
+            self.log("    [x] FAIL - Remote commit not present locally")
+            self.log(f"       Remote commit: {remote_commit[:12]}...")
             return False
 
         tree_match = local_tree == remote_tree
@@ -186,24 +460,52 @@ class IntegrityVerifier:
         self.results['levels']['level_4'] = {
             'status': 'PASS' if tree_match else 'FAIL',
             'local_tree': local_tree,
+            'remote_commit': remote_commit,
             'remote_tree': remote_tree,
-            'tree_match': tree_match
+            'tree_match': tree_match,
+            **self.remote_snapshot()
         }
 
         if tree_match:
-            print("    [✓] PASS - Tree hashes match")
-            print(f"       Tree: {local_tree[:12]}...")
+            self.log("    [✓] PASS - Tree hashes match")
+            self.log(f"       Tree: {local_tree[:12]}...")
         else:
-            print("    [x] FAIL - Tree hash mismatch")
-            print(f"       Local:  {local_tree[:12]}...")
-            print(f"       Remote: {remote_tree[:12]}...")
+            self.log("    [x] FAIL - Tree hash mismatch")
+            self.log(f"       Local:  {local_tree[:12]}...")
+            self.log(f"       Remote: {remote_tree[:12]}...")
 
         return tree_match
 
+    def journal_inputs(self, levels):
+        """Fingerprint of everything an audit result depends on, or None for a dirty tree"""
+        stdout, _, returncode = self.run_git_command(['git', 'status', '--porcelain', '--untracked-files=no'])
+        if returncode or stdout:
+            return None
+        # Skip-worktree entries pass a clean status without files, so the checkout mode counts too
+        sparse, _, _ = self.run_git_command(['git', 'config', '--bool', '--default', 'false', 'core.sparseCheckout'])
+        return fingerprint(levels=sorted(levels), fsck_tier=self.fsck_tier, sparse_checkout=sparse,
+                           head=self.git.rev_parse('HEAD'), remote_head=self.remote_refs.head(self.repo_path),
+                           packs=pack_checksums(self.repo_path),
+                           loose=loose_objects_fingerprint(self.repo_path))
+
     def verify(self, levels=[1, 2, 3, 4]):
         """Run verification for specified levels"""
-        print(f"[VERIFYING] {self.repo_name}")
-        print("=" * 60)
+        with instrumentation.span('repo', phase='audit', repo=self.repo_name):
+            return self._verify(levels)
+
+    def _verify(self, levels):
+        self.log(f"[VERIFYING] {self.repo_name}")
+        self.log("=" * 60)
+
+        inputs = self.journal_inputs(levels) if self.journal else None
+        recorded = self.journal.lookup('audit', self.repo_name, inputs) if inputs and not self.full else None
+        if recorded:
+            self.git.close()
+            self.results = dict(recorded, timestamp=self.results['timestamp'], audit_mode='journal',
+                                reused_levels=sorted(levels), reverified_levels=[])
+            self.log("  [✓] Unchanged since the last passing audit (run journal)")
+            self.log("  [✓] Overall: PASS")
+            return self.results
 
         level_functions = {
             1: self.level_1_commit_and_tree_hash,
@@ -212,109 +514,172 @@ class IntegrityVerifier:
             4: self.level_4_tree_comparison
         }
 
+        if self.manifest and not self.full:
+            self.previous = self.manifest.load()
+        # Levels that don't run this time keep what they verified last time
+        self.manifest_data = {key: self.previous[key] for key in ('files', 'level_2', 'verified_packs')
+                              if key in self.previous}
+
         results = {}
-        for level in sorted(levels):
-            if level in level_functions:
-                results[level] = level_functions[level]()
-            else:
-                print(f"  [!] Warning: Level {level} not recognized")
+        try:
+            for level in sorted(levels):
+                if level in level_functions:
+                    with instrumentation.span('level', level=level):
+                        results[level] = level_functions[level]()
+                else:
+                    self.log(f"  [!] Warning: Level {level} not recognized")
+            if self.manifest:
+                self.manifest.save(dict(
+                    self.manifest_data,
+                    head=self.git.rev_parse('HEAD'),
+                    tree=self.git.rev_parse('HEAD^{tree}'),
+                    packs=pack_checksums(self.repo_path)
+                ))
+        finally:
+            self.git.close()
+
+        # Record what this run reused from the manifest and what it re-verified
+        reused_levels = [level for level in sorted(results)
+                         if self.results['levels'].get(f'level_{level}', {}).get('reused')]
+        self.results['audit_mode'] = 'incremental' if self.previous else 'full'
+        self.results['reused_levels'] = reused_levels
+        self.results['reverified_levels'] = [level for level in sorted(results) if level not in reused_levels]
 
         # Overall status
         all_passed = all(results.values())
         self.results['overall_status'] = 'PASS' if all_passed else 'FAIL'
 
         status_symbol = "[✓]" if all_passed else "[x]"
-        print(f"  {status_symbol} Overall: {'PASS' if all_passed else 'FAIL'}")
+        self.log(f"  {status_symbol} Overall: {'PASS' if all_passed else 'FAIL'}")
+        if all_passed and inputs:
+            self.journal.record('audit', self.repo_name, inputs, self.results)
 
         return self.results
 
-def run_phase2():
-    """Execute Phase 2: Integrity Audit"""
-    print("Starting Integrity Verification Process")
-    print("=" * 60)
-
-    # Configuration
-    VERIFICATION_LEVELS = [1, 2, 3, 4]
-repositories_path = Path('/app/repositories')
-
-    if not repositories_path.exists():
-        print("Error: repositories folder not found!")
-        return False
-
-    repos = [d for d in repositories_path.iterdir() if d.is_dir() and not d.name.startswith('.')]
+def _slots(limit):
+    """Build a semaphore for a job limit, or None when unlimited"""
+    return threading.BoundedSemaphore(limit) if limit else None
 
-    print(f"Found {len(repos)} repositories to verify")
+def open_report(full=False, fsck_tier=None):
+    """Start this run's records in the integrity report"""
+    return IntegrityReport(REPORT_PATH, SUMMARY_PATH, VERIFICATION_LEVELS,
+                           audit_mode='full' if full else 'incremental', fsck_tier=fsck_tier or FSCK_TIER)
 
-    all_results = []
-    verification_start = datetime.now()
-
-    for i, repo_path in enumerate(sorted(repos), 1):
-        print(f"[{i}/{len(repos)}]")
-        verifier = IntegrityVerifier(repo_path)
-        result = verifier.verify(levels=VERIFICATION_LEVELS)
-        all_results.append(result)
-
-    verification_end = datetime.now()
-    duration = (verification_end - verification_start).total_seconds()
+def summarize_audit(report, verification_start):
+    """Print the audit summary and close the report; True if every repository passed"""
+    duration = (datetime.now() - verification_start).total_seconds()
+    summary = report.close(duration)
+    failed = summary['summary']['failed']
 
     # Summary Statistics
     print("\n" + "=" * 60)
     print("VERIFICATION SUMMARY")
     print("=" * 60)
 
-    passed = sum(1 for r in all_results if r['overall_status'] == 'PASS')
-    failed = len(all_results) - passed
-
-    print(f"Total Repositories: {len(all_results)}")
-    print(f"Passed: {passed}")
+    print(f"Total Repositories: {summary['summary']['total']}")
+    print(f"Passed: {summary['summary']['passed']}")
     print(f"Failed: {failed}")
     print(f"Duration: {duration:.2f} seconds")
 
     # Level-by-level summary
     print("Level-by-Level Results:")
-    for level in VERIFICATION_LEVELS:
-        level_passed = sum(1 for r in all_results
-                          if f'level_{level}' in r['levels']
-                          and r['levels'][f'level_{level}']['status'] == 'PASS')
-        level_total = sum(1 for r in all_results if f'level_{level}' in r['levels'])
-        print(f"   Level {level}: {level_passed}/{level_total} passed")
+    for level, counts in summary['levels'].items():
+        print(f"   Level {level}: {counts['passed']}/{counts['total']} passed")
 
     # Failed repositories detail
     if failed > 0:
         print("Failed Repositories:")
-        for result in all_results:
-            if result['overall_status'] == 'FAIL':
-                print(f"   [x] {result['repo']}")
-                for level_key, level_data in result['levels'].items():
-                    if level_data['status'] != 'PASS':
-                        level_num = level_key.replace('level_', '')
-                        print(f"      - Level {level_num}: {level_data['status']}")
-                        if 'message' in level_data:
-                            print(f"        {level_data['message']}")
+        for failure in summary['failed_repositories']:
+            print(f"   [x] {failure['repo']}")
+            for level_num, level_data in failure['levels'].items():
+                print(f"      - Level {level_num}: {level_data['status']}")
+                if 'message' in level_data:
+                    print(f"        {level_data['message']}")
 
     print("=" * 60)
     print("Integrity verification complete!")
     print("=" * 60)
 
-    # Store results for export
-    integrity_results = {
-        'verification_date': verification_start.isoformat(),
-        'duration_seconds': duration,
-        'levels_checked': VERIFICATION_LEVELS,
-        'summary': {
-            'total': len(all_results),
-            'passed': passed,
-            'failed': failed
-        },
-        'repositories': all_results
-    }
-
-    # Export report
-    report_path = '/app/output/integrity_report.json'
-    with open(report_path, 'w') as f:
-        json.dump(integrity_results, f, indent=2)
-
-    print(f"Detailed report exported to: {report_path}")
-    print(f"Report size: {Path(report_path).stat().st_size / 1024:.2f} KB")
+    print(f"Report records appended to: {report.report_path}")
+    print(f"Summary written to: {report.summary_path}")
 
     return failed == 0  # Return True if all passed
+
+def run_phase2(workers=None, max_network_jobs=None, max_cpu_jobs=None, refs_ttl=None, full=False,
+               fsck_tier=None, journal=None):
+    """Execute Phase 2: Integrity Audit
+
+    With workers > 1 repositories are audited concurrently on a thread pool
+    (every level is dominated by blocking git subprocesses). Each repo's output
+    is buffered, then printed and appended to the JSON-lines REPORT_PATH in
+    sorted order, so console output and report match a sequential run; each
+    result is written as soon as every repo before it has finished, and
+    SUMMARY_PATH is written at the end. Remote refs are resolved up front with
+    one ls-remote per remote. By default every audit asks each remote afresh;
+    refs_ttl lets an answer cached on disk by an earlier run stand in for up
+    to that many seconds. Levels 1 and 4 record when the refs they compared
+    against were fetched.
+
+    Audits are incremental: a per-repo manifest from the previous run lets
+    unchanged files and object stores be reused. full=True re-verifies all.
+    fsck_tier selects the Level 2 depth: 'connectivity', 'loose' or 'full'.
+    With a run journal, a repository whose HEAD, remote HEAD and object store
+    are unchanged since its last passing audit is not audited again.
+    """
+    print("Starting Integrity Verification Process")
+    print("=" * 60)
+
+    # Configuration
+    workers = workers or AUDIT_WORKERS
+    network_slots = _slots(max_network_jobs or MAX_NETWORK_JOBS)
+    cpu_slots = _slots(max_cpu_jobs or MAX_CPU_JOBS)
+    fsck_tier = fsck_tier or FSCK_TIER
+    repositories_path = REPOSITORIES_DIR
+
+    if not repositories_path.exists():
+        print("Error: repositories folder not found!")
+        return False
+
+    repos = local_repositories(repositories_path)
+
+    print(f"Found {len(repos)} repositories to verify")
+    if workers > 1:
+        print(f"Concurrent audit: {workers} workers")
+    print(f"Audit mode: {'full' if full else 'incremental'}, fsck tier: {fsck_tier}")
+
+    verification_start = datetime.now()
+    report = open_report(full, fsck_tier)
+
+    # Ask every remote once, concurrently, before the levels need the answers
+    remote_refs = RemoteRefCache(
+        ttl=AUDIT_REFS_TTL if refs_ttl is None else refs_ttl,
+        network_slots=network_slots
+    )
+    remote_refs.prefetch(repos, workers=max_network_jobs or MAX_NETWORK_JOBS or len(repos))
+    remote_refs.save()
+    manifests = {repo_path: AuditManifest(repo_path.name, AUDIT_MANIFEST_DIR) for repo_path in repos}
+    if workers > 1:
+        def audit(index, repo_path):
+            verifier = IntegrityVerifier(repo_path, network_slots, cpu_slots, buffered=True,
+                                         remote_refs=remote_refs, manifest=manifests[repo_path],
+                                         full=full, fsck_tier=fsck_tier, journal=journal)
+            verifier.log(f"[{index}/{len(repos)}]")
+            return verifier, verifier.verify(levels=VERIFICATION_LEVELS)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(audit, i, repo_path)
+                       for i, repo_path in enumerate(repos, 1)]
+            # Print and record in submission order, so output and report match a sequential run
+            for future in futures:
+                verifier, result = future.result()
+                verifier.flush_output()
+                report.add(result)
+    else:
+        for i, repo_path in enumerate(repos, 1):
+            print(f"[{i}/{len(repos)}]")
+            verifier = IntegrityVerifier(repo_path, network_slots, cpu_slots, remote_refs=remote_refs,
+                                         manifest=manifests[repo_path], full=full, fsck_tier=fsck_tier,
+                                         journal=journal)
+            report.add(verifier.verify(levels=VERIFICATION_LEVELS))
+
+    return summarize_audit(report, verification_start)
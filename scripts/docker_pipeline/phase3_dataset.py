@@ -5,12 +5,31 @@ Creates structured training dataset from repository contents
 """
 
 import os
+from collections import Counter
+from contextlib import nullcontext
 from pathlib import Path
 
+import instrumentation
+from dataset_format import (OUTPUT_DATASET_FILE, REPO_START_TOKEN, REPO_END_TOKEN,
+                            FILE_START_TOKEN, FILE_END_TOKEN)
+from dataset_shards import ShardedDatasetWriter, OUTPUT_SHARDS_DIR
+from dataset_writer import DatasetWriter, STREAM_CHUNK_CHARS
+from dedup import ContentDeduplicator, DEDUP_REPORT_PATH, DEDUP_THRESHOLD
+from file_policy import SKIP_REPORT_PATH, TRUNCATE_CHARS, classify_file, policy_config, save_skip_report
+from git_broker import GitBroker
+from git_source import GitBlob, head_tree_id, walk_tree_files
+from parallel_ingest import FileIngestor, INGEST_WORKERS, read_source_file
+from phase1_cloning import local_repositories
+from repo_walker import walk_repo_files
+from run_journal import fingerprint
+from segment_cache import SegmentCache, SEGMENT_CACHE_DIR, clean_tree_id, config_fingerprint
+
 # Configuration
 REPOSITORIES_SRC_DIR = Path('/app/repositories')
-OUTPUT_DATASET_FILE = Path('/app/output/dataset.txt')
-EXCLUDED_DIRS = ['.git']
+DATASET_SOURCE = 'worktree'  # 'worktree' reads checked-out files, 'git' reads HEAD's tree from the object database
+EXCLUDED_DIRS = ['.git', 'node_modules', '.venv']  # Pruned by name, never descended into
+EXCLUDED_GLOBS = []  # Extra name/path globs to prune, e.g. 'build', 'docs/generated/*'
+INCLUDED_GLOBS = []  # If set, a file must match one of these name/path globs
 INCLUDED_EXTENSIONS = [
     # Code
     '.py', '.rs', '.js', '.ts', '.java', '.c', '.h', '.cpp', '.go', '.sh',
@@ -20,110 +39,398 @@ INCLUDED_EXTENSIONS = [
     '.md', '.txt', '.rst'
 ]
 
-# Special tokens for structuring the dataset
-REPO_START_TOKEN = "<|repo_start|>"
-REPO_END_TOKEN = "<|repo_end|>"
-FILE_START_TOKEN = "<|file_start|>"
-FILE_END_TOKEN = "<|file_end|>"
+# Curriculum Learning Order: priority repos first, the rest alphabetically, these last
+CURRICULUM_PRIORITY = [
+    'asi-ecosystem',
+    'symbiotic-core-library',
+    'asi-protosymbiotic-signal',
+    'asi-symbiotic-signal',
+    'asi-core-protocol',
+    'eco-benchmark',
+    'eco-datacenter'
+]
+CURRICULUM_LAST = [
+    'emergence-engine',
+    'asi-backups'
+]
 
-def run_phase3():
-    """Execute Phase 3: Dataset Preparation"""
-    print("Starting dataset creation process...")
-    print("=" * 60)
+POLICY_ACTIONS = {'skip': 'skipped', 'truncate': 'truncated', 'stream': 'streamed'}  # Log wording of each file policy action
 
-    processed_files_count = 0
-    processed_repos_count = 0
-    skipped_files_count = 0
+def iter_source_files(repo_path, exclude_globs, include_globs, scan, deduplicator=None, broker=None):
+    """Yield (file_path, size, relative_path, limit) for every dataset candidate of a repo
 
-    if not REPOSITORIES_SRC_DIR.exists():
-        print(f"ERROR: Source directory not found at '{REPOSITORIES_SRC_DIR}'")
-        return False
+    scan['files'] and scan['skipped'] count walked files and extension skips;
+    scan['policy'] collects the file policy's decisions other than a plain
+    include, and limit is the character limit of a file it truncates.
+    With a finished deduplicator, scan['duplicates'] counts dropped duplicates.
+    With a GitBroker, files come from HEAD's tree instead of the working
+    tree and file_path is a GitBlob read through the broker.
+    """
+    if broker:
+        tree_files = walk_tree_files(broker, EXCLUDED_DIRS, exclude_globs, include_globs)
+        candidates = ((path, GitBlob(broker, oid, path), size) for path, oid, size in tree_files)
+    else:
+        candidates = ((path, entry, None) for path, entry in
+                      walk_repo_files(repo_path, EXCLUDED_DIRS, exclude_globs, include_globs))
+    for relative_path, file_path, size in candidates:
+        scan['files'] += 1
+        # Filter by extension if the list is not empty
+        if INCLUDED_EXTENSIONS and os.path.splitext(relative_path)[1].lower() not in INCLUDED_EXTENSIONS:
+            scan['skipped'] += 1
+            continue
+        if size is None:
+            try:
+                size = file_path.stat().st_size  # Cached by scandir where the platform allows
+            except OSError:
+                size = 0  # The read itself reports the error
+            file_path = Path(file_path.path)
+        # Classify before the full read: binary, generated and oversized files never reach it
+        action, reason = classify_file(file_path, size)
+        if action != 'include':
+            scan['policy'].append({'repo': repo_path.name, 'path': relative_path, 'bytes': size,
+                                   'action': action, 'reason': reason})
+            if action == 'skip':
+                continue
+        if deduplicator and deduplicator.duplicate_of(repo_path.name, relative_path):
+            scan['duplicates'] += 1
+            continue
+        yield file_path, size, relative_path, TRUNCATE_CHARS if action == 'truncate' else None
+
+def iter_text_chunks(file_path):
+    """Decode a source file in bounded chunks, the same way the writer streams it"""
+    with file_path.open('r', encoding='utf-8', errors='ignore') as infile:
+        for chunk in iter(lambda: infile.read(STREAM_CHUNK_CHARS), ''):
+            yield chunk
+
+def find_duplicates(repo_paths, exclude_globs, include_globs, ingestor, mode, threshold, source='worktree'):
+    """Pre-pass over every dataset candidate in curriculum order, returning a finished ContentDeduplicator"""
+    deduplicator = ContentDeduplicator(mode, threshold)
+    for repo_path in repo_paths:
+        scan = {'files': 0, 'skipped': 0, 'policy': []}
+        with open_source(repo_path, source) as broker:
+            source_files = iter_source_files(repo_path, exclude_globs, include_globs, scan, broker=broker)
+            for (file_path, size, relative_path, limit), pending in ingestor.read_ahead(source_files):
+                try:
+                    content = pending.result() if pending else read_source_file(file_path, size, limit)
+                    if content is None:
+                        deduplicator.add_chunks(repo_path.name, relative_path, iter_text_chunks(file_path))
+                    else:
+                        deduplicator.add(repo_path.name, relative_path, content)
+                except (OSError, UnicodeDecodeError):
+                    pass  # Unreadable files are reported by the write pass
+    deduplicator.finish()
+    return deduplicator
 
-    # Curriculum Learning Order
-    priority_order = [
-        'asi-ecosystem',
-        'symbiotic-core-library',
-        'asi-protosymbiotic-signal',
-        'asi-symbiotic-signal',
-        'asi-core-protocol',
-        'eco-benchmark',
-        'eco-datacenter'
-    ]
-    last_order = [
-        'emergence-engine',
-        'asi-backups'
-    ]
-
-    all_repos_on_disk = {d.name: d for d in REPOSITORIES_SRC_DIR.iterdir() if d.is_dir()}
+def curriculum_order(repo_paths):
+    """Sort repository paths into curriculum order"""
+    all_repos_on_disk = {path.name: path for path in repo_paths}
     sorted_repo_paths = []
 
     # 1. Add priority repos in their specified order
-    for repo_name in priority_order:
+    for repo_name in CURRICULUM_PRIORITY:
         if repo_name in all_repos_on_disk:
             sorted_repo_paths.append(all_repos_on_disk.pop(repo_name))
 
     # 2. Add the remaining repos (alphabetically), excluding the ones for the end
     middle_repos_names = sorted([
         name for name in all_repos_on_disk
-        if name not in last_order
+        if name not in CURRICULUM_LAST
     ])
     for repo_name in middle_repos_names:
         sorted_repo_paths.append(all_repos_on_disk.pop(repo_name))
 
     # 3. Add the last repos in their specified order
-    for repo_name in last_order:
+    for repo_name in CURRICULUM_LAST:
         if repo_name in all_repos_on_disk:
             sorted_repo_paths.append(all_repos_on_disk.pop(repo_name))
 
-    print(f"Found {len(sorted_repo_paths)} repositories to process in curriculum order.")
+    return sorted_repo_paths
 
-    with open(OUTPUT_DATASET_FILE, 'w', encoding='utf-8') as outfile:
-        for repo_path in sorted_repo_paths:
-            repo_name = repo_path.name
-            print(f"[Processing] '{repo_name}'...")
-            processed_repos_count += 1
+def source_tree_id(repo_path, source, exclude_globs, include_globs):
+    """ID of the tree a block is built from: HEAD's for the git source, the clean working tree's otherwise"""
+    if source == 'git':
+        return head_tree_id(repo_path)
+    return clean_tree_id(repo_path, EXCLUDED_DIRS, exclude_globs, include_globs, INCLUDED_EXTENSIONS)
 
-            # Write the repository start token and its name
-            outfile.write(f"{REPO_START_TOKEN}{repo_name}\n")
+def open_source(repo_path, source):
+    """GitBroker over the repository's objects for the git source; yields None for the working tree"""
+    return GitBroker(repo_path) if source == 'git' else nullcontext()
 
-            # Use rglob to recursively find all files
-            files_in_repo = list(repo_path.rglob('*'))
-            print(f"  Found {len(files_in_repo)} total items (files/dirs). Filtering...")
+def dataset_segment_cache(exclude_globs, include_globs, source='worktree'):
+    """Segment cache keyed by everything in this configuration that shapes a block"""
+    # Checkouts can differ from the blobs (eol and smudge filters, symlinks), so the source is part of the key
+    return SegmentCache(SEGMENT_CACHE_DIR, config_fingerprint(
+        extensions=INCLUDED_EXTENSIONS, excluded_dirs=EXCLUDED_DIRS, exclude=exclude_globs,
+        include=include_globs, tokens=[REPO_START_TOKEN, REPO_END_TOKEN, FILE_START_TOKEN, FILE_END_TOKEN],
+        file_policy=policy_config(), source=source))
 
-            repo_file_count = 0
-            for file_path in files_in_repo:
-                # Skip directories and files in excluded directories
-                if not file_path.is_file() or any(d in file_path.parts for d in EXCLUDED_DIRS):
-                    continue
+def dataset_inputs(repo_paths, exclude_globs, include_globs, source='worktree', **options):
+    """Fingerprint of everything the phase 3 outputs depend on, or None if a repo is dirty"""
+    trees = {repo_path.name: source_tree_id(repo_path, source, exclude_globs, include_globs)
+             for repo_path in repo_paths}
+    if None in trees.values():
+        return None
+    return fingerprint(config=dataset_segment_cache(exclude_globs, include_globs, source).fingerprint,
+                       curriculum=[CURRICULUM_PRIORITY, CURRICULUM_LAST], trees=trees,
+                       output=str(OUTPUT_DATASET_FILE), shards=str(OUTPUT_SHARDS_DIR), **options)
 
-                # Filter by extension if the list is not empty
-                if INCLUDED_EXTENSIONS and file_path.suffix.lower() not in INCLUDED_EXTENSIONS:
-                    skipped_files_count += 1
-                    continue
+def output_state(paths):
+    """[path, size, mtime_ns] of every output file, or None if one is missing"""
+    state = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        state.append([str(path), stat.st_size, stat.st_mtime_ns])
+    return state
 
-                try:
-                    # Get relative path to store in the dataset
-                    relative_path = file_path.relative_to(repo_path)
-                    with open(file_path, 'r', encoding='utf-8', errors='ignore') as infile:
-                        content = infile.read()
+def write_repo(outfile, repo_path, exclude_globs, include_globs, ingestor, deduplicator=None, log=print, broker=None):
+    """Write one repository's token-delimited block; returns its file counts and policy decisions
+
+    With a GitBroker the block is built from HEAD's tree in the object
+    database instead of the working tree.
+    """
+    repo_name = repo_path.name
+
+    # Write the repository start token and its name
+    outfile.start_repo(repo_name, f"{REPO_START_TOKEN}{repo_name}\n", f"{REPO_END_TOKEN}\n\n")
+
+    # Walk the repo lazily; excluded directories are pruned before descending
+    scan = {'files': 0, 'skipped': 0, 'duplicates': 0, 'policy': []}
+    source_files = iter_source_files(repo_path, exclude_globs, include_globs, scan, deduplicator, broker)
+
+    repo_file_count = 0
+    repo_errors = 0
+    # Files come back in source order whichever worker read them
+    for (file_path, size, relative_path, limit), pending in ingestor.read_ahead(source_files):
+        with instrumentation.span('file', path=relative_path) as file_span:
+            bytes_before = outfile.bytes_written
+            try:
+                header = f"{FILE_START_TOKEN}{relative_path}\n"
+                footer = f"\n{FILE_END_TOKEN}\n"
+
+                # Write the file start token and its path, the content and the file end token
+                if pending:
+                    content = pending.result()
+                else:
+                    content = read_source_file(file_path, size, limit) if limit else None
+                if content is None:
+                    outfile.copy_file(file_path, header, footer, relative_path)
+                else:
+                    outfile.write_file(content, header, footer, relative_path)
+
+                repo_file_count += 1
+                file_span.add(bytes_read=min(size, limit) if limit else size)
+            except Exception as e:
+                log(f"  [!] Warning: Could not process file {file_path}. Reason: {e}")
+                repo_errors += 1
+                file_span.add(errors=1)
+            file_span.add(bytes_written=outfile.bytes_written - bytes_before)
+
+    log(f"  Scanned {scan['files']} files ({scan['skipped']} skipped by extension).")
+    policy_skipped = sum(1 for record in scan['policy'] if record['action'] == 'skip')
+    if scan['policy']:
+        decisions = Counter((record['action'], record['reason']) for record in scan['policy'])
+        log("  File policy: " + ', '.join(f"{count} {POLICY_ACTIONS[action]} ({reason})"
+                                           for (action, reason), count in sorted(decisions.items())) + ".")
+    if deduplicator:
+        log(f"  Dropped {scan['duplicates']} duplicate files.")
+    log(f"  -> Added content from {repo_file_count} files.")
+
+    # Write the repository end token
+    outfile.end_repo()
+    return {'files': repo_file_count, 'skipped': scan['skipped'] + policy_skipped, 'errors': repo_errors,
+            'policy': scan['policy']}
+
+def prepare_repo_segment(repo_path, segments, exclude_globs, include_globs, ingestor, incremental=True, log=print,
+                         source='worktree'):
+    """Build (or reuse) one repository's block as a standalone segment file
+
+    Returns (segment_path, meta) with meta holding the block's bytes,
+    characters, files, skipped, file policy decisions, errors and whether it
+    came from the cache. Blocks of clean repositories are
+    stored in the segment cache; others stay in a temporary file that
+    append_segment removes once assembled. Both the phase 3 loop and the
+    pipelined prepare stage build their blocks here.
+    """
+    repo_name = repo_path.name
+    with instrumentation.span('repo', phase='dataset', repo=repo_name) as repo_span:
+        segment_key = segments.key(source_tree_id(repo_path, source, exclude_globs, include_globs))
+        cached = segments.lookup(repo_name, segment_key) if incremental and segment_key else None
+        if cached:
+            log(f"  Unchanged since the cached segment; reused {cached['files']} files.")
+            repo_span.add(bytes_written=cached['bytes'], files=cached['files'], cached=1)
+            return segments.segment_path(repo_name), dict(cached, policy=cached.get('policy', []), errors=0,
+                                                          cached=True)
+
+        tmp_path = segments.temp_path(repo_name)
+        with DatasetWriter(tmp_path) as outfile, open_source(repo_path, source) as broker:
+            counts = write_repo(outfile, repo_path, exclude_globs, include_globs, ingestor, log=log, broker=broker)
+        meta = {'bytes': outfile.bytes_written, 'characters': outfile.characters,
+                'files': counts['files'], 'skipped': counts['skipped'], 'policy': counts['policy']}
+        repo_span.add(bytes_written=meta['bytes'], files=meta['files'])
+        # A block with read errors is not cached, so the next run retries those files
+        if segment_key and not counts['errors']:
+            segments.store(repo_name, segment_key, tmp_path, **meta)
+            return segments.segment_path(repo_name), dict(meta, errors=0, cached=False)
+        return tmp_path, dict(meta, errors=counts['errors'], cached=False)
+
+def append_segment(outfile, segments, repo_name, segment_path, meta):
+    """Copy a block from prepare_repo_segment into the dataset, dropping it if it was not cached"""
+    outfile.copy_segment(segment_path, meta['characters'], meta['files'])
+    if segment_path != segments.segment_path(repo_name):
+        segments.discard(segment_path)
+
+def print_skip_report(decisions):
+    """Write the file policy's skip report and print its totals"""
+    report_path, skips = save_skip_report(decisions, SKIP_REPORT_PATH)
+    print(f"  Skipped by file policy: {skips['files_skipped']} ({skips['bytes_skipped'] / 1024:.2f} KB), "
+          f"{skips['files_truncated']} truncated, {skips['files_streamed']} streamed whole")
+    print(f"  Skip report: {report_path}")
 
-                    # Write the file start token and its path
-                    outfile.write(f"{FILE_START_TOKEN}{relative_path}\n")
-                    # Write the file content
-                    outfile.write(content)
-                    # Write the file end token
-                    outfile.write(f"\n{FILE_END_TOKEN}\n")
+def verify_dataset(outfile):
+    """Check the written output against the writer's counters and print its checksum"""
+    bytes_on_disk = outfile.bytes_on_disk()
+    file_size_kb = bytes_on_disk / 1024
+    print(f"Dataset size: {file_size_kb:.2f} KB")
+
+    # Verify the created dataset from the counters kept while writing
+    stats = outfile.stats()
+    if bytes_on_disk != stats['bytes']:
+        print(f"Error verifying dataset: {stats['bytes']} bytes written, {bytes_on_disk} bytes on disk")
+        return False
+
+    print(f"Dataset verified: {stats['characters']} characters, {stats['files']} files")
+    print(f"Dataset SHA-256: {stats['sha256']}")
+    return True
 
-                    processed_files_count += 1
-                    repo_file_count += 1
-                except Exception as e:
-                    print(f"  [!] Warning: Could not process file {file_path}. Reason: {e}")
-                    skipped_files_count += 1
+def export_dataset_tokens(source, tokenizer):
+    """Export a verified dataset as a token array"""
+    # Imported here: the reader it builds on imports this module's constants
+    from token_export import export_tokens, OUTPUT_TOKENS_DIR, TOKENS_FILE, TOKENS_INDEX, TOKENS_META
+    token_stats = export_tokens(source, OUTPUT_TOKENS_DIR, tokenizer)
+    print(f"Token export ({tokenizer}): {token_stats['total_tokens']} tokens in {OUTPUT_TOKENS_DIR}")
+    print(f"  {token_stats['files_tokenized']} files tokenized, {token_stats['files_reused']} reused unchanged")
+    return [OUTPUT_TOKENS_DIR / name for name in (TOKENS_FILE, TOKENS_INDEX, TOKENS_META)]
 
-            print(f"  -> Added content from {repo_file_count} files.")
+def run_phase3(workers=None, exclude=None, include=None, shard_size=None, tokenizer=None,
+               dedup=None, dedup_threshold=None, incremental=True, journal=None, source=None):
+    """Execute Phase 3: Dataset Preparation
 
-            # Write the repository end token
-            outfile.write(f"{REPO_END_TOKEN}\n\n")
+    With workers > 1 source files are read and decoded on a thread pool ahead
+    of the writer; the output is byte-identical to the sequential run.
+    exclude/include add name or path globs to EXCLUDED_GLOBS/INCLUDED_GLOBS.
+    With shard_size (bytes) the dataset is written as shards of about that size
+    to OUTPUT_SHARDS_DIR with a byte-offset index instead of one dataset.txt.
+    With dedup ('exact' or 'near') duplicate files are found in a pre-pass and
+    only their first occurrence in curriculum order is written; near-duplicates
+    are those at or above dedup_threshold estimated Jaccard similarity.
+    Each repository's block of dataset.txt is cached under SEGMENT_CACHE_DIR,
+    keyed by its HEAD tree ID and this configuration; with incremental set,
+    clean unchanged repositories are copied from the cache instead of being
+    re-read, which yields the same bytes as a full rebuild. Sharded and
+    deduplicated runs always rebuild, since their blocks depend on more than
+    one repository.
+    With tokenizer (e.g. 'bytes', 'tiktoken:cl100k_base') the verified dataset
+    is also exported as a token array to OUTPUT_TOKENS_DIR.
+    With a run journal and incremental set, the phase is skipped when every
+    repository tree and option is unchanged since the last completed run and
+    its outputs are still on disk as written; a repository forced with
+    --force dataset:<repo> is rebuilt rather than copied from the cache.
+    With source 'git' (default DATASET_SOURCE) files are read from each
+    repository's HEAD tree in the object database instead of the working
+    tree, so clones without a checkout can be processed; the dataset is
+    byte-identical to a worktree run on clean checkouts. Git reads share one
+    cat-file pipe per repository, so ingestion is sequential.
+    """
+    print("Starting dataset creation process...")
+    print("=" * 60)
+
+    processed_files_count = 0
+    processed_repos_count = 0
+    skipped_files_count = 0
+    policy_decisions = []
+
+    if not REPOSITORIES_SRC_DIR.exists():
+        print(f"ERROR: Source directory not found at '{REPOSITORIES_SRC_DIR}'")
+        return False
+
+    sorted_repo_paths = curriculum_order(local_repositories(REPOSITORIES_SRC_DIR))
+    print(f"Found {len(sorted_repo_paths)} repositories to process in curriculum order.")
+
+    # Stream into the dataset: bodies are copied in bounded chunks and the writer
+    # keeps the counters and checksum used to verify the output afterwards
+    workers = workers or INGEST_WORKERS
+    exclude_globs = EXCLUDED_GLOBS + list(exclude or [])
+    include_globs = INCLUDED_GLOBS + list(include or [])
+    source = source or DATASET_SOURCE
+    if source == 'git':
+        print("Dataset source: git objects at HEAD")
+        if workers > 1:
+            print(f"  Ignoring {workers} ingest workers: git reads share one cat-file pipe per repository")
+            workers = 1
+    if workers > 1:
+        print(f"Parallel ingestion: {workers} workers")
+
+    # Repositories named in --force dataset[:<repo>] are rebuilt instead of reused
+    forced = set()
+    inputs = None
+    if journal:
+        forced = {repo_path.name for repo_path in sorted_repo_paths if journal.forced('dataset', repo_path.name)}
+        inputs = dataset_inputs(sorted_repo_paths, exclude_globs, include_globs, source, shard_size=shard_size or 0,
+                                tokenizer=tokenizer or '', dedup=dedup or '',
+                                dedup_threshold=(dedup_threshold or DEDUP_THRESHOLD) if dedup == 'near' else 0)
+        recorded = journal.lookup('dataset', None, inputs) if incremental and not forced else None
+        if recorded and recorded.get('outputs') and output_state(path for path, _, _ in recorded['outputs']) == recorded['outputs']:
+            print("Unchanged since the last completed run (run journal); outputs kept:")
+            for path, size, _ in recorded['outputs']:
+                print(f"  {path} ({size / 1024:.2f} KB)")
+            return True
+
+    if shard_size:
+        print(f"Sharded output: {shard_size / (1024 * 1024):.0f} MB shards in {OUTPUT_SHARDS_DIR}")
+        writer = ShardedDatasetWriter(OUTPUT_SHARDS_DIR, shard_size)
+    else:
+        writer = DatasetWriter(OUTPUT_DATASET_FILE)
+
+    with writer as outfile, FileIngestor(workers) as ingestor:
+        deduplicator = None
+        if dedup:
+            threshold = dedup_threshold or DEDUP_THRESHOLD
+            print(f"Deduplication: {dedup}" + (f" (threshold {threshold})" if dedup == 'near' else ''))
+            deduplicator = find_duplicates(sorted_repo_paths, exclude_globs, include_globs,
+                                           ingestor, dedup, threshold, source)
+
+        segments = None
+        if not shard_size and not deduplicator:
+            segments = dataset_segment_cache(exclude_globs, include_globs, source)
+
+        for repo_path in sorted_repo_paths:
+            repo_name = repo_path.name
+            print(f"[Processing] '{repo_name}'...")
+            processed_repos_count += 1
+
+            if segments:
+                segment_path, meta = prepare_repo_segment(repo_path, segments, exclude_globs, include_globs,
+                                                          ingestor, incremental and repo_name not in forced,
+                                                          source=source)
+                append_segment(outfile, segments, repo_name, segment_path, meta)
+                processed_files_count += meta['files']
+                skipped_files_count += meta['skipped'] + meta['errors']
+                policy_decisions += meta['policy']
+                continue
+
+            # Sharded and deduplicated blocks are written straight to the output
+            with instrumentation.span('repo', phase='dataset', repo=repo_name) as repo_span, \
+                    open_source(repo_path, source) as broker:
+                bytes_before = outfile.bytes_written
+                counts = write_repo(outfile, repo_path, exclude_globs, include_globs, ingestor, deduplicator,
+                                    broker=broker)
+                processed_files_count += counts['files']
+                skipped_files_count += counts['skipped'] + counts['errors']
+                policy_decisions += counts['policy']
+                repo_span.add(bytes_written=outfile.bytes_written - bytes_before, files=counts['files'])
 
     print("\n" + "=" * 60)
     print("Dataset Creation Summary")
@@ -131,21 +438,30 @@ def run_phase3():
     print(f"  Total repositories processed: {processed_repos_count}")
     print(f"  Total text files added: {processed_files_count}")
     print(f"  Total files skipped (binary/extension/error): {skipped_files_count}")
-    print(f"Dataset successfully created at: {OUTPUT_DATASET_FILE}")
+    if segments and incremental:
+        print(f"  Repositories reused from segment cache: {segments.hits} "
+              f"({processed_repos_count - segments.hits} rebuilt)")
+    print_skip_report(policy_decisions)
+    if deduplicator:
+        report = deduplicator.report()
+        report_path = deduplicator.save_report(DEDUP_REPORT_PATH)
+        print(f"  Duplicates dropped: {report['exact_duplicates']} exact, {report['near_duplicates']} near "
+              f"({report['bytes_dropped'] / 1024:.2f} KB)")
+        print(f"  Dedup report: {report_path}")
+    if shard_size:
+        print(f"Dataset successfully created as {len(outfile.shards)} shards in: {OUTPUT_SHARDS_DIR}")
+        print(f"Shard index: {outfile.index_path}")
+    else:
+        print(f"Dataset successfully created at: {OUTPUT_DATASET_FILE}")
 
     # Verify the created dataset
-    file_size_kb = OUTPUT_DATASET_FILE.stat().st_size / 1024
-    print(f"Dataset size: {file_size_kb:.2f} KB")
-
-    # Load dataset into variable for verification
-    try:
-        with open(OUTPUT_DATASET_FILE, 'r', encoding='utf-8') as f:
-            training_data = f.read()
-
-        print(f"Dataset loaded into memory: {len(training_data)} characters")
-        
-    except Exception as e:
-        print(f"Error verifying dataset: {e}")
+    if not verify_dataset(outfile):
         return False
 
+    outputs = outfile.output_paths() + ([outfile.index_path] if shard_size else [])
+    if tokenizer:
+        outputs += export_dataset_tokens(OUTPUT_SHARDS_DIR if shard_size else OUTPUT_DATASET_FILE, tokenizer)
+    if journal:
+        journal.record('dataset', None, inputs, {'outputs': output_state(outputs)})
+
     return True
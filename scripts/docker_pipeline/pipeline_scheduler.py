@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Pipelined Execution
+Runs the three phases per repository instead of behind phase-wide barriers:
+a repository is audited and its dataset block prepared as soon as it is
+cloned, each stage on its own bounded pool, and the dataset is assembled in
+curriculum order once every block is ready
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import phase1_cloning as phase1
+import phase2_integrity as phase2
+import phase3_dataset as phase3
+from audit_manifest import AuditManifest, AUDIT_MANIFEST_DIR
+from dataset_writer import DatasetWriter
+from parallel_ingest import FileIngestor, INGEST_WORKERS
+from remote_refs import RemoteRefCache, REMOTE_REFS_TTL
+
+# Configuration
+PIPELINE_STAGE_LIMITS = {
+    'clone': phase1.CLONE_WORKERS,  # Concurrent clones (network)
+    'audit': 2,                     # Concurrent repository audits
+    'prepare': 2                    # Concurrent dataset block builds
+}
+
+class StagePipeline:
+    """Per-item stage DAG with one bounded thread pool per stage
+
+    A stage registered with after=<stage> starts for an item as soon as that
+    stage succeeded for it; stages without a predecessor start when the item
+    is added. Stage functions return (ok, value).
+    """
+
+    def __init__(self, on_done=None):
+        self.on_done = on_done      # Called as on_done(stage, item, ok, value, seconds)
+        self.results = {}           # item -> {stage: (ok, value, seconds)}
+        self._stages = {}
+        self._pending = 0
+        self._condition = threading.Condition()
+
+    def stage(self, name, fn, limit=1, after=None):
+        executor = ThreadPoolExecutor(max_workers=max(1, limit), thread_name_prefix=name)
+        self._stages[name] = (fn, after, executor)
+
+    def add(self, item):
+        """Start an item's root stages; safe to call from a stage callback"""
+        with self._condition:
+            self.results.setdefault(item, {})
+        self._start(item, None)
+
+    def _start(self, item, finished_stage):
+        for name, (_, after, _) in self._stages.items():
+            if after == finished_stage:
+                with self._condition:
+                    self._pending += 1
+                self._stages[name][2].submit(self._run, name, item)
+
+    def _run(self, name, item):
+        start = time.monotonic()
+        try:
+            ok, value = self._stages[name][0](item)
+        except Exception as e:
+            ok, value = False, e
+        seconds = time.monotonic() - start
+        with self._condition:
+            self.results[item][name] = (ok, value, seconds)
+        try:
+            try:
+                if self.on_done:
+                    self.on_done(name, item, ok, value, seconds)
+            except Exception as e:
+                # A failing callback fails the stage, so its successors never start
+                ok, value = False, e
+                with self._condition:
+                    self.results[item][name] = (ok, value, seconds)
+                print(f"[x] {name} {item}: {e}")
+            if ok:
+                self._start(item, name)
+        finally:
+            # Successors are queued before this stage counts as done, so wait() cannot return early
+            with self._condition:
+                self._pending -= 1
+                self._condition.notify_all()
+
+    def wait(self):
+        """Block until no stage is running or queued"""
+        with self._condition:
+            while self._pending:
+                self._condition.wait()
+
+    def close(self):
+        for _, _, executor in self._stages.values():
+            executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def run_pipelined(clone_options=None, audit_options=None, dataset_options=None, limits=None, journal=None):
+    """Run cloning, auditing and dataset preparation per repository
+
+    clone_options go to phase1.clone_repository (mirror_cache, filter_spec,
+    depth), audit_options to the audit (full, fsck_tier, max_network_jobs,
+    max_cpu_jobs, refs_ttl) and dataset_options to the dataset stage
+    (exclude, include, workers, incremental, tokenizer, source). The integrity report
+    and dataset match what the phase-by-phase run produces; the dataset is
+    only assembled when every repository was cloned and passed its audit.
+    Repositories are the ecosystem README's plus any other clone already on
+    disk, which is audited and prepared as is, the same set the phases walk.
+    Audit results are written to the report in repository order once every
+    audit has finished.
+    With a run journal, unchanged clones and audits are skipped as in the
+    phase-by-phase run.
+    """
+    clone_options = clone_options or {}
+    audit_options = audit_options or {}
+    dataset_options = dataset_options or {}
+    limits = dict(PIPELINE_STAGE_LIMITS, **{k: v for k, v in (limits or {}).items() if v})
+    repositories_dir = phase1.REPOSITORIES_DIR
+    print(f"Stage limits: clone {limits['clone']}, audit {limits['audit']}, prepare {limits['prepare']}")
+
+    # Shared by every repository's audit, as in run_phase2
+    full = audit_options.get('full', False)
+    fsck_tier = audit_options.get('fsck_tier') or phase2.FSCK_TIER
+    max_network_jobs = audit_options.get('max_network_jobs') or phase2.MAX_NETWORK_JOBS
+    network_slots = phase2._slots(max_network_jobs)
+    cpu_slots = phase2._slots(audit_options.get('max_cpu_jobs') or phase2.MAX_CPU_JOBS)
+    refs_ttl = audit_options.get('refs_ttl')
+    remote_refs = RemoteRefCache(ttl=REMOTE_REFS_TTL if refs_ttl is None else refs_ttl,
+                                 network_slots=network_slots)
+
+    exclude_globs = phase3.EXCLUDED_GLOBS + list(dataset_options.get('exclude') or [])
+    include_globs = phase3.INCLUDED_GLOBS + list(dataset_options.get('include') or [])
+    incremental = dataset_options.get('incremental', True)
+    source = dataset_options.get('source') or phase3.DATASET_SOURCE
+    ingest_workers = dataset_options.get('workers') or INGEST_WORKERS
+    if source == 'git':
+        print("Dataset source: git objects at HEAD")
+        ingest_workers = 1  # Git reads share one cat-file pipe per repository
+    segments = phase3.dataset_segment_cache(exclude_globs, include_globs, source)
+    output_lock = threading.Lock()
+    local_only = set()  # Clones on disk the README does not list
+
+    def clone(name):
+        if name in local_only:
+            return True, "existing clone, not listed in the README"
+        _, ok, message, _ = phase1.clone_repository(
+            name, phase1.CLONE_URL_TEMPLATE.format(name=name), journal=journal, remote_refs=remote_refs,
+            **clone_options)
+        return ok, message
+
+    def audit(name):
+        verifier = phase2.IntegrityVerifier(repositories_dir / name, network_slots, cpu_slots, buffered=True,
+                                            remote_refs=remote_refs,
+                                            manifest=AuditManifest(name, AUDIT_MANIFEST_DIR),
+                                            full=full, fsck_tier=fsck_tier, journal=journal)
+        result = verifier.verify(levels=phase2.VERIFICATION_LEVELS)
+        return result['overall_status'] == 'PASS', (verifier, result)
+
+    def prepare(name):
+        lines = []
+        reuse = incremental and not (journal and journal.forced('dataset', name))
+        segment_path, meta = phase3.prepare_repo_segment(repositories_dir / name, segments, exclude_globs,
+                                                         include_globs, ingestor, reuse, log=lines.append,
+                                                         source=source)
+        return True, (segment_path, meta, lines)
+
+    def on_done(stage, name, ok, value, seconds):
+        with output_lock:
+            if stage == 'clone':
+                print(f"[{'✓' if ok else 'x'}] clone {name}: {value}" + (f" in {seconds:.1f}s" if ok else ''))
+            elif isinstance(value, Exception):
+                print(f"[x] {stage} {name}: {value}")
+            elif stage == 'audit':
+                print(f"[{'✓' if ok else 'x'}] audit {name} in {seconds:.1f}s")
+                value[0].flush_output()
+            else:
+                print(f"[✓] prepare {name} in {seconds:.1f}s")
+                print("\n".join(value[2]))
+        # The ecosystem README names everything else; other clones on disk are processed as the phases would
+        if stage == 'clone' and ok and name == phase1.ECOSYSTEM_REPO:
+            listed = phase1.ecosystem_repo_names(repositories_dir / name)
+            for other in listed:
+                if other != name:
+                    pipeline.add(other)
+            for repo_path in phase1.local_repositories(repositories_dir):
+                if repo_path.name != name and repo_path.name not in listed:
+                    local_only.add(repo_path.name)
+                    pipeline.add(repo_path.name)
+
+    start = datetime.now()
+    report = phase2.open_report(full, fsck_tier)
+    repositories_dir.mkdir(parents=True, exist_ok=True)
+    if clone_options.get('mirror_cache', True):
+        phase1.MIRROR_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    with FileIngestor(ingest_workers) as ingestor, \
+            StagePipeline(on_done) as pipeline:
+        pipeline.stage('clone', clone, limits['clone'])
+        pipeline.stage('audit', audit, limits['audit'], after='clone')
+        pipeline.stage('prepare', prepare, limits['prepare'], after='clone')
+        pipeline.add(phase1.ECOSYSTEM_REPO)
+        pipeline.wait()
+    remote_refs.save()
+    print(f"All stages finished in {(datetime.now() - start).total_seconds():.2f} seconds")
+
+    results = pipeline.results
+    names = sorted(results)
+    failed_clones = [name for name in names if not results[name]['clone'][0]]
+
+    # Integrity report over every cloned repository in repository order, as the phase 2 run writes it;
+    # audits that raised are recorded as failures
+    print("\n" + "=" * 60)
+    print("PHASE 2: Integrity Audit")
+    print("=" * 60)
+    for name in names:
+        ok, value, _ = results[name].get('audit', (False, None, 0))
+        if isinstance(value, tuple):
+            report.add(value[1])
+        elif name not in failed_clones:
+            report.add({'repo': name, 'overall_status': 'FAIL',
+                        'levels': {'level_1': {'status': 'ERROR', 'message': str(value)}}})
+    audit_passed = phase2.summarize_audit(report, start)
+
+    prepared = {name: results[name]['prepare'][1] for name in names
+                if results[name].get('prepare', (False,))[0]}
+    if failed_clones or not audit_passed or len(prepared) != len(names):
+        if failed_clones:
+            print(f"Cloning failed for: {', '.join(failed_clones)}")
+        print("Dataset assembly skipped: not every repository was cloned, audited and prepared.")
+        return False
+
+    # Assemble the blocks in curriculum order
+    print("\n" + "=" * 60)
+    print("PHASE 3: Dataset Assembly")
+    print("=" * 60)
+    files_count = skipped_count = 0
+    policy_decisions = []
+    with DatasetWriter(phase3.OUTPUT_DATASET_FILE) as outfile:
+        for repo_path in phase3.curriculum_order(repositories_dir / name for name in prepared):
+            segment_path, meta, _ = prepared[repo_path.name]
+            phase3.append_segment(outfile, segments, repo_path.name, segment_path, meta)
+            files_count += meta['files']
+            skipped_count += meta['skipped'] + meta['errors']
+            policy_decisions += meta['policy']
+
+    print(f"  Total repositories processed: {len(prepared)}")
+    print(f"  Total text files added: {files_count}")
+    print(f"  Total files skipped (binary/extension/error): {skipped_count}")
+    reused = sum(1 for _, meta, _ in prepared.values() if meta['cached'])
+    print(f"  Repositories reused from segment cache: {reused} ({len(prepared) - reused} rebuilt)")
+    phase3.print_skip_report(policy_decisions)
+    print(f"Dataset successfully created at: {phase3.OUTPUT_DATASET_FILE}")
+    if not phase3.verify_dataset(outfile):
+        return False
+    if dataset_options.get('tokenizer'):
+        phase3.export_dataset_tokens(phase3.OUTPUT_DATASET_FILE, dataset_options['tokenizer'])
+    return True
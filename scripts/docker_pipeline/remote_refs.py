@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Remote Ref Cache
+Resolves remote refs with one `git ls-remote` per remote per audit and keeps
+the answers on disk for a TTL, so every audit level reads the same snapshot.
+An answer this cache asked for itself is reused for its whole life, whatever
+the TTL; the TTL only decides whether answers from an earlier run are trusted
+"""
+
+import json
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from pathlib import Path
+
+import instrumentation
+
+# Configuration
+REMOTE_REFS_CACHE = Path('/app/output/.cache/remote_refs.json')
+REMOTE_REFS_TTL = 600  # Seconds before a cached ls-remote answer is asked again
+
+_DEFAULT_CACHE = object()
+
+class RemoteRefCache:
+    """ls-remote answers per remote URL, kept on disk at cache_path
+
+    cache_path defaults to REMOTE_REFS_CACHE as set when the cache is
+    created, so relocating that one constant moves every phase's cache;
+    None keeps the answers in memory only.
+    """
+
+    def __init__(self, cache_path=_DEFAULT_CACHE, ttl=REMOTE_REFS_TTL, network_slots=None):
+        if cache_path is _DEFAULT_CACHE:
+            cache_path = REMOTE_REFS_CACHE
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.ttl = ttl
+        self.network_slots = network_slots or nullcontext()
+        self._entries = self._load()
+        self._locks = {}
+        self._urls = {}
+        self._asked = set()  # URLs answered by ls-remote during this cache's life
+        self._lock = threading.Lock()
+        self.remote_calls = 0
+
+    def _load(self):
+        """Read the on-disk cache, ignoring a missing or unreadable file"""
+        if not self.cache_path or not self.cache_path.exists():
+            return {}
+        try:
+            with open(self.cache_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self):
+        """Write the cache atomically"""
+        if not self.cache_path:
+            return
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_suffix('.tmp')
+        with self._lock:
+            with open(tmp_path, 'w') as f:
+                json.dump(self._entries, f, indent=2)
+        os.replace(tmp_path, self.cache_path)
+
+    def _url_lock(self, url):
+        with self._lock:
+            return self._locks.setdefault(url, threading.Lock())
+
+    def remote_url(self, repo_path, remote='origin'):
+        """Return the configured URL of a repository's remote, or None"""
+        key = (str(repo_path), remote)
+        if key not in self._urls:
+            with instrumentation.git_span('config'):
+                result = subprocess.run(
+                    ['git', 'config', '--get', f'remote.{remote}.url'],
+                    cwd=repo_path,
+                    capture_output=True,
+                    text=True
+                )
+            self._urls[key] = result.stdout.strip() if result.returncode == 0 else None
+        return self._urls[key]
+
+    def refs_for_url(self, url):
+        """Return {'refs': {ref: oid}, 'symrefs': {ref: target}} for a remote URL, or None"""
+        # Per-URL lock: concurrent levels/repos asking the same remote wait for one call
+        with self._url_lock(url):
+            entry = self._entries.get(url)
+            if entry and (url in self._asked or time.time() - entry['fetched_at'] < self.ttl):
+                return entry
+
+            with self.network_slots, instrumentation.git_span('ls-remote'):
+                result = subprocess.run(
+                    ['git', 'ls-remote', '--symref', url],
+                    capture_output=True,
+                    text=True
+                )
+            self.remote_calls += 1
+            if result.returncode != 0:
+                return None
+
+            refs, symrefs = {}, {}
+            for line in result.stdout.splitlines():
+                target, _, ref = line.partition('\t')
+                if target.startswith('ref: '):
+                    symrefs[ref] = target[len('ref: '):]
+                elif ref:
+                    refs[ref] = target
+
+            entry = {'fetched_at': time.time(), 'refs': refs, 'symrefs': symrefs}
+            with self._lock:
+                self._entries[url] = entry
+                self._asked.add(url)
+            return entry
+
+    def refs(self, repo_path, remote='origin'):
+        """Return the cached ref snapshot for a repository's remote, or None"""
+        url = self.remote_url(repo_path, remote)
+        return self.refs_for_url(url) if url else None
+
+    def head(self, repo_path, remote='origin'):
+        """Return the commit the remote's HEAD points to, or None"""
+        entry = self.refs(repo_path, remote)
+        return entry['refs'].get('HEAD') if entry else None
+
+    def fetched_at(self, repo_path, remote='origin'):
+        """Return when the remote's cached snapshot was taken (epoch seconds), or None"""
+        entry = self.refs(repo_path, remote)
+        return entry['fetched_at'] if entry else None
+
+    def prefetch(self, repo_paths, workers=4, remote='origin'):
+        """Resolve the remotes of many repositories concurrently ahead of the audit"""
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            list(executor.map(lambda path: self.refs(path, remote), repo_paths))
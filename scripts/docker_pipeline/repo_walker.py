@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Repository Walker
+Lazily walks a repository with os.scandir, pruning excluded directories
+before descending into them and reusing the cached DirEntry type/stat data
+"""
+
+import os
+from fnmatch import fnmatchcase
+
+def matches_any(name, relative_path, patterns):
+    """Check a glob list against an entry's name or its repo-relative path"""
+    return any(fnmatchcase(name, pattern) or fnmatchcase(relative_path, pattern)
+               for pattern in patterns)
+
+def walks_path(relative_path, excluded_names=(), exclude_globs=(), include_globs=()):
+    """Whether walk_repo_files would yield a file at this '/'-separated path, if it existed"""
+    parts = relative_path.split('/')
+    if any(name in excluded_names or matches_any(name, '/'.join(parts[:i + 1]), exclude_globs)
+           for i, name in enumerate(parts)):
+        return False
+    return not include_globs or matches_any(parts[-1], relative_path, include_globs)
+
+def walk_repo_files(root, excluded_names=(), exclude_globs=(), include_globs=()):
+    """Yield (relative_path, DirEntry) for every file below root
+
+    Entries are sorted by name within each directory and directories are
+    visited in place, which is the same order as sorting all files by their
+    relative path parts. Directories matching excluded_names or exclude_globs
+    are never opened. Symlinked directories are not followed (like rglob);
+    symlinks to files are yielded. include_globs, when given, must match a file.
+    """
+    # Stack of (directory path, relative prefix, sorted entries, next index)
+    stack = [(os.fspath(root), '', None, 0)]
+    while stack:
+        path, prefix, entries, index = stack.pop()
+        if entries is None:
+            try:
+                with os.scandir(path) as it:
+                    entries = sorted(it, key=lambda entry: entry.name)
+            except OSError:
+                continue
+        while index < len(entries):
+            entry = entries[index]
+            index += 1
+            relative_path = prefix + entry.name
+            if entry.name in excluded_names or matches_any(entry.name, relative_path, exclude_globs):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    # Resume this directory after the subdirectory is done
+                    stack.append((path, prefix, entries, index))
+                    stack.append((entry.path, relative_path + '/', None, 0))
+                    break
+                if not entry.is_file():
+                    continue
+            except OSError:
+                continue
+            if include_globs and not matches_any(entry.name, relative_path, include_globs):
+                continue
+            yield relative_path, entry
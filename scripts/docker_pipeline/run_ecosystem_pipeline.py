@@ -7,9 +7,92 @@ Executes the three-phase workflow: Cloning → Integrity Audit → Dataset Prepa
 import os
 import sys
 import time
+import argparse
 from datetime import datetime
 
-def main():
+def parse_args(argv=None):
+    """Parse pipeline command line options"""
+    parser = argparse.ArgumentParser(description="ASI Ecosystem Pipeline")
+    parser.add_argument('--pipelined', action='store_true',
+                        help="Audit and prepare each repository as soon as it is cloned instead of phase by phase")
+    parser.add_argument('--prepare-workers', type=int, default=None,
+                        help="Repositories whose dataset block is built at once with --pipelined (default: 2)")
+    parser.add_argument('--clone-workers', type=int, default=None,
+                        help="Repositories cloned at once in phase 1 (default: 4)")
+    parser.add_argument('--clone-filter', default=None,
+                        help="Partial clone filter for phase 1 working clones, e.g. blob:none")
+    parser.add_argument('--clone-depth', type=int, default=None,
+                        help="Shallow phase 1 working clones with this many commits")
+    parser.add_argument('--no-checkout', action='store_true',
+                        help="Clone without a working tree; phase 3 reads git objects (implies --dataset-source git)")
+    parser.add_argument('--no-mirror-cache', action='store_true',
+                        help="Clone straight from the remotes instead of through the bare mirror cache")
+    parser.add_argument('--audit-workers', type=int, default=None,
+                        help="Repositories audited concurrently in phase 2 (default: sequential)")
+    parser.add_argument('--max-network-jobs', type=int, default=None,
+                        help="Cap on concurrent ls-remote/fetch calls in phase 2")
+    parser.add_argument('--max-cpu-jobs', type=int, default=None,
+                        help="Cap on concurrent fsck/hashing jobs in phase 2")
+    parser.add_argument('--refs-ttl', type=int, default=None,
+                        help="Seconds a cached ls-remote answer from an earlier run stays valid in phase 2 "
+                             "(default: ask every remote afresh; --pipelined keeps the cache TTL)")
+    parser.add_argument('--full', action='store_true',
+                        help="Re-verify everything in phase 2 instead of reusing the last audit's manifest")
+    parser.add_argument('--fsck-tier', choices=['connectivity', 'loose', 'full'], default=None,
+                        help="Level 2 fsck depth in phase 2 (default: full)")
+    parser.add_argument('--ingest-workers', type=int, default=None,
+                        help="Threads reading source files ahead of the phase 3 writer (default: sequential)")
+    parser.add_argument('--dataset-source', choices=['worktree', 'git'], default=None,
+                        help="Read phase 3 files from the working tree or from git objects at HEAD (default: worktree)")
+    parser.add_argument('--exclude', action='append', default=[],
+                        help="Name or path glob pruned from phase 3 walks, e.g. build (repeatable)")
+    parser.add_argument('--include', action='append', default=[],
+                        help="Name or path glob a phase 3 file must match (repeatable)")
+    parser.add_argument('--shard-size-mb', type=int, default=None,
+                        help="Write the phase 3 dataset as shards of this size with a byte-offset index")
+    parser.add_argument('--rebuild-dataset', action='store_true',
+                        help="Regenerate every phase 3 repository block instead of reusing cached segments")
+    parser.add_argument('--dedup', choices=['exact', 'near'], default=None,
+                        help="Drop duplicate files in phase 3, keeping the first in curriculum order")
+    parser.add_argument('--dedup-threshold', type=float, default=None,
+                        help="Similarity at which --dedup near drops a file (default: 0.85)")
+    parser.add_argument('--export-tokens', metavar='TOKENIZER', default=None,
+                        help="Also export phase 3 as a token array: bytes, tiktoken:<encoding> or hf:<model>")
+    parser.add_argument('--force', action='append', default=[], metavar='PHASE[:REPO]',
+                        help="Redo work the run journal marks as done: clone, audit, dataset or all, "
+                             "optionally for one repository, e.g. audit:asi-ecosystem (repeatable)")
+    parser.add_argument('--no-journal', action='store_true',
+                        help="Neither consult nor update the run journal")
+    parser.add_argument('--metrics', action='store_true',
+                        help="Record timing, byte, RSS and subprocess spans to metrics.jsonl and metrics.prom")
+    args = parser.parse_args(argv)
+    if args.no_checkout:
+        if args.dataset_source == 'worktree':
+            parser.error("--no-checkout leaves no working tree for --dataset-source worktree")
+        args.dataset_source = 'git'
+    from run_journal import parse_force
+    try:
+        parse_force(args.force)
+    except ValueError as e:
+        parser.error(str(e))
+    return args
+
+def print_completion():
+    print("\n" + "=" * 60)
+    print("PIPELINE EXECUTION COMPLETED SUCCESSFULLY")
+    print("=" * 60)
+    print(f"End Time: {datetime.now().isoformat()}")
+    print("\nOutputs available in /app/output/")
+    print(" - integrity_report.jsonl")
+    print(" - integrity_summary.json")
+    print(" - dataset.txt")
+    print(" - skip_report.json")
+    print(" - run_journal.jsonl")
+
+def main(args=None):
+    if args is None:
+        args = parse_args([])
+
     print("ASI Ecosystem Pipeline")
     print("=" * 60)
     print(f"Start Time: {datetime.now().isoformat()}")
@@ -17,14 +100,60 @@ def main():
     
     # Create output directory
     os.makedirs('/app/output', exist_ok=True)
+
+    # Resume from what earlier runs finished with unchanged inputs
+    journal = None
+    if not args.no_journal:
+        from run_journal import RunJournal, RUN_JOURNAL_PATH
+        journal = RunJournal(RUN_JOURNAL_PATH, force=args.force)
+        print(f"Run journal: {RUN_JOURNAL_PATH}" + (f" (forcing {', '.join(args.force)})" if args.force else ''))
+
+    import instrumentation
+    if args.metrics:
+        recorder = instrumentation.enable('/app/output')
+        print(f"Metrics: {recorder.jsonl_path}, {recorder.prom_path}")
     
     try:
+        if args.pipelined and (args.shard_size_mb or args.dedup):
+            print("--pipelined does not support sharded or deduplicated output; running phase by phase.")
+        elif args.pipelined:
+            print("\n" + "=" * 60)
+            print("PIPELINED EXECUTION: clone -> audit + prepare per repository -> assembly")
+            print("=" * 60)
+            from pipeline_scheduler import run_pipelined
+            with instrumentation.span('phase', phase='pipelined'):
+                pipeline_success = run_pipelined(
+                    clone_options=dict(mirror_cache=not args.no_mirror_cache, filter_spec=args.clone_filter,
+                                       depth=args.clone_depth, checkout=not args.no_checkout),
+                    audit_options=dict(full=args.full, fsck_tier=args.fsck_tier, refs_ttl=args.refs_ttl,
+                                       max_network_jobs=args.max_network_jobs, max_cpu_jobs=args.max_cpu_jobs),
+                    dataset_options=dict(exclude=args.exclude, include=args.include, workers=args.ingest_workers,
+                                         incremental=not args.rebuild_dataset, tokenizer=args.export_tokens,
+                                         source=args.dataset_source),
+                    limits=dict(clone=args.clone_workers, audit=args.audit_workers,
+                                prepare=args.prepare_workers),
+                    journal=journal
+                )
+            if not pipeline_success:
+                print("Pipelined execution failed. Stopping pipeline.")
+                return False
+            print_completion()
+            return True
+
         # Phase 1: Ecosystem Cloning
         print("\n" + "=" * 60)
         print("PHASE 1: Ecosystem Cloning")
         print("=" * 60)
         from phase1_cloning import run_phase1
-        phase1_success = run_phase1()
+        with instrumentation.span('phase', phase='clone'):
+            phase1_success = run_phase1(
+                workers=args.clone_workers,
+                filter_spec=args.clone_filter,
+                depth=args.clone_depth,
+                mirror_cache=not args.no_mirror_cache,
+                checkout=not args.no_checkout,
+                journal=journal
+            )
         
         if not phase1_success:
             print("Phase 1 failed. Stopping pipeline.")
@@ -35,7 +164,16 @@ def main():
         print("PHASE 2: Integrity Audit")
         print("=" * 60)
         from phase2_integrity import run_phase2
-        phase2_success = run_phase2()
+        with instrumentation.span('phase', phase='audit'):
+            phase2_success = run_phase2(
+                workers=args.audit_workers,
+                max_network_jobs=args.max_network_jobs,
+                max_cpu_jobs=args.max_cpu_jobs,
+                refs_ttl=args.refs_ttl,
+                full=args.full,
+                fsck_tier=args.fsck_tier,
+                journal=journal
+            )
         
         if not phase2_success:
             print("Phase 2 failed. Stopping pipeline.")
@@ -46,27 +184,34 @@ def main():
         print("PHASE 3: Dataset Preparation")
         print("=" * 60)
         from phase3_dataset import run_phase3
-        phase3_success = run_phase3()
+        with instrumentation.span('phase', phase='dataset'):
+            phase3_success = run_phase3(
+                workers=args.ingest_workers,
+                exclude=args.exclude,
+                include=args.include,
+                shard_size=args.shard_size_mb * 1024 * 1024 if args.shard_size_mb else None,
+                tokenizer=args.export_tokens,
+                dedup=args.dedup,
+                dedup_threshold=args.dedup_threshold,
+                incremental=not args.rebuild_dataset,
+                journal=journal,
+                source=args.dataset_source
+            )
         
         if not phase3_success:
             print("Phase 3 failed. Stopping pipeline.")
             return False
         
         # Pipeline completed successfully
-        print("\n" + "=" * 60)
-        print("PIPELINE EXECUTION COMPLETED SUCCESSFULLY")
-        print("=" * 60)
-        print(f"End Time: {datetime.now().isoformat()}")
-        print("\nOutputs available in /app/output/")
-        print(" - integrity_report.json")
-        print(" - dataset.txt")
-        
+        print_completion()
         return True
         
     except Exception as e:
         print(f"Pipeline execution failed with error: {e}")
         return False
+    finally:
+        instrumentation.finish()
 
 if __name__ == "__main__":
-    success = main()
+    success = main(parse_args())
     sys.exit(0 if success else 1)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Run Journal
+Durable, append-only record of what each pipeline phase finished for each
+repository and the fingerprint of the inputs it finished it with, so a
+restarted run skips work whose inputs are unchanged
+"""
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+
+# Configuration
+RUN_JOURNAL_PATH = Path('/app/output/run_journal.jsonl')
+JOURNAL_PHASES = ['clone', 'audit', 'dataset']
+
+def fingerprint(**inputs):
+    """Stable hash of a phase's inputs; None if any input is unknown (never matches)"""
+    if any(value is None for value in inputs.values()):
+        return None
+    data = json.dumps(inputs, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+def parse_force(specs):
+    """Validate --force specs: PHASE, PHASE:REPO or all[:REPO]"""
+    forced = set()
+    for spec in specs or ():
+        phase = spec.partition(':')[0]
+        if phase not in JOURNAL_PHASES + ['all']:
+            raise ValueError(f"Unknown phase in --force '{spec}' (expected {', '.join(JOURNAL_PHASES)} or all)")
+        forced.add(spec)
+    return forced
+
+class RunJournal:
+    """JSON-lines journal; the last record for a (phase, repo) pair wins
+
+    Every record is flushed and fsynced before the work it describes is
+    treated as done, so a preempted run loses at most the step in progress.
+    A torn last line from a crash mid-write is ignored on load.
+    """
+
+    def __init__(self, path=RUN_JOURNAL_PATH, force=()):
+        self.path = Path(path)
+        self.force = parse_force(force)
+        self.run_id = datetime.now().isoformat()
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        lines = 0
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        entry = json.loads(line)
+                        self._entries[(entry['phase'], entry['repo'])] = entry
+                    except (ValueError, KeyError):
+                        continue
+        except OSError:
+            return
+        # Keep the file proportional to the work it describes
+        if lines > 2 * len(self._entries):
+            self._compact()
+
+    def _compact(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for entry in self._entries.values():
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def forced(self, phase, repo=None):
+        return bool({'all', phase, f'all:{repo}', f'{phase}:{repo}'} & self.force)
+
+    def lookup(self, phase, repo, inputs_fingerprint):
+        """Return the recorded result if phase/repo finished with these inputs, else None"""
+        if not inputs_fingerprint or self.forced(phase, repo):
+            return None
+        with self._lock:
+            entry = self._entries.get((phase, repo))
+            if not entry or entry['fingerprint'] != inputs_fingerprint:
+                return None
+        return entry.get('result') or {}
+
+    def record(self, phase, repo, inputs_fingerprint, result=None):
+        """Durably mark phase/repo as finished for these inputs"""
+        if not inputs_fingerprint:
+            return
+        entry = {'phase': phase, 'repo': repo, 'fingerprint': inputs_fingerprint,
+                 'run_id': self.run_id, 'finished_at': datetime.now().isoformat(), 'result': result}
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._entries[(phase, repo)] = entry
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Dataset Segment Cache
+Keeps each repository's block of the phase 3 dataset on disk, keyed by the
+repository's HEAD tree ID and the phase 3 configuration, so a rebuild only
+regenerates the repositories that changed and copies the rest
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+from pathlib import Path
+
+import instrumentation
+from repo_walker import walk_repo_files, walks_path
+
+# Configuration
+SEGMENT_CACHE_DIR = Path('/app/output/.cache/dataset_segments')
+SEGMENT_FORMAT_VERSION = 1
+
+def config_fingerprint(**config):
+    """Hash of everything besides the tree that shapes a segment (extensions, globs, tokens)"""
+    data = json.dumps(dict(config, version=SEGMENT_FORMAT_VERSION), sort_keys=True)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+def clean_tree_id(repo_path, excluded_names=(), exclude_globs=(), include_globs=(), extensions=()):
+    """Return the HEAD tree ID if every file phase 3 would read matches it, else None
+
+    Phase 3 reads the working tree, so a modified, deleted, untracked or
+    ignored file makes the tree ID an unsafe key, but only if the walker
+    would read it: paths it prunes (excluded names and globs, include
+    globs, extensions) do not count, so build output or __pycache__ left
+    in a clone does not disable the cache. Ignored files still count when
+    they would be read, since the walker does not consult .gitignore.
+    """
+    try:
+        with instrumentation.git_span('rev-parse'):
+            tree = subprocess.run(['git', '-C', str(repo_path), 'rev-parse', '--verify', '-q', 'HEAD^{tree}'],
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        with instrumentation.git_span('status'):
+            status = subprocess.run(['git', '-C', str(repo_path), 'status', '--porcelain=v1', '-z',
+                                     '--untracked-files=all', '--ignored=matching'],
+                                    capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    def read_by_walker(path):
+        return (walks_path(path, excluded_names, exclude_globs, include_globs)
+                and (not extensions or os.path.splitext(path)[1].lower() in extensions))
+
+    records = iter(status.split('\0'))
+    for record in records:
+        if not record:
+            continue
+        code, path = record[:2], record[3:]
+        if 'R' in code or 'C' in code:
+            # Renames and copies are followed by their source path
+            if read_by_walker(next(records, '')):
+                return None
+        if path.endswith('/'):
+            # A whole ignored directory, or a nested repository: look at what the walker would find in it
+            directory = path.rstrip('/')
+            if any(read_by_walker(f"{directory}/{relative_path}") for relative_path, _ in
+                   walk_repo_files(Path(repo_path) / directory, excluded_names)):
+                return None
+        elif read_by_walker(path):
+            return None
+    return tree or None
+
+class SegmentCache:
+    """One <repo>.txt segment plus <repo>.json metadata per repository"""
+
+    def __init__(self, cache_dir=SEGMENT_CACHE_DIR, fingerprint=''):
+        self.cache_dir = Path(cache_dir)
+        self.fingerprint = fingerprint
+        self.hits = 0
+
+    def key(self, tree_id):
+        return hashlib.sha256(f"{self.fingerprint}:{tree_id}".encode()).hexdigest() if tree_id else None
+
+    def segment_path(self, repo_name):
+        return self.cache_dir / f"{repo_name}.txt"
+
+    def lookup(self, repo_name, key):
+        """Return the metadata of a valid cached segment for key, or None"""
+        if key:
+            try:
+                with open(self.cache_dir / f"{repo_name}.json", 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+                if meta.get('key') == key and os.path.getsize(self.segment_path(repo_name)) == meta['bytes']:
+                    self.hits += 1
+                    return meta
+            except (OSError, ValueError, KeyError):
+                pass
+        return None
+
+    def temp_path(self, repo_name):
+        """Where a repository block is written before it is stored"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        return self.cache_dir / f"{repo_name}.txt.tmp"
+
+    def store(self, repo_name, key, tmp_path, **meta):
+        """Publish a written segment under key (metadata last, so a crash leaves no false hit)"""
+        meta_path = self.cache_dir / f"{repo_name}.json"
+        if meta_path.exists():
+            meta_path.unlink()
+        os.replace(tmp_path, self.segment_path(repo_name))
+        tmp_path = meta_path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(dict(meta, key=key), f)
+        os.replace(tmp_path, meta_path)
+
+    def discard(self, tmp_path):
+        """Drop a written segment that must not be cached"""
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
@@ -4,7 +4,7 @@ echo "Starting ASI Ecosystem Pipeline Container"
 echo "=========================================="
 
 # Run the main pipeline
-python run_ecosystem_pipeline.py
+python run_ecosystem_pipeline.py "$@"
 
 # Keep container running
 echo "Pipeline execution completed. Container remains active for inspection."
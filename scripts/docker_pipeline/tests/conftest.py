@@ -0,0 +1,149 @@
+"""
+Shared fixtures: a tiny ecosystem of git repositories built in tmp_path, and
+the pipeline's output locations pointed into it
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+# The pipeline modules are flat scripts in the parent directory
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+GIT_ENV = dict(os.environ, GIT_AUTHOR_NAME='test', GIT_AUTHOR_EMAIL='test@example.com',
+               GIT_COMMITTER_NAME='test', GIT_COMMITTER_EMAIL='test@example.com',
+               GIT_CONFIG_GLOBAL=os.devnull, GIT_CONFIG_NOSYSTEM='1')
+
+SHARED_TEXT = ' '.join(f"token{i % 97} value{i % 13}" for i in range(200))
+
+# name -> {relative path: str or bytes content}
+REPOSITORIES = {
+    'asi-ecosystem': {
+        'README.md': "# ASI Ecosystem\n\n- [alpha](https://github.com/ronniross/alpha)\n"
+                     "- [beta](https://github.com/ronniross/beta)\n",
+    },
+    'alpha': {
+        'README.md': "# alpha\n",
+        'main.py': "def main():\n    print('alpha')\n",
+        'docs/guide.md': "Guide\n\n" + SHARED_TEXT + "\n",
+        'docs/unicode.txt': "café – naïve \U0001f600\n",
+        'config.json': '{"key": "value"}\n',
+        'image.png': b'\x89PNG\r\n\x1a\n\0\0\0binary',
+        'blob.txt': b'text with a NUL\0byte\n',
+        'node_modules/dep/index.js': "module.exports = 1;\n",
+        'api_pb2.py': "# generated protobuf module\n",
+        'empty.md': "",
+    },
+    'beta': {
+        'README.md': "# beta\n",
+        'copy_of_main.py': "def main():\n    print('alpha')\n",
+        'notes/near.md': "Notes\n\n" + SHARED_TEXT + " extra\n",
+        'src/lib.rs': "fn main() {}\n",
+        'mentions_tokens.md': "The format uses <|file_end|> and <|repo_end|> markers.\n",
+    },
+}
+
+def git(*args, cwd=None):
+    """Run a git command quietly with a fixed identity, returning stdout"""
+    return subprocess.run(['git', *args], cwd=cwd, env=GIT_ENV, check=True,
+                          capture_output=True, text=True).stdout
+
+def make_repo(path, files):
+    """Create a git repository at path holding files, committed on main"""
+    path.mkdir(parents=True)
+    git('init', '-q', '-b', 'main', str(path))
+    for relative_path, content in files.items():
+        file_path = path / relative_path
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_bytes(content if isinstance(content, bytes) else content.encode('utf-8'))
+    git('add', '-A', cwd=path)
+    git('commit', '-q', '-m', 'initial', cwd=path)
+    return path
+
+@pytest.fixture
+def repositories(tmp_path):
+    """Directory of freshly committed working clones, one per REPOSITORIES entry"""
+    root = tmp_path / 'repositories'
+    for name, files in REPOSITORIES.items():
+        make_repo(root / name, files)
+    if hasattr(os, 'symlink'):
+        os.symlink('main.py', root / 'alpha' / 'link.py')
+        git('add', 'link.py', cwd=root / 'alpha')
+        git('commit', '-q', '-m', 'link', cwd=root / 'alpha')
+    return root
+
+@pytest.fixture
+def dataset_env(tmp_path, monkeypatch, repositories):
+    """Point phase 3 at the fixture repositories and tmp_path outputs
+
+    Returns build(name, **run_phase3 options), which runs phase 3 into
+    <name>.txt and returns the dataset's bytes.
+    """
+    import phase3_dataset
+    import token_export
+
+    monkeypatch.setattr(phase3_dataset, 'REPOSITORIES_SRC_DIR', repositories)
+    monkeypatch.setattr(phase3_dataset, 'SEGMENT_CACHE_DIR', tmp_path / 'segments')
+    monkeypatch.setattr(phase3_dataset, 'SKIP_REPORT_PATH', tmp_path / 'skip_report.json')
+    monkeypatch.setattr(phase3_dataset, 'DEDUP_REPORT_PATH', tmp_path / 'dedup_report.json')
+    monkeypatch.setattr(phase3_dataset, 'OUTPUT_SHARDS_DIR', tmp_path / 'shards')
+    monkeypatch.setattr(token_export, 'OUTPUT_TOKENS_DIR', tmp_path / 'tokens')
+
+    def build(name, **options):
+        output_path = tmp_path / f"{name}.txt"
+        monkeypatch.setattr(phase3_dataset, 'OUTPUT_DATASET_FILE', output_path)
+        assert phase3_dataset.run_phase3(**options)
+        return output_path.read_bytes() if output_path.exists() else None
+
+    return build
+
+@pytest.fixture
+def remotes(tmp_path, repositories):
+    """Bare copies of the fixture repositories, standing in for their GitHub remotes"""
+    root = tmp_path / 'remotes'
+    for repo_path in sorted(repositories.iterdir()):
+        git('clone', '-q', '--bare', str(repo_path), str(root / f"{repo_path.name}.git"))
+    return root
+
+@pytest.fixture
+def pipeline_env(tmp_path, monkeypatch, remotes):
+    """Point all three phases and the scheduler at tmp_path, cloning from remotes
+
+    Returns use(name), which gives a run its own clones, caches and outputs
+    under tmp_path/name and returns that directory.
+    """
+    import phase1_cloning
+    import phase2_integrity
+    import phase3_dataset
+    import pipeline_scheduler
+    import remote_refs
+
+    monkeypatch.setattr(phase1_cloning, 'CLONE_URL_TEMPLATE', f"{remotes.as_uri()}/{{name}}.git")
+
+    def use(name):
+        run_dir = tmp_path / name
+        settings = {
+            phase1_cloning: {'REPOSITORIES_DIR': run_dir / 'repositories', 'MIRROR_CACHE_DIR': run_dir / 'mirrors'},
+            phase2_integrity: {'REPOSITORIES_DIR': run_dir / 'repositories',
+                               'AUDIT_MANIFEST_DIR': run_dir / 'manifests',
+                               'REPORT_PATH': run_dir / 'integrity_report.jsonl',
+                               'SUMMARY_PATH': run_dir / 'integrity_summary.json'},
+            phase3_dataset: {'REPOSITORIES_SRC_DIR': run_dir / 'repositories',
+                             'SEGMENT_CACHE_DIR': run_dir / 'segments',
+                             'OUTPUT_DATASET_FILE': run_dir / 'dataset.txt',
+                             'SKIP_REPORT_PATH': run_dir / 'skip_report.json',
+                             'DEDUP_REPORT_PATH': run_dir / 'dedup_report.json',
+                             'OUTPUT_SHARDS_DIR': run_dir / 'shards'},
+            pipeline_scheduler: {'AUDIT_MANIFEST_DIR': run_dir / 'manifests'},
+            remote_refs: {'REMOTE_REFS_CACHE': run_dir / 'remote_refs.json'},
+        }
+        for module, values in settings.items():
+            for attribute, value in values.items():
+                monkeypatch.setattr(module, attribute, value)
+        run_dir.mkdir()
+        return run_dir
+
+    return use
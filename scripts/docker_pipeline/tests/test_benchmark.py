@@ -0,0 +1,25 @@
+import os
+
+import benchmark
+
+def output_defaults():
+    """Every production location a pipeline phase writes to by default"""
+    import phase1_cloning
+    import phase2_integrity
+    import phase3_dataset
+    import remote_refs
+    return [remote_refs.REMOTE_REFS_CACHE, phase1_cloning.REPOSITORIES_DIR, phase1_cloning.MIRROR_CACHE_DIR,
+            phase2_integrity.REPORT_PATH, phase2_integrity.SUMMARY_PATH, phase2_integrity.AUDIT_MANIFEST_DIR,
+            phase3_dataset.OUTPUT_DATASET_FILE, phase3_dataset.OUTPUT_SHARDS_DIR, phase3_dataset.SEGMENT_CACHE_DIR,
+            phase3_dataset.SKIP_REPORT_PATH, phase3_dataset.DEDUP_REPORT_PATH]
+
+def snapshot(paths):
+    return {path: os.stat(path).st_mtime_ns if os.path.exists(path) else None for path in paths}
+
+def test_benchmark_runs_inside_its_work_dir(tmp_path):
+    before = snapshot(output_defaults())
+    args = benchmark.parse_args(['--repos', '2', '--files', '5', '--history', '2', '--repeat', '1',
+                                 '--work-dir', str(tmp_path)])
+    assert benchmark.main(args)
+    assert (tmp_path / benchmark.BENCHMARK_RESULTS).exists()
+    assert snapshot(output_defaults()) == before
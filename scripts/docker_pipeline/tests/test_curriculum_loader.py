@@ -0,0 +1,57 @@
+from collections import Counter
+
+import pytest
+
+from curriculum_loader import CurriculumLoader, resolve_stages
+from token_export import load_tokenizer, special_token_ids
+
+STAGES = [('first', {'alpha': 2.0}), ('rest', {'*': 1.0})]
+
+def samples(path, **options):
+    return [(s.stage, s.repo, s.path) for s in CurriculumLoader(path, stages=STAGES, seed=7, **options)]
+
+@pytest.fixture
+def dataset_path(dataset_env, tmp_path):
+    dataset_env('dataset', incremental=False)
+    return tmp_path / 'dataset.txt'
+
+def test_resolve_stages_prefers_exact_names():
+    stages = [('a', {'*a*': 1.0}), ('b', {'beta': 0.5, 'gamma': 0})]
+    assert resolve_stages(['alpha', 'beta', 'gamma'], stages) == [('a', [('alpha', 1.0)]), ('b', [('beta', 0.5)])]
+
+def test_order_is_deterministic_and_staged(dataset_path):
+    order = samples(dataset_path)
+    assert order == samples(dataset_path, prefetch=0)
+    stages = [stage for stage, _, _ in order]
+    assert stages == sorted(stages, key=['first', 'rest'].index)
+    counts = Counter((repo, path) for _, repo, path in order)
+    assert counts[('alpha', 'main.py')] == 2
+    assert counts[('beta', 'src/lib.rs')] == 1
+
+def test_ranks_partition_the_order(dataset_path):
+    everything = samples(dataset_path, drop_last=False)
+    parts = [samples(dataset_path, rank=rank, world_size=3, drop_last=False) for rank in range(3)]
+    assert Counter(sample for part in parts for sample in part) == Counter(everything)
+    for stage in ('first', 'rest'):
+        stage_order = [sample for sample in everything if sample[0] == stage]
+        for rank, part in enumerate(parts):
+            assert [sample for sample in part if sample[0] == stage] == stage_order[rank::3]
+
+    even = [samples(dataset_path, rank=rank, world_size=3) for rank in range(3)]
+    assert len({len(part) for part in even}) == 1
+    assert CurriculumLoader(dataset_path, stages=STAGES, seed=7, rank=1, world_size=3).stage_sizes() == [
+        (stage, sum(1 for s, _, _ in even[1] if s == stage)) for stage in ('first', 'rest')
+    ]
+
+def test_packed_sequences_rebuild_the_token_stream(dataset_path):
+    separator = special_token_ids(load_tokenizer('bytes'))['file_end']
+    stream = []
+    for sample in CurriculumLoader(dataset_path, seed=3):
+        stream += list(sample.text.encode('utf-8')) + [separator]
+    packed = list(CurriculumLoader(dataset_path, seed=3, seq_len=64, drop_last=False))
+    assert all(len(sample.tokens) == 64 for sample in packed[:-1])
+    assert [token for sample in packed for token in sample.tokens] == stream
+
+def test_invalid_rank():
+    with pytest.raises(ValueError):
+        CurriculumLoader(rank=2, world_size=2)
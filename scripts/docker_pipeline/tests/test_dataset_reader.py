@@ -0,0 +1,59 @@
+import pytest
+
+from dataset_reader import DatasetReader, build_index
+
+DATASET = ("<|repo_start|>one\n"
+           "<|file_start|>a.md\nmentions \n<|file_end|>\n inline\n<|file_end|>\n"
+           "<|file_start|>b.txt\nb\n<|file_end|>\n"
+           "<|repo_end|>\n\n"
+           "<|repo_start|>two\n"
+           "<|file_start|>c.py\n\n<|file_end|>\n"
+           "<|repo_end|>\n\n").encode('utf-8')
+
+@pytest.fixture
+def dataset_path(tmp_path):
+    path = tmp_path / 'dataset.txt'
+    path.write_bytes(DATASET)
+    return path
+
+def test_build_index_does_not_split_on_mentioned_tokens():
+    repos = build_index(DATASET)
+    assert [repo['repo'] for repo in repos] == ['one', 'two']
+    assert [(path, DATASET[start:start + length]) for path, _, _, start, length in repos[0]['files']] == [
+        ('a.md', b"mentions \n<|file_end|>\n inline"), ('b.txt', b"b")
+    ]
+    assert repos[1]['files'][0][4] == 0
+
+def test_build_index_rejects_malformed_data():
+    with pytest.raises(ValueError):
+        build_index(b"not a dataset")
+    with pytest.raises(ValueError):
+        build_index(b"<|repo_start|>one\n<|file_start|>a\nunterminated")
+
+def test_reader_lookups(dataset_path):
+    with DatasetReader(dataset_path) as dataset:
+        assert dataset.repos() == ['one', 'two']
+        content = dataset.file('one', 'b.txt')
+        assert bytes(content) == b"b"
+        content.release()
+        with pytest.raises(KeyError):
+            dataset.file('one', 'c.py')
+        block, = dataset.repo_slices('two')
+        assert bytes(block) == b"<|repo_start|>two\n<|file_start|>c.py\n\n<|file_end|>\n<|repo_end|>\n\n"
+        block.release()
+
+def test_index_is_cached_and_rebuilt_when_the_dataset_changes(dataset_path):
+    with DatasetReader(dataset_path) as dataset:
+        index_path = dataset.index_path
+    assert index_path.exists()
+    dataset_path.write_bytes(DATASET + b"<|repo_start|>three\n<|repo_end|>\n\n")
+    with DatasetReader(dataset_path) as dataset:
+        assert dataset.repos() == ['one', 'two', 'three']
+
+def test_reader_round_trips_phase3_output(dataset_env, repositories, tmp_path):
+    dataset_env('dataset', incremental=False)
+    with DatasetReader(tmp_path / 'dataset.txt') as dataset:
+        for record in dataset.iter_files():
+            source_path = repositories / record.repo / record.path
+            assert bytes(record.content) == source_path.read_bytes()
+            record.content.release()
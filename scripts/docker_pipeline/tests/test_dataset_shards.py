@@ -0,0 +1,42 @@
+import hashlib
+import json
+
+from dataset_reader import ShardedDatasetReader, build_index, open_dataset
+
+def file_contents(path):
+    with open_dataset(path) as dataset:
+        contents = {}
+        for record in dataset.iter_files():
+            contents[(record.repo, record.path)] = bytes(record.content)
+            record.content.release()
+        return dataset.repos(), contents
+
+def test_shards_hold_the_same_files(dataset_env, tmp_path):
+    dataset_env('dataset', incremental=False)
+    dataset_env('sharded', incremental=False, shard_size=256)
+    shards_dir = tmp_path / 'shards'
+    assert len(list(shards_dir.glob('shard-*.txt'))) > 1
+    assert file_contents(shards_dir) == file_contents(tmp_path / 'dataset.txt')
+
+def test_index_records_match_the_shards(dataset_env, tmp_path):
+    dataset_env('sharded', incremental=False, shard_size=256)
+    shards_dir = tmp_path / 'shards'
+    records = [json.loads(line) for line in open(shards_dir / 'index.jsonl', encoding='utf-8')]
+    for record in records:
+        data = (shards_dir / record['shard']).read_bytes()
+        if record['type'] == 'shard':
+            assert record['bytes'] == len(data)
+            assert record['sha256'] == hashlib.sha256(data).hexdigest()
+            # Every shard is a self-contained token-delimited document
+            build_index(data)
+        elif record['type'] == 'file':
+            content = data[record['content_offset']:record['content_offset'] + record['content_length']]
+            assert record['sha256'] == hashlib.sha256(content).hexdigest()
+            assert data[record['offset']:].startswith(f"<|file_start|>{record['path']}\n".encode())
+
+def test_file_lookup(dataset_env, tmp_path):
+    dataset_env('sharded', incremental=False, shard_size=256)
+    with ShardedDatasetReader(tmp_path / 'shards') as dataset:
+        content = dataset.file('alpha', 'main.py')
+        assert bytes(content) == b"def main():\n    print('alpha')\n"
+        content.release()
@@ -0,0 +1,57 @@
+import hashlib
+
+import pytest
+
+from dataset_writer import DatasetWriter
+
+def write_sample(writer, source_path):
+    writer.start_repo('repo', "<|repo_start|>repo\n", "<|repo_end|>\n\n")
+    writer.write_file("inline – text", "<|file_start|>a.txt\n", "\n<|file_end|>\n", 'a.txt')
+    writer.copy_file(source_path, "<|file_start|>b.txt\n", "\n<|file_end|>\n", 'b.txt')
+    writer.end_repo()
+
+def test_counters_match_the_written_file(tmp_path):
+    source_path = tmp_path / 'b.txt'
+    source_path.write_text("streamed ü\n" * 1000, encoding='utf-8')
+    output_path = tmp_path / 'dataset.txt'
+    with DatasetWriter(output_path) as writer:
+        write_sample(writer, source_path)
+
+    data = output_path.read_bytes()
+    stats = writer.stats()
+    assert stats['bytes'] == len(data) == writer.bytes_on_disk()
+    assert stats['characters'] == len(data.decode('utf-8'))
+    assert stats['files'] == 2
+    assert stats['sha256'] == hashlib.sha256(data).hexdigest()
+    assert data.startswith(b"<|repo_start|>repo\n<|file_start|>a.txt\ninline \xe2\x80\x93 text\n<|file_end|>\n")
+    assert data.endswith(b"streamed \xc3\xbc\n\n<|file_end|>\n<|repo_end|>\n\n")
+
+def test_small_chunks_give_the_same_bytes(tmp_path, monkeypatch):
+    import dataset_writer
+
+    source_path = tmp_path / 'b.txt'
+    source_path.write_text("ü" * 5000, encoding='utf-8')
+    with DatasetWriter(tmp_path / 'whole.txt') as writer:
+        write_sample(writer, source_path)
+    monkeypatch.setattr(dataset_writer, 'STREAM_CHUNK_CHARS', 7)
+    with DatasetWriter(tmp_path / 'chunked.txt') as chunked:
+        write_sample(chunked, source_path)
+    assert (tmp_path / 'chunked.txt').read_bytes() == (tmp_path / 'whole.txt').read_bytes()
+    assert chunked.stats() == writer.stats()
+
+def test_unreadable_file_leaves_no_trace(tmp_path):
+    with DatasetWriter(tmp_path / 'dataset.txt') as writer:
+        with pytest.raises(OSError):
+            writer.copy_file(tmp_path / 'missing.txt', "<|file_start|>missing.txt\n", "\n<|file_end|>\n")
+    assert (tmp_path / 'dataset.txt').read_bytes() == b''
+    assert writer.stats()['files'] == 0
+
+def test_copy_segment_appends_verbatim(tmp_path):
+    source_path = tmp_path / 'b.txt'
+    source_path.write_text("body\n", encoding='utf-8')
+    with DatasetWriter(tmp_path / 'segment.txt') as segment:
+        write_sample(segment, source_path)
+    with DatasetWriter(tmp_path / 'dataset.txt') as writer:
+        writer.copy_segment(tmp_path / 'segment.txt', segment.characters, segment.files_written)
+    assert (tmp_path / 'dataset.txt').read_bytes() == (tmp_path / 'segment.txt').read_bytes()
+    assert writer.stats() == segment.stats()
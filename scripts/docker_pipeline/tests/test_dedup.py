@@ -0,0 +1,66 @@
+import json
+import random
+
+import dedup
+from dedup import ContentDeduplicator
+from test_phase3_dataset import dataset_paths
+
+def mutated_texts(seed, count=40):
+    """Texts that drift a few words at a time, so near-duplicates form chains"""
+    rng = random.Random(seed)
+    words = [f"w{rng.randrange(400)}" for _ in range(300)]
+    texts = []
+    for _ in range(count):
+        text = list(words)
+        for _ in range(rng.randrange(12)):
+            text[rng.randrange(len(text))] = f"x{rng.randrange(10**6)}"
+        if rng.random() < 0.3:
+            words = text
+        texts.append(' '.join(text))
+    texts.insert(5, texts[3])
+    return texts
+
+def test_duplicates_always_point_at_kept_files(monkeypatch):
+    # One band per pass lets a later pass drop a file an earlier drop pointed at
+    monkeypatch.setattr(dedup, 'DEDUP_BANDS_PER_PASS', 1)
+    drops = 0
+    for seed in range(10):
+        deduplicator = ContentDeduplicator('near', 0.8)
+        texts = mutated_texts(seed)
+        for i, text in enumerate(texts):
+            deduplicator.add('repo', f"f{i}", text)
+        deduplicator.finish()
+        for i in range(len(texts)):
+            duplicate = deduplicator.duplicate_of('repo', f"f{i}")
+            if duplicate:
+                drops += 1
+                assert deduplicator.duplicate_of(*duplicate[1]) is None
+                assert int(duplicate[1][1][1:]) < i
+        for record in deduplicator.report()['dropped']:
+            original = record['duplicate_of']
+            assert deduplicator.duplicate_of(original['repo'], original['path']) is None
+    assert drops
+
+def test_exact_mode_keeps_the_first_copy():
+    deduplicator = ContentDeduplicator('exact')
+    deduplicator.add('a', 'one.py', "same")
+    deduplicator.add('b', 'two.py', "same")
+    deduplicator.add_chunks('b', 'three.py', iter(["sa", "me"]))
+    deduplicator.add('b', 'other.py', "different")
+    deduplicator.finish()
+    assert deduplicator.duplicate_of('a', 'one.py') is None
+    assert deduplicator.duplicate_of('b', 'two.py') == ('exact', ('a', 'one.py'), 1.0)
+    assert deduplicator.duplicate_of('b', 'three.py') == ('exact', ('a', 'one.py'), 1.0)
+    assert deduplicator.duplicate_of('b', 'other.py') is None
+
+def test_phase3_drops_duplicates_in_favour_of_written_files(dataset_env, tmp_path):
+    dataset_env('dataset', incremental=False, dedup='near')
+    written = set(dataset_paths(tmp_path / 'dataset.txt'))
+    with open(tmp_path / 'dedup_report.json', encoding='utf-8') as f:
+        report = json.load(f)
+    dropped = {(record['repo'], record['path']): record for record in report['dropped']}
+    assert ('beta', 'copy_of_main.py') in dropped
+    assert ('beta', 'notes/near.md') in dropped
+    assert not written & set(dropped)
+    for record in dropped.values():
+        assert (record['duplicate_of']['repo'], record['duplicate_of']['path']) in written
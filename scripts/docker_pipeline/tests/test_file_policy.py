@@ -0,0 +1,45 @@
+import pytest
+
+import file_policy
+from file_policy import classify_file, skip_report
+
+def classify(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_bytes(content if isinstance(content, bytes) else content.encode('utf-8'))
+    return classify_file(path, path.stat().st_size)
+
+@pytest.mark.parametrize('name, content, expected', [
+    ('plain.py', "print('hi')\n", ('include', None)),
+    ('empty.md', "", ('include', None)),
+    ('app.min.js', "var a=1;\n", ('skip', 'generated')),
+    ('blob.txt', b"text\0more", ('skip', 'binary')),
+    ('latin1.txt', bytes(range(0x80, 0x100)) * 4, ('skip', 'not_utf8')),
+    ('gen.py', "# Code generated by protoc. DO NOT EDIT.\nx = 1\n", ('skip', 'generated')),
+    ('long.js', "x" * (file_policy.MINIFIED_LINE_CHARS + 1), ('skip', 'minified')),
+    ('unicode.md', "café \U0001f600\n" * 100, ('include', None)),
+])
+def test_classify_file(tmp_path, name, content, expected):
+    assert classify(tmp_path, name, content) == expected
+
+def test_character_cut_at_the_prefix_end_is_not_invalid(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_policy, 'SNIFF_BYTES', 7)
+    monkeypatch.setattr(file_policy, 'MAX_INVALID_UTF8_RATIO', 0)
+    assert classify(tmp_path, 'cut.md', "abcdef\U0001f600\n") == ('include', None)
+
+def test_size_limits(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_policy, 'LARGE_FILE_BYTES', 10)
+    monkeypatch.setattr(file_policy, 'MAX_FILE_BYTES', 100)
+    assert classify(tmp_path, 'data.json', '{"a": 1}\n' * 5) == ('truncate', 'large_file')
+    assert classify(tmp_path, 'module.py', "x = 1\n" * 5) == ('stream', 'large_file')
+    assert classify(tmp_path, 'huge.py', "x = 1\n" * 50) == ('skip', 'too_large')
+
+def test_skip_report_summary():
+    decisions = [
+        {'repo': 'r', 'path': 'a', 'bytes': 5, 'action': 'skip', 'reason': 'binary'},
+        {'repo': 'r', 'path': 'b', 'bytes': 7, 'action': 'skip', 'reason': 'binary'},
+        {'repo': 'r', 'path': 'c', 'bytes': 50, 'action': 'truncate', 'reason': 'large_file'},
+    ]
+    report = skip_report(decisions)
+    assert (report['files_skipped'], report['files_truncated'], report['files_streamed']) == (2, 1, 0)
+    assert report['bytes_skipped'] == 12
+    assert report['reasons'] == {'skip': {'binary': 2}, 'truncate': {'large_file': 1}}
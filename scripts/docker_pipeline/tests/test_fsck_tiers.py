@@ -0,0 +1,44 @@
+from conftest import git
+from fsck_tiers import list_packs, parse_fsck_output, verify_pack_checksum
+
+OID = 'a' * 40
+OTHER = 'b' * 40
+
+def test_parse_object_lines():
+    issues = parse_fsck_output(f"Checking object directories\nmissing blob {OID}\ndangling commit {OTHER}\n")
+    assert [(i['severity'], i['kind'], i['object_type'], i['oid']) for i in issues] == [
+        ('error', 'missing', 'blob', OID),
+        ('info', 'dangling', 'commit', OTHER),
+    ]
+
+def test_parse_broken_link_takes_its_target():
+    issues = parse_fsck_output(f"broken link from    tree {OID}\n              to    blob {OTHER}\n")
+    assert len(issues) == 1
+    assert issues[0]['kind'] == 'broken_link'
+    assert (issues[0]['object_type'], issues[0]['oid']) == ('tree', OID)
+    assert (issues[0]['target_type'], issues[0]['target_oid']) == ('blob', OTHER)
+
+def test_parse_object_messages_and_prefixes():
+    issues = parse_fsck_output(f"error in tree {OID}: badTree: could not parse\n"
+                               f"error: sha1 mismatch for .git/objects/aa/{OTHER[2:]}\n"
+                               "fatal: bad object HEAD\n"
+                               "something git never printed before\n")
+    assert [(i['severity'], i['kind']) for i in issues] == [
+        ('error', 'badTree'), ('error', 'corrupt'), ('error', 'corrupt'), ('warning', 'unparsed')
+    ]
+    assert issues[0]['oid'] == OID
+
+def test_pack_checksum(repositories, tmp_path):
+    repo_path = repositories / 'alpha'
+    git('gc', '-q', cwd=repo_path)
+    packs = list_packs(repo_path)
+    assert packs
+    assert verify_pack_checksum(packs[0])[0]
+
+    damaged = tmp_path / packs[0].name
+    data = bytearray(packs[0].read_bytes())
+    data[len(data) // 2] ^= 0xff
+    damaged.write_bytes(bytes(data))
+    damaged.with_suffix('.idx').write_bytes(packs[0].with_suffix('.idx').read_bytes())
+    ok, message = verify_pack_checksum(damaged)
+    assert not ok and 'pack checksum mismatch' in message
@@ -0,0 +1,44 @@
+from conftest import git
+from phase1_cloning import clone_repository, ecosystem_repo_names, run_phase1
+from remote_refs import RemoteRefCache
+from run_journal import RunJournal
+
+def test_phase1_clones_every_listed_repository(pipeline_env):
+    run_dir = pipeline_env('run')
+    assert run_phase1()
+    repositories = run_dir / 'repositories'
+    assert ecosystem_repo_names(repositories / 'asi-ecosystem') == ['alpha', 'beta']
+    assert sorted(path.name for path in repositories.iterdir()) == ['alpha', 'asi-ecosystem', 'beta']
+    assert (run_dir / 'mirrors' / 'alpha.git' / 'HEAD').exists()
+
+def test_mirror_follows_a_new_default_branch(pipeline_env, remotes, tmp_path):
+    run_dir = pipeline_env('run')
+    assert run_phase1()
+    work = tmp_path / 'work'
+    git('clone', '-q', (remotes / 'alpha.git').as_uri(), str(work))
+    git('checkout', '-q', '-b', 'next', cwd=work)
+    (work / 'next.md').write_text("next\n", encoding='utf-8')
+    git('add', 'next.md', cwd=work)
+    git('commit', '-q', '-m', 'next', cwd=work)
+    git('push', '-q', 'origin', 'next', cwd=work)
+    git('symbolic-ref', 'HEAD', 'refs/heads/next', cwd=remotes / 'alpha.git')
+
+    assert run_phase1()
+    assert git('symbolic-ref', 'HEAD', cwd=run_dir / 'mirrors' / 'alpha.git').strip() == 'refs/heads/next'
+    assert (run_dir / 'repositories' / 'alpha' / 'next.md').exists()
+
+def test_journal_lookup_shares_the_ref_cache(pipeline_env, tmp_path):
+    import phase1_cloning
+
+    pipeline_env('run')
+    journal = RunJournal(tmp_path / 'journal.jsonl')
+    url = phase1_cloning.CLONE_URL_TEMPLATE.format(name='alpha')
+    remote_refs = RemoteRefCache(cache_path=None)
+    _, ok, message, _ = clone_repository('alpha', url, journal=journal, remote_refs=remote_refs)
+    assert ok and message.startswith('cloned')
+    assert remote_refs.remote_calls == 1
+
+    remote_refs = RemoteRefCache(cache_path=None)
+    _, ok, message, _ = clone_repository('alpha', url, journal=journal, remote_refs=remote_refs)
+    assert ok and message == "unchanged (run journal)"
+    assert remote_refs.remote_calls == 1
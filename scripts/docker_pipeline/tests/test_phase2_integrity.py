@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+import phase2_integrity
+import remote_refs
+from conftest import git
+
+@pytest.fixture
+def audit_env(tmp_path, monkeypatch, remotes):
+    """Clones of the fixture repositories whose origin is a local bare remote
+
+    Returns audit(name, **run_phase2 options), which runs phase 2 into
+    <name>.jsonl and returns the report records.
+    """
+    clones = tmp_path / 'clones'
+    for remote in sorted(remotes.iterdir()):
+        git('clone', '-q', remote.as_uri(), str(clones / remote.stem))
+    monkeypatch.setattr(phase2_integrity, 'REPOSITORIES_DIR', clones)
+    monkeypatch.setattr(remote_refs, 'REMOTE_REFS_CACHE', tmp_path / 'remote_refs.json')
+    monkeypatch.setattr(phase2_integrity, 'AUDIT_MANIFEST_DIR', tmp_path / 'manifests')
+
+    def audit(name, **options):
+        monkeypatch.setattr(phase2_integrity, 'REPORT_PATH', tmp_path / f"{name}.jsonl")
+        monkeypatch.setattr(phase2_integrity, 'SUMMARY_PATH', tmp_path / f"{name}.summary.json")
+        phase2_integrity.run_phase2(**options)
+        with open(tmp_path / f"{name}.jsonl", encoding='utf-8') as f:
+            return [json.loads(line) for line in f]
+
+    return audit
+
+def repo_records(records):
+    return [record for record in records if record.get('type') == 'repo']
+
+def test_concurrent_report_matches_sequential_order(audit_env):
+    sequential = repo_records(audit_env('sequential', workers=1, full=True))
+    concurrent = repo_records(audit_env('concurrent', workers=4, full=True))
+    assert [record['repo'] for record in sequential] == ['alpha', 'asi-ecosystem', 'beta']
+    assert [record['repo'] for record in concurrent] == [record['repo'] for record in sequential]
+    assert [record['overall_status'] for record in concurrent] == ['PASS'] * 3
+
+def test_levels_record_the_remote_snapshot(audit_env):
+    record = repo_records(audit_env('report', full=True))[0]
+    for level in ('level_1', 'level_4'):
+        assert record['levels'][level]['status'] == 'PASS'
+        assert record['levels'][level]['remote_refs_age'] >= 0
+        assert record['levels'][level]['remote_fetched_at']
+
+def test_remote_ahead_fails_level_1(audit_env, tmp_path):
+    work = tmp_path / 'work'
+    git('clone', '-q', (tmp_path / 'remotes' / 'beta.git').as_uri(), str(work))
+    (work / 'new.md').write_text("new\n", encoding='utf-8')
+    git('add', 'new.md', cwd=work)
+    git('commit', '-q', '-m', 'ahead', cwd=work)
+    git('push', '-q', 'origin', 'HEAD', cwd=work)
+    records = {record['repo']: record for record in repo_records(audit_env('report', full=True))}
+    assert records['alpha']['overall_status'] == 'PASS'
+    assert records['beta']['levels']['level_1']['status'] == 'FAIL'
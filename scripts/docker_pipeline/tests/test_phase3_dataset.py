@@ -0,0 +1,83 @@
+from conftest import git
+from dataset_reader import open_dataset
+
+def dataset_paths(path):
+    with open_dataset(path) as dataset:
+        paths = []
+        for record in dataset.iter_files():
+            paths.append((record.repo, record.path))
+            record.content.release()
+    return paths
+
+def test_dataset_holds_the_text_files(dataset_env, tmp_path):
+    dataset_env('sequential', workers=1, incremental=False)
+    paths = dataset_paths(tmp_path / 'sequential.txt')
+    assert ('alpha', 'main.py') in paths
+    assert ('alpha', 'docs/unicode.txt') in paths
+    assert ('beta', 'mentions_tokens.md') in paths
+    for skipped in ('image.png', 'blob.txt', 'node_modules/dep/index.js', 'api_pb2.py'):
+        assert ('alpha', skipped) not in paths
+
+def test_parallel_ingestion_is_byte_identical(dataset_env):
+    sequential = dataset_env('sequential', workers=1, incremental=False)
+    assert dataset_env('parallel', workers=4, incremental=False) == sequential
+
+def test_incremental_rebuild_is_byte_identical(dataset_env, repositories, capsys):
+    full = dataset_env('full', incremental=False)
+    capsys.readouterr()
+    assert dataset_env('cached', incremental=True) == full
+    assert "Repositories reused from segment cache: 3 (0 rebuilt)" in capsys.readouterr().out
+
+    (repositories / 'beta' / 'src' / 'lib.rs').write_text("fn main() { changed(); }\n", encoding='utf-8')
+    git('commit', '-q', '-am', 'change', cwd=repositories / 'beta')
+    rebuilt = dataset_env('rebuilt', incremental=True)
+    assert "Repositories reused from segment cache: 2 (1 rebuilt)" in capsys.readouterr().out
+    assert b"changed();" in rebuilt
+    assert dataset_env('full_again', incremental=False) == rebuilt
+
+def test_uncommitted_changes_bypass_the_cache(dataset_env, repositories, capsys):
+    dataset_env('full', incremental=False)
+    (repositories / 'alpha' / 'main.py').write_text("print('uncommitted')\n", encoding='utf-8')
+    assert b"print('uncommitted')" in dataset_env('dirty', incremental=True)
+    assert "Repositories reused from segment cache: 2 (1 rebuilt)" in capsys.readouterr().out
+
+def test_unread_files_keep_the_cache_valid(repositories):
+    from phase3_dataset import EXCLUDED_DIRS, INCLUDED_EXTENSIONS
+    from segment_cache import clean_tree_id
+
+    repo_path = repositories / 'alpha'
+
+    def tree_id():
+        return clean_tree_id(repo_path, EXCLUDED_DIRS, (), (), INCLUDED_EXTENSIONS)
+
+    head_tree = git('rev-parse', 'HEAD^{tree}', cwd=repo_path).strip()
+    assert tree_id() == head_tree
+    (repo_path / 'node_modules' / 'dep' / 'extra.js').write_text("x\n", encoding='utf-8')
+    (repo_path / 'photo.png').write_bytes(b'\x89PNG')
+    assert tree_id() == head_tree
+    (repo_path / 'notes.txt').write_text("untracked\n", encoding='utf-8')
+    assert tree_id() is None
+
+def test_git_source_is_byte_identical(dataset_env, monkeypatch):
+    import file_policy
+    import git_broker
+
+    worktree = dataset_env('worktree', incremental=False)
+    assert dataset_env('git', incremental=False, source='git') == worktree
+    # Blobs larger than the sniffed prefix streamed in tiny blocks, with unread
+    # remainders drained or the pipe restarted
+    monkeypatch.setattr(git_broker, 'OBJECT_READ_BLOCK', 7)
+    monkeypatch.setattr(git_broker, 'OBJECT_DRAIN_MAX_BYTES', 16)
+    monkeypatch.setattr(file_policy, 'SNIFF_BYTES', 5)
+    worktree = dataset_env('worktree_small_prefix', incremental=False)
+    assert dataset_env('git_blocks', incremental=False, source='git') == worktree
+
+def test_git_source_reads_clones_without_a_checkout(dataset_env, repositories):
+    from phase1_cloning import set_checkout
+
+    worktree = dataset_env('worktree', incremental=False)
+    for repo_path in repositories.iterdir():
+        set_checkout(repo_path, False)
+    assert not (repositories / 'alpha' / 'main.py').exists()
+    assert dataset_env('git', incremental=False, source='git') == worktree
+    assert dataset_env('git_cached', incremental=True, source='git') == worktree
@@ -0,0 +1,55 @@
+import json
+
+from conftest import git
+from phase1_cloning import run_phase1
+from phase2_integrity import run_phase2
+from phase3_dataset import run_phase3
+from pipeline_scheduler import run_pipelined
+
+def run_phased(pipeline_env, name):
+    run_dir = pipeline_env(name)
+    assert run_phase1() and run_phase2() and run_phase3()
+    return run_dir
+
+def test_pipelined_dataset_matches_phased(pipeline_env):
+    phased = run_phased(pipeline_env, 'phased')
+    pipelined = pipeline_env('pipelined')
+    assert run_pipelined()
+    dataset = (phased / 'dataset.txt').read_bytes()
+    assert b"<|repo_start|>beta\n" in dataset
+    assert (pipelined / 'dataset.txt').read_bytes() == dataset
+
+def report_order(run_dir):
+    with open(run_dir / 'integrity_report.jsonl', encoding='utf-8') as f:
+        records = [json.loads(line) for line in f]
+    return [(record['repo'], record['overall_status']) for record in records if record.get('type') == 'repo']
+
+def add_unlisted_clones(run_dir, remotes):
+    """A clone the ecosystem README does not list, and an unfinished hidden one"""
+    git('clone', '-q', (remotes / 'beta.git').as_uri(), str(run_dir / 'repositories' / 'extra'))
+    (run_dir / 'repositories' / '.gamma.tmp').mkdir()
+
+def test_pipelined_report_matches_phased(pipeline_env, remotes):
+    phased = pipeline_env('phased')
+    add_unlisted_clones(phased, remotes)
+    assert run_phase1() and run_phase2() and run_phase3()
+    pipelined = pipeline_env('pipelined')
+    add_unlisted_clones(pipelined, remotes)
+    assert run_pipelined()
+
+    expected = [('alpha', 'PASS'), ('asi-ecosystem', 'PASS'), ('beta', 'PASS'), ('extra', 'PASS')]
+    assert report_order(phased) == expected
+    assert report_order(pipelined) == expected
+    assert (pipelined / 'dataset.txt').read_bytes() == (phased / 'dataset.txt').read_bytes()
+
+def test_pipelined_run_fails_when_a_stage_callback_raises(pipeline_env, monkeypatch, capsys):
+    import phase1_cloning
+
+    def unreadable(repo_path):
+        raise OSError("README unreadable")
+
+    run_dir = pipeline_env('pipelined')
+    monkeypatch.setattr(phase1_cloning, 'ecosystem_repo_names', unreadable)
+    assert not run_pipelined()
+    assert "[x] clone asi-ecosystem: README unreadable" in capsys.readouterr().out
+    assert not (run_dir / 'dataset.txt').exists()
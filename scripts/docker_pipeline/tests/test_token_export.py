@@ -0,0 +1,44 @@
+import json
+from array import array
+
+from token_export import TOKENS_FILE, TOKENS_INDEX, TOKENS_META, export_tokens
+
+def decode_bytes_export(output_dir):
+    """Turn a 'bytes' tokenizer export back into dataset text"""
+    with open(output_dir / TOKENS_META, encoding='utf-8') as f:
+        meta = json.load(f)
+    tokens = array(meta['dtype'])
+    tokens.frombytes((output_dir / TOKENS_FILE).read_bytes())
+    assert len(tokens) == meta['total_tokens']
+    specials = {token_id: f"<|{name}|>".encode() for name, token_id in meta['special_tokens'].items()}
+    return tokens, b''.join(specials.get(token, bytes([token]) if token < 256 else b'') for token in tokens)
+
+def test_export_round_trips_the_dataset(dataset_env, tmp_path):
+    dataset = dataset_env('dataset', incremental=False)
+    output_dir = tmp_path / 'tokens'
+    stats = export_tokens(tmp_path / 'dataset.txt', output_dir, 'bytes')
+    tokens, decoded = decode_bytes_export(output_dir)
+    assert decoded == dataset
+    assert stats['total_tokens'] == len(tokens)
+
+    records = [json.loads(line) for line in open(output_dir / TOKENS_INDEX, encoding='utf-8')]
+    main_py = next(r for r in records if r['type'] == 'file' and r['path'] == 'main.py')
+    start = main_py['content_offset']
+    assert bytes(tokens[start:start + main_py['content_length']].tolist()) == b"def main():\n    print('alpha')\n"
+
+def test_reexport_reuses_tokens_and_is_identical(dataset_env, tmp_path):
+    dataset_env('dataset', incremental=False)
+    output_dir = tmp_path / 'tokens'
+    export_tokens(tmp_path / 'dataset.txt', output_dir, 'bytes')
+    first = (output_dir / TOKENS_FILE).read_bytes()
+    stats = export_tokens(tmp_path / 'dataset.txt', output_dir, 'bytes')
+    assert stats['files_tokenized'] == 0 and stats['files_reused'] == stats['files']
+    assert (output_dir / TOKENS_FILE).read_bytes() == first
+
+def test_sharded_dataset_exports_the_same_tokens(dataset_env, tmp_path):
+    dataset_env('dataset', incremental=False)
+    export_tokens(tmp_path / 'dataset.txt', tmp_path / 'from_dataset', 'bytes')
+    dataset_env('sharded', incremental=False, shard_size=256)
+    export_tokens(tmp_path / 'shards', tmp_path / 'from_shards', 'bytes')
+    from_shards = (tmp_path / 'from_shards' / TOKENS_FILE).read_bytes()
+    assert from_shards == (tmp_path / 'from_dataset' / TOKENS_FILE).read_bytes()
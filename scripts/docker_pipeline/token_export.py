@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Token Export
+Tokenizes the phase 3 dataset with a pluggable tokenizer into one flat,
+memory-mappable uint16/uint32 array plus a repo/file boundary index, reusing
+the previous export's tokens for every file whose content hash is unchanged
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import sys
+from array import array
+from pathlib import Path
+
+from dataset_reader import open_dataset
+
+# Configuration
+OUTPUT_TOKENS_DIR = Path('/app/output/tokens')
+TOKENS_FILE = 'tokens.bin'
+TOKENS_INDEX = 'index.jsonl'
+TOKENS_META = 'meta.json'
+TOKENIZE_BATCH_FILES = 256  # Files handed to the tokenizer per batch call
+
+# Special tokens, in reserved-ID order after the tokenizer's own vocabulary
+SPECIAL_TOKENS = ['repo_start', 'repo_end', 'file_start', 'file_end']
+
+class ByteTokenizer:
+    """Dependency-free byte-level tokenizer: UTF-8 bytes are IDs 0-255"""
+    name = 'bytes'
+    vocab_size = 256
+
+    def encode_batch(self, texts):
+        return [self._widen(text.encode('utf-8')) for text in texts]
+
+    @staticmethod
+    def _widen(data):
+        """uint8 -> uint16 with one strided copy instead of a per-byte loop"""
+        buffer = bytearray(2 * len(data))
+        buffer[0 if sys.byteorder == 'little' else 1::2] = data
+        tokens = array('H')
+        tokens.frombytes(buffer)
+        return tokens
+
+class TiktokenTokenizer:
+    """Adapter for a tiktoken encoding (optional dependency)"""
+
+    def __init__(self, encoding_name):
+        try:
+            import tiktoken
+        except ImportError:
+            raise ImportError("tiktoken is required for 'tiktoken:' tokenizers (pip install tiktoken)")
+        self._encoding = tiktoken.get_encoding(encoding_name)
+        self.name = f'tiktoken:{encoding_name}'
+        self.vocab_size = self._encoding.n_vocab
+
+    def encode_batch(self, texts):
+        # Special-token text inside files is encoded as ordinary text
+        return self._encoding.encode_ordinary_batch(texts)
+
+class HuggingFaceTokenizer:
+    """Adapter for a Hugging Face tokenizer (optional dependency)"""
+
+    def __init__(self, model_name):
+        try:
+            from transformers import AutoTokenizer
+        except ImportError:
+            raise ImportError("transformers is required for 'hf:' tokenizers (pip install transformers)")
+        self._tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.name = f'hf:{model_name}'
+        self.vocab_size = len(self._tokenizer)
+
+    def encode_batch(self, texts):
+        return self._tokenizer(texts, add_special_tokens=False)['input_ids']
+
+def load_tokenizer(spec='bytes'):
+    """Build a tokenizer from a spec: 'bytes', 'tiktoken:<encoding>' or 'hf:<model>'"""
+    if spec == 'bytes':
+        return ByteTokenizer()
+    kind, _, name = spec.partition(':')
+    if kind == 'tiktoken' and name:
+        return TiktokenTokenizer(name)
+    if kind == 'hf' and name:
+        return HuggingFaceTokenizer(name)
+    raise ValueError(f"Unknown tokenizer spec '{spec}'")
+
+def special_token_ids(tokenizer):
+    """Reserved IDs for the structure tokens, placed right after the vocabulary"""
+    return {name: tokenizer.vocab_size + i for i, name in enumerate(SPECIAL_TOKENS)}
+
+def token_typecode(tokenizer):
+    """Smallest unsigned array type that holds every ID including the reserved ones"""
+    return 'H' if tokenizer.vocab_size + len(SPECIAL_TOKENS) <= 2**16 else 'I'
+
+class TokenArrayWriter:
+    """Appends token batches to a flat little-endian array file"""
+
+    def __init__(self, path, typecode):
+        self.path = path
+        self.typecode = typecode
+        self.count = 0
+        self._file = open(path, 'wb')
+
+    def append(self, tokens):
+        """Append tokens (int sequence, array or little-endian memoryview) and return their offset"""
+        offset = self.count
+        if isinstance(tokens, memoryview):
+            self._file.write(tokens)
+        else:
+            if not isinstance(tokens, array) or tokens.typecode != self.typecode:
+                tokens = array(self.typecode, tokens)
+            if sys.byteorder == 'big':
+                tokens = array(self.typecode, tokens)
+                tokens.byteswap()
+            tokens.tofile(self._file)
+        self.count += len(tokens)
+        return offset
+
+    def close(self):
+        self._file.close()
+
+class PreviousExport:
+    """Token slices of the last export, looked up by file content hash
+
+    The old array is memory-mapped; the mapping stays valid after the new
+    export replaces the file, so reused slices are copied straight across.
+    """
+
+    def __init__(self, output_dir, tokenizer_name, typecode):
+        self.by_hash = {}
+        self._file = None
+        self._mmap = None
+        self._view = None
+        try:
+            with open(output_dir / TOKENS_META, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta['tokenizer'] != tokenizer_name or meta['dtype'] != typecode:
+                return
+            self._file = open(output_dir / TOKENS_FILE, 'rb')
+            if os.fstat(self._file.fileno()).st_size != meta['total_tokens'] * array(typecode).itemsize:
+                return
+            with open(output_dir / TOKENS_INDEX, 'r', encoding='utf-8') as f:
+                for line in f:
+                    record = json.loads(line)
+                    if record['type'] == 'file':
+                        self.by_hash[record['content_sha256']] = (record['content_offset'],
+                                                                  record['content_length'])
+            if meta['total_tokens']:
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                self._view = memoryview(self._mmap).cast(typecode)
+        except (OSError, ValueError, KeyError):
+            self.by_hash = {}
+
+    def tokens(self, content_sha256):
+        """Return the previous tokens for a content hash, or None"""
+        if content_sha256 not in self.by_hash:
+            return None
+        offset, length = self.by_hash[content_sha256]
+        if not length:
+            return []
+        return self._view[offset:offset + length]
+
+    def close(self):
+        if self._view is not None:
+            self._view.release()
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass  # Slices still held after an error; the mapping goes with them
+        if self._file:
+            self._file.close()
+
+def export_tokens(source=None, output_dir=OUTPUT_TOKENS_DIR, tokenizer='bytes'):
+    """Tokenize a dataset.txt or shards directory into output_dir
+
+    The array mirrors the text format, with the special tokens as reserved IDs,
+    so decoding it reproduces the dataset:
+      [repo_start] "<name>\\n"
+        ([file_start] "<path>\\n" <content> "\\n" [file_end] "\\n")*
+      [repo_end] "\\n\\n"
+    Index records (one JSON object per line, offsets and lengths in tokens):
+      {"type": "file", "repo", "path", "offset", "length",
+       "content_offset", "content_length", "content_sha256"}
+      {"type": "repo", "repo", "offset", "length", "files"}
+    Returns a stats dict.
+    """
+    tokenizer = load_tokenizer(tokenizer) if isinstance(tokenizer, str) else tokenizer
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    typecode = token_typecode(tokenizer)
+    specials = special_token_ids(tokenizer)
+    previous = PreviousExport(output_dir, tokenizer.name, typecode)
+
+    stats = {'files': 0, 'files_tokenized': 0, 'files_reused': 0}
+    tmp_tokens = output_dir / (TOKENS_FILE + '.tmp')
+    tmp_index = output_dir / (TOKENS_INDEX + '.tmp')
+    writer = TokenArrayWriter(tmp_tokens, typecode)
+    newline, blank = tokenizer.encode_batch(["\n", "\n\n"])
+
+    try:
+        with open_dataset(source) as dataset, open(tmp_index, 'w', encoding='utf-8') as index:
+            def record(**fields):
+                index.write(json.dumps(fields, ensure_ascii=False) + '\n')
+
+            def flush(repo, batch):
+                """Tokenize a batch in one call (paths plus non-reusable bodies) and append it"""
+                texts = [f"{path}\n" for path, _, _, _ in batch]
+                texts += [content for _, content, _, tokens in batch if tokens is None]
+                encoded = tokenizer.encode_batch(texts)
+                bodies = iter(encoded[len(batch):])
+                for header, (path, _, content_sha256, tokens) in zip(encoded, batch):
+                    body = next(bodies) if tokens is None else tokens
+                    start = writer.append([specials['file_start']])
+                    writer.append(header)
+                    content_offset = writer.append(body)
+                    content_length = writer.count - content_offset
+                    if isinstance(body, memoryview):
+                        body.release()  # Reused slice of the old export's mapping
+                    writer.append(newline)
+                    writer.append([specials['file_end']])
+                    writer.append(newline)
+                    record(type='file', repo=repo, path=path, offset=start, length=writer.count - start,
+                           content_offset=content_offset, content_length=content_length,
+                           content_sha256=content_sha256)
+                batch.clear()
+
+            for repo in dataset.repos():
+                repo_offset = writer.append([specials['repo_start']])
+                writer.append(tokenizer.encode_batch([f"{repo}\n"])[0])
+                batch = []
+                files = 0
+                for item in dataset.iter_files(repo):
+                    # Same hash as the shard index: SHA-256 of the body bytes
+                    content_sha256 = hashlib.sha256(item.content).hexdigest()
+                    tokens = previous.tokens(content_sha256)
+                    content = bytes(item.content).decode('utf-8') if tokens is None else None
+                    item.content.release()  # Lets the reader unmap the dataset on close
+                    stats['files_reused' if tokens is not None else 'files_tokenized'] += 1
+                    batch.append((item.path, content, content_sha256, tokens))
+                    files += 1
+                    if len(batch) >= TOKENIZE_BATCH_FILES:
+                        flush(repo, batch)
+                if batch:
+                    flush(repo, batch)
+                writer.append([specials['repo_end']])
+                writer.append(blank)
+                record(type='repo', repo=repo, offset=repo_offset, length=writer.count - repo_offset, files=files)
+                stats['files'] += files
+    finally:
+        writer.close()
+        previous.close()
+    os.replace(tmp_tokens, output_dir / TOKENS_FILE)
+    os.replace(tmp_index, output_dir / TOKENS_INDEX)
+    meta = {
+        'tokenizer': tokenizer.name,
+        'vocab_size': tokenizer.vocab_size,
+        'dtype': typecode,
+        'byteorder': 'little',
+        'special_tokens': specials,
+        'total_tokens': writer.count
+    }
+    with open(output_dir / TOKENS_META, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    stats['total_tokens'] = writer.count
+    return stats